@@ -0,0 +1,157 @@
+"""
+Deteksi anomali & kerusakan sensor secara streaming, per device.
+
+Flag health dari firmware (dht_ok, photo_ok, soil_ok) hanya tahu sensor gagal membaca.
+Probe tanah yang macet atau DHT22 yang ngaco tetap melapor "ok", jadi setiap nilai juga
+dicek terhadap statistik berjalan device itu sendiri:
+
+- out_of_range : di luar batas fisik sensor (SENSOR_LIMITS)
+- spike        : lompatan > MAX_STEP + MAX_RATE * selang waktu, dan |z-score| EWMA > SPIKE_Z
+- stuck        : nilai sama persis selama >= STUCK_SECONDS[sensor] dan >= STUCK_READINGS reading
+                 (hanya peringatan: nilainya masih wajar, prediksi tetap jalan)
+
+Memori O(1) per device (beberapa angka per sensor), waktu O(1) per reading, tanpa histori.
+Tidak thread-safe: panggil dari satu thread (tahap enrich gateway, worker, pipeline dashboard).
+"""
+import math
+
+import metrics
+from payload_codec import SENSOR_FIELDS
+
+# Batas fisik pembacaan sensor (bukan threshold agronomi; itu tugas classifier)
+SENSOR_LIMITS = {'temp': (-10.0, 60.0), 'rh_air': (0.0, 100.0), 'rh_soil': (0.0, 100.0), 'lux': (0.0, 100_000.0)}
+# Lompatan yang masih wajar antar dua reading: noise sensor + laju perubahan alami per detik
+MAX_STEP = {'temp': 3.0, 'rh_air': 10.0, 'rh_soil': 8.0, 'lux': 20_000.0}
+MAX_RATE = {'temp': 0.01, 'rh_air': 0.05, 'rh_soil': 0.02, 'lux': 100.0}
+# Nilai yang wajar konstan lama (lux 0 = malam hari)
+STUCK_EXEMPT = {'lux': 0.0}
+
+EWMA_ALPHA = 0.05
+SPIKE_Z = 6.0
+WARMUP_READINGS = 20
+# Window "macet" per sensor. Tanah dilaporkan firmware sebagai integer (map 0..100) dan
+# berubah sangat lambat: nilai yang sama berjam-jam masih normal
+STUCK_SECONDS = {'temp': 3600, 'rh_air': 3600, 'rh_soil': 6 * 3600, 'lux': 3600}
+STUCK_READINGS = 30
+
+# Flag firmware -> nilai sensor yang dibaca modul tersebut
+HEALTH_SENSORS = {'dht_ok': ('temp', 'rh_air'), 'photo_ok': ('lux',), 'soil_ok': ('rh_soil',)}
+# Jenis fault yang membuat nilainya tidak layak diprediksi. spike bisa saja kejadian nyata,
+# stuck bisa saja sensor sehat yang kondisinya stabil -> keduanya hanya peringatan
+UNTRUSTED_FAULTS = frozenset({'out_of_range'})
+
+class _SensorStats:
+    __slots__ = ('n', 'mean', 'var', 'last', 'last_ts', 'flat_since', 'flat_count')
+
+    def __init__(self):
+        self.n = 0
+        self.mean = 0.0
+        self.var = 0.0
+        self.last = None
+        self.last_ts = None
+        self.flat_since = None
+        self.flat_count = 0
+
+class AnomalyDetector:
+    """check(record) -> {sensor: jenis_fault}; hasilnya juga disimpan di record.faults."""
+
+    def __init__(self, limits=SENSOR_LIMITS, max_step=MAX_STEP, max_rate=MAX_RATE, alpha=EWMA_ALPHA,
+                 spike_z=SPIKE_Z, warmup=WARMUP_READINGS, stuck_seconds=STUCK_SECONDS,
+                 stuck_readings=STUCK_READINGS):
+        self.limits = limits
+        self.max_step = max_step
+        self.max_rate = max_rate
+        self.alpha = alpha
+        self.spike_z = spike_z
+        self.warmup = warmup
+        self.stuck_seconds = stuck_seconds
+        self.stuck_readings = stuck_readings
+        self.checked_count = 0
+        self.fault_count = 0
+        self._devices = {}
+
+    def __len__(self):
+        return len(self._devices)
+
+    def _check_value(self, stats, sensor, value, ts):
+        fault = None
+        low, high = self.limits[sensor]
+        if not low <= value <= high:
+            # Nilai mustahil tidak ikut ke statistik agar rata-rata tidak rusak
+            return 'out_of_range'
+
+        if stats.last is not None:
+            delta = value - stats.last
+            if delta == 0 and STUCK_EXEMPT.get(sensor) != value:
+                if stats.flat_count == 0:
+                    stats.flat_since = stats.last_ts
+                stats.flat_count += 1
+                if stats.flat_count >= self.stuck_readings and ts - stats.flat_since >= self.stuck_seconds[sensor]:
+                    fault = 'stuck'
+            else:
+                stats.flat_count = 0
+                allowed = self.max_step[sensor] + self.max_rate[sensor] * max(ts - stats.last_ts, 0.0)
+                deviation = value - stats.mean
+                if (stats.n >= self.warmup and abs(delta) > allowed
+                        and deviation * deviation > self.spike_z * self.spike_z * stats.var):
+                    fault = 'spike'
+
+        # EWMA mean & variance (update incremental)
+        if stats.n == 0:
+            stats.mean = value
+        else:
+            diff = value - stats.mean
+            incr = self.alpha * diff
+            stats.mean += incr
+            stats.var = (1 - self.alpha) * (stats.var + diff * incr)
+        stats.n += 1
+        stats.last = value
+        stats.last_ts = ts
+        return fault
+
+    def check(self, record):
+        sensors = self._devices.get(record.device_id)
+        if sensors is None:
+            sensors = self._devices[record.device_id] = {s: _SensorStats() for s in SENSOR_FIELDS}
+        ts = record.ts
+        faults = {}
+        for sensor in SENSOR_FIELDS:
+            value = getattr(record, sensor)
+            if value is None or (isinstance(value, float) and math.isnan(value)):
+                continue
+            fault = self._check_value(sensors[sensor], sensor, value, ts)
+            if fault is not None:
+                faults[sensor] = fault
+
+        self.checked_count += 1
+        if faults:
+            self.fault_count += len(faults)
+            metrics.SENSOR_FAULTS.inc(len(faults))
+        record.faults = faults or None
+        return faults
+
+    def process(self, batch):
+        """Handler batch untuk pipeline: cek setiap reading secara berurutan."""
+        for record in batch:
+            self.check(record)
+
+    def stats(self, device_id):
+        """Statistik berjalan per sensor sebuah device (mean, std, reading konstan berturut-turut)."""
+        sensors = self._devices.get(device_id)
+        if sensors is None:
+            return None
+        return {s: {'mean': st.mean, 'std': math.sqrt(st.var), 'flat_count': st.flat_count, 'n': st.n}
+                for s, st in sensors.items()}
+
+# ==========================================
+# HELPER UNTUK KONSUMEN
+# ==========================================
+def untrusted_sensors(faults):
+    """Sensor yang nilainya tidak boleh masuk ke model (di luar batas fisik)."""
+    return [s for s, kind in (faults or {}).items() if kind in UNTRUSTED_FAULTS]
+
+def effective_health(reading):
+    """Flag health firmware digabung dengan fault hasil deteksi: {flag: bool}."""
+    faults = reading.get('faults') or {}
+    return {flag: bool(reading.get(flag)) and not any(s in faults for s in sensors)
+            for flag, sensors in HEALTH_SENSORS.items()}
@@ -0,0 +1,270 @@
+"""
+Benchmark jalur-jalur penting Chili-Hub (offline, tanpa broker):
+- ingestion : mqtt_listener.on_message dengan payload sintetis
+- labeling  : determine_label per baris vs label_dataframe (vektorisasi) vs label_reading (streaming)
+- training  : waktu train_model.train_and_evaluate vs ukuran dataset
+- inference : prediksi 1 baris seperti di dashboard.py (sklearn & fast_forest)
+
+Data dibuat dengan dummy_data_maker.generate_dataset. Hasil ditulis sebagai JSON
+(throughput + latensi p50/p99) agar bisa dibandingkan antar run. Setiap benchmark memvalidasi
+kerja yang diukur (pesan tersimpan, label sama, prediksi sama); jika tidak, run gagal.
+
+Contoh:
+    python benchmarks.py --output bench_results.json
+    python benchmarks.py --quick --baseline bench_results.json
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import tempfile
+import time
+import warnings
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from dummy_data_maker import generate_dataset
+import rule_engine
+from labeling import determine_label, label_dataframe
+
+FEATURES = ['earth_humidity', 'air_temperature', 'air_humidity', 'luminance']
+
+# ==========================================
+# 1. UTILITAS PENGUKURAN
+# ==========================================
+def summarize(latencies_s, n_items=None, total_s=None):
+    """Ringkas daftar latensi per panggilan (detik) menjadi throughput + p50/p99 (ms)."""
+    latencies = np.asarray(latencies_s, dtype=np.float64)
+    total = float(latencies.sum()) if total_s is None else total_s
+    n = len(latencies) if n_items is None else n_items
+    return {
+        'n': int(n),
+        'total_s': round(total, 6),
+        'throughput_per_s': round(n / total, 2) if total > 0 else None,
+        'p50_ms': round(float(np.percentile(latencies, 50)) * 1e3, 4),
+        'p99_ms': round(float(np.percentile(latencies, 99)) * 1e3, 4)
+    }
+
+def timed_calls(fn, items, outputs=None):
+    """Latensi per panggilan; jika outputs (list) diisi, hasil fn ikut dikumpulkan untuk validasi."""
+    latencies = []
+    for item in items:
+        start = time.perf_counter()
+        result = fn(item)
+        latencies.append(time.perf_counter() - start)
+        if outputs is not None:
+            outputs.append(result)
+    return latencies
+
+def ensure_valid(name, errors):
+    """Hentikan run jika kerja yang diukur ternyata tidak terjadi (angka throughput jadi palsu)."""
+    if errors:
+        print(f"❌ Benchmark {name} tidak valid, {len(errors)} masalah:")
+        for err in errors[:10]:
+            print(f"   - {err}")
+        raise SystemExit(1)
+
+def make_dataset(n_rows, seed=0):
+    df = generate_dataset(n_rows, n_devices=max(1, n_rows // 1000), seed=seed)
+    df['label'] = label_dataframe(df)
+    return df
+
+# ==========================================
+# 2. BENCHMARK
+# ==========================================
+def bench_ingestion(df):
+    import metrics
+    import mqtt_listener
+    from anomaly_detector import AnomalyDetector
+    from device_registry import DeviceRegistry, device_topic
+    from sensor_store import SensorStore
+
+    class Message:
+        __slots__ = ('topic', 'payload')
+
+        def __init__(self, topic, payload):
+            self.topic = topic
+            self.payload = payload
+
+    messages = [
+        Message(device_topic(row.device_id), json.dumps({
+            'temp': row.air_temperature, 'rh_air': row.air_humidity,
+            'rh_soil': row.earth_humidity, 'lux': row.luminance,
+            'sensor_health': {'dht_ok': True, 'photo_ok': True, 'soil_ok': True}
+        }).encode())
+        for row in df.itertuples()
+    ]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        store = SensorStore(os.path.join(tmp, 'bench.db'))
+        registry = DeviceRegistry()
+        userdata = {'store': store, 'registry': registry, 'detector': AnomalyDetector()}
+        errors_before = metrics.MESSAGE_ERRORS.value
+        start = time.perf_counter()
+        latencies = timed_calls(lambda m: mqtt_listener.on_message(None, userdata, m), messages)
+        store.flush()
+        total_with_disk = time.perf_counter() - start
+        store.close()
+
+    errors = []
+    failed = metrics.MESSAGE_ERRORS.value - errors_before
+    if failed:
+        errors.append(f"{failed:,.0f} pesan gagal diproses on_message")
+    if store.written_count != len(messages):
+        errors.append(f"tersimpan {store.written_count} dari {len(messages)} pesan (drop: {store.dropped_count})")
+    if len(registry) != df['device_id'].nunique():
+        errors.append(f"jumlah device {len(registry)} (harusnya {df['device_id'].nunique()})")
+    ensure_valid('ingestion', errors)
+
+    result = summarize(latencies)
+    result['throughput_with_disk_per_s'] = round(len(messages) / total_with_disk, 2)
+    return result
+
+def bench_labeling(df):
+    rows = [row for _, row in df.iterrows()]
+    rowwise_labels, batch_labels, streaming_labels = [], [], []
+    rowwise = summarize(timed_calls(determine_label, rows, rowwise_labels))
+
+    batches = [df] * 5
+    vectorized = summarize(timed_calls(label_dataframe, batches, batch_labels), n_items=len(df) * len(batches))
+
+    # Jalur reading MQTT: satu reading (field payload) per panggilan, profil sudah dikompilasi
+    rules = rule_engine.active_rules()
+    fields = rule_engine.PAYLOAD_FIELDS
+    readings = [dict(zip(fields.values(), values))
+                for values in df[[rule_engine.SENSOR_COLUMNS[p] for p in fields]].to_numpy().tolist()]
+    streaming = summarize(timed_calls(rules.label_reading, readings, streaming_labels))
+
+    expected = np.asarray(rowwise_labels)
+    errors = [f"{name}: {int((np.asarray(labels) != expected).sum())} label beda dari determine_label"
+              for name, labels in (('label_dataframe', batch_labels[0]), ('label_reading', streaming_labels))
+              if not np.array_equal(np.asarray(labels), expected)]
+    ensure_valid('labeling', errors)
+    return {'determine_label': rowwise, 'label_dataframe': vectorized, 'label_reading': streaming}
+
+def bench_training(sizes, seed=0):
+    import train_model
+
+    results = {}
+    for size in sizes:
+        df = make_dataset(size, seed=seed)
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            model = train_model.train_and_evaluate(df)
+        elapsed = time.perf_counter() - start
+        n_predicted = len(model.predict(df[FEATURES].head(100)))
+        ensure_valid('training', [] if n_predicted == min(size, 100) else [f"model {size} baris tidak bisa memprediksi"])
+        results[str(size)] = {'n': size, 'fit_s': round(elapsed, 4), 'rows_per_s': round(size / elapsed, 2)}
+    return results
+
+def bench_inference(df, n_calls):
+    """Jalur dashboard: buat DataFrame 1 baris lalu model.predict(...)[0]."""
+    import joblib
+    from fast_forest import FastForest, FAST_MODEL_PATH
+
+    rows = df[['earth_humidity', 'air_temperature', 'air_humidity', 'luminance']].to_numpy()[:n_calls]
+
+    def dashboard_predict(model):
+        def call(row):
+            input_df = pd.DataFrame([row], columns=FEATURES)
+            return model.predict(input_df)[0]
+        return call
+
+    results, predictions = {}, {}
+    if os.path.exists('model_final.pkl'):
+        predictions['sklearn'] = []
+        results['sklearn'] = summarize(timed_calls(dashboard_predict(joblib.load('model_final.pkl')), rows,
+                                                   predictions['sklearn']))
+    if os.path.exists(FAST_MODEL_PATH):
+        predictions['fast_forest'] = []
+        results['fast_forest'] = summarize(timed_calls(dashboard_predict(FastForest.load(FAST_MODEL_PATH)), rows,
+                                                       predictions['fast_forest']))
+    # Model cepat harus memberi prediksi yang sama persis dengan sklearn
+    if len(predictions) == 2 and predictions['sklearn'] != predictions['fast_forest']:
+        ensure_valid('inference', ["prediksi fast_forest berbeda dari sklearn"])
+    return results
+
+# ==========================================
+# 3. PERBANDINGAN DENGAN BASELINE
+# ==========================================
+def _flatten(results, prefix=''):
+    flat = {}
+    for key, value in results.items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            flat.update(_flatten(value, name + '.'))
+        else:
+            flat[name] = value
+    return flat
+
+def find_regressions(current, baseline, tolerance):
+    """Metrik throughput yang turun atau latensi p99 yang naik lebih dari tolerance (mis. 0.2 = 20%)."""
+    cur, base = _flatten(current), _flatten(baseline)
+    regressions = []
+    for name, old in base.items():
+        new = cur.get(name)
+        if not isinstance(old, (int, float)) or not isinstance(new, (int, float)) or not old:
+            continue
+        if name.endswith(('throughput_per_s', 'rows_per_s', 'throughput_with_disk_per_s')) and new < old * (1 - tolerance):
+            regressions.append(f"{name}: {old:,.2f} -> {new:,.2f}")
+        elif name.endswith('p99_ms') and new > old * (1 + tolerance):
+            regressions.append(f"{name}: {old:,.4f} -> {new:,.4f} ms")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark ingestion, labeling, training & inference")
+    parser.add_argument('--rows', type=int, default=20_000, help="Jumlah baris untuk ingestion & labeling")
+    parser.add_argument('--train-sizes', type=int, nargs='+', default=[1_000, 5_000, 20_000])
+    parser.add_argument('--predict-calls', type=int, default=500)
+    parser.add_argument('--quick', action='store_true', help="Ukuran kecil untuk cek cepat")
+    parser.add_argument('--output', default='bench_results.json')
+    parser.add_argument('--baseline', default=None, help="JSON hasil run sebelumnya untuk dibandingkan")
+    parser.add_argument('--tolerance', type=float, default=0.2)
+    args = parser.parse_args()
+
+    if args.quick:
+        args.rows, args.train_sizes, args.predict_calls = 2_000, [1_000, 2_000], 100
+
+    warnings.filterwarnings('ignore')
+    df = make_dataset(args.rows)
+
+    results = {}
+    print("📨 Benchmark ingestion...")
+    results['ingestion'] = bench_ingestion(df)
+    print("🏷️ Benchmark labeling...")
+    results['labeling'] = bench_labeling(df)
+    print("🤖 Benchmark training...")
+    results['training'] = bench_training(args.train_sizes)
+    print("🔮 Benchmark inference 1 baris...")
+    results['inference'] = bench_inference(df, args.predict_calls)
+
+    report = {
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'cpu_count': os.cpu_count(),
+        'rows': args.rows,
+        'results': results
+    }
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(json.dumps(results, indent=2))
+    print(f"\n💾 Hasil disimpan ke '{args.output}'")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)['results']
+        regressions = find_regressions(results, baseline, args.tolerance)
+        if regressions:
+            print(f"❌ {len(regressions)} regresi (> {args.tolerance:.0%}) dibanding '{args.baseline}':")
+            for line in regressions:
+                print(f"   - {line}")
+            raise SystemExit(1)
+        print(f"✅ Tidak ada regresi dibanding '{args.baseline}'")
+
+if __name__ == "__main__":
+    main()
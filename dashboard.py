@@ -1,14 +1,30 @@
+import time
+# Awal cold start: impor modul + muat model + siapkan pipeline (lihat record_cold_start)
+_SCRIPT_START = time.perf_counter()
 import streamlit as st
 import pandas as pd
-import numpy as np
-import time
-import joblib
+import importlib.util
+import io
 import os
 import json
+import queue
 import warnings
 import paho.mqtt.client as mqtt
-from datetime import datetime
-from sklearn.ensemble import RandomForestClassifier
+from datetime import datetime, timedelta
+from sensor_store import SensorStore, DB_FILE, DEFAULT_DEVICE_ID
+from device_registry import LEGACY_TOPIC
+from mqtt_listener import parse_message
+from live_feed import ReadingBroadcaster
+from dashboard_pipeline import DashboardPipeline
+from anomaly_detector import effective_health
+from rollups import SensorRollups, MAX_CHART_POINTS, bucket_seconds_for
+from fast_forest import FAST_MODEL_PATH, load_model
+from labeling import rule_model
+import rule_engine
+from model_manager import RULE_MODEL_VERSION, ModelManager, active_version
+from prediction_publisher import PredictionPublisher, connect_with_backoff
+from payload_codec import PayloadError
+import metrics
 
 # ==========================================
 # 0. KONFIGURASI
@@ -20,83 +36,123 @@ st.set_page_config(page_title="ESP32 IoT & ML Dashboard", page_icon="📡", layo
 MQTT_BROKER = "broker.emqx.io"
 MQTT_PORT = 1883
 MQTT_TOPIC_PUB = "chilihub/predictions/class"
+# Endpoint Prometheus dashboard (listener/worker memakai --metrics-port sendiri)
+METRICS_PORT = int(os.environ.get("CHILIHUB_METRICS_PORT", 9101))
+# Retraining otomatis opt-in (sama seperti --retrain di listener / --retrain-db di worker)
+AUTO_RETRAIN = os.environ.get("CHILIHUB_AUTO_RETRAIN", "0") == "1"
 
 # ==========================================
 # 1. SETUP MQTT CLIENT
 # ==========================================
+@st.cache_resource
+def get_worker_predictions():
+    # Prediksi terakhir per device dari inference_worker.py (diisi callback MQTT)
+    return {}
+
+@st.cache_resource
+def get_reading_feed():
+    # Data sensor baru di-push dari callback MQTT ke antrean setiap sesi
+    return ReadingBroadcaster()
+
+def on_mqtt_connect(client, userdata, flags, rc):
+    client.subscribe([(MQTT_TOPIC_PUB, 0), (LEGACY_TOPIC, 0)])
+
+def on_mqtt_message(client, userdata, msg):
+    try:
+        if msg.topic == LEGACY_TOPIC:
+            reading = parse_message(msg)
+            if reading is not None:
+                userdata['feed'].publish(reading)
+        else:
+            data = json.loads(msg.payload.decode())
+            userdata['predictions'][data.get('device_id', DEFAULT_DEVICE_ID)] = data
+    except PayloadError:
+        pass  # sudah dihitung di chilihub_payload_rejected_total
+    except Exception:
+        metrics.MESSAGE_ERRORS.inc()
+
+@st.cache_resource
+def start_metrics_endpoint():
+    # Satu server untuk semua sesi; port terpakai (mis. dashboard kedua) tidak fatal
+    try:
+        return metrics.start_metrics_server(METRICS_PORT)
+    except OSError:
+        return None
+
 @st.cache_resource
 def setup_mqtt_client():
-    client = mqtt.Client()
+    client = mqtt.Client(userdata={'predictions': get_worker_predictions(), 'feed': get_reading_feed()})
+    client.on_connect = on_mqtt_connect
+    client.on_message = on_mqtt_message
     try:
-        client.connect(MQTT_BROKER, MQTT_PORT, 60)
-        client.loop_start()
+        # Tidak blok: koneksi (ulang) dengan exponential backoff di thread paho
+        connect_with_backoff(client, MQTT_BROKER, MQTT_PORT, 60)
         return client
     except Exception as e:
         st.error(f"Gagal koneksi ke MQTT Broker: {e}")
         return None
 
+@st.cache_resource
+def get_publisher(_client):
+    # Antrean publish terbatas; saat broker lambat hanya prediksi terbaru yang dikirim
+    return PredictionPublisher(_client, qos=1)
+
+start_metrics_endpoint()
 mqtt_client = setup_mqtt_client()
+publisher = get_publisher(mqtt_client) if mqtt_client else None
+worker_predictions = get_worker_predictions()
 
 # ==========================================
 # 2. FUNGSI LOAD MODEL
 # ==========================================
 @st.cache_resource
 def get_model():
+    # sklearn/joblib hanya di-import jika memang perlu membuka .pkl (impor sklearn ~2 detik)
     model_path = 'model_final.pkl'
-    expected_features = ['earth_humidity', 'air_temperature', 'air_humidity', 'luminance']
+    start = time.perf_counter()
     
-    if os.path.exists(model_path):
-        try:
-            model = joblib.load(model_path)
-            return model, "asli"
-        except: pass 
+    # Prediktor cepat hasil export, memory-mapped (tanpa overhead sklearn per panggilan)
+    for path in (FAST_MODEL_PATH, model_path):
+        if os.path.exists(path):
+            try:
+                return load_model(path), "asli", active_version(), time.perf_counter() - start
+            except Exception as e:
+                print(f"⚠️ Gagal memuat {path}: {e}")
     
-    # Dummy Model
-    X_dummy = pd.DataFrame(
-        [[20, 30, 60, 5000], [50, 34, 55, 4000], [10, 40, 40, 1000], [80, 25, 80, 10000]],
-        columns=expected_features
-    )
-    y_dummy = np.array([0, 0, 2, 0]) 
-    model = RandomForestClassifier()
-    model.fit(X_dummy, y_dummy)
-    return model, "dummy"
-
-model, status_model = get_model()
+    # Model cadangan: aturan threshold profil aktif (rule_engine.py), langsung jadi tanpa training
+    return rule_model(), "dummy", RULE_MODEL_VERSION, time.perf_counter() - start
+
+model, status_model, model_version, model_load_seconds = get_model()
 
 # ==========================================
 # 3. FUNGSI BACA DATA + SENSOR HEALTH
 # ==========================================
-def get_sensor_data_esp32():
-    try:
-        if not os.path.exists("latest_data.json"): 
-            return None 
-        with open("latest_data.json", "r") as f:
-            data = json.load(f)
-        
-        # Extract sensor health
-        sensor_health = data.get('sensor_health', {})
-        
-        return {
-            'timestamp': data.get('timestamp'),
-            'temp': float(data.get('temp', 0)),
-            'rh_air': float(data.get('rh_air', 0)),
-            'rh_soil': float(data.get('rh_soil', 0)),
-            'lux': float(data.get('lux', 0)),
-            'dht_ok': sensor_health.get('dht_ok', False),
-            'photo_ok': sensor_health.get('photo_ok', False),
-            'soil_ok': sensor_health.get('soil_ok', False)
-        }
-    except Exception as e:
-        st.sidebar.error(f"Error membaca data: {e}")
-        return None
+@st.cache_resource
+def get_sensor_store():
+    # Read-only: yang menulis adalah mqtt_listener.py
+    return SensorStore(DB_FILE, readonly=True)
+
+sensor_store = get_sensor_store()
 
 # ==========================================
 # 4. FUNGSI ANALISIS & REKOMENDASI
 # ==========================================
+# (sensor, arah pelanggaran) -> saran; batas diambil dari profil aturan aktif
+RULE_ADVICE = {
+    ('temp', 'low'): "🟡 Suhu di bawah {min:g} °C: tutup sisi greenhouse / kurangi ventilasi",
+    ('temp', 'high'): "🟡 Suhu di atas {max:g} °C: pasang naungan & tambah ventilasi",
+    ('soil', 'low'): "🟡 Kelembapan tanah di bawah {min:g}%: lakukan penyiraman",
+    ('soil', 'high'): "🟡 Kelembapan tanah di atas {max:g}%: kurangi penyiraman, cek drainase",
+    ('air', 'low'): "🟡 Kelembapan udara di bawah {min:g}%: lakukan pengabutan / mulsa",
+    ('air', 'high'): "🟡 Kelembapan udara di atas {max:g}%: perbaiki sirkulasi udara (risiko jamur)",
+    ('lux', 'low'): "🟡 Cahaya di bawah {min:g} lux: kurangi naungan atau tambah lampu",
+    ('lux', 'high'): "🟡 Cahaya di atas {max:g} lux: pasang paranet",
+}
+
 def get_recommendations(temp, rh_air, rh_soil, lux, status):
     """
     Memberikan rekomendasi berdasarkan HASIL PREDIKSI MODEL
-    dan nilai sensor untuk konteks tambahan
+    dan nilai sensor untuk konteks tambahan (dicek terhadap profil aturan aktif)
     """
     recommendations = []
     
@@ -109,6 +165,13 @@ def get_recommendations(temp, rh_air, rh_soil, lux, status):
     else:  # NORMAL
         recommendations.append(" Pertahankan kondisi ini")
     
+    rules = rule_engine.active_rules()
+    reading = {'temp': temp, 'rh_air': rh_air, 'rh_soil': rh_soil, 'lux': lux}
+    for param, direction in rules.check_reading(reading).items():
+        advice = RULE_ADVICE.get((param, direction))
+        if advice:
+            recommendations.append(advice.format(**rules.thresholds[param]))
+    
     return recommendations
 
 def get_sensor_status_summary(dht_ok, photo_ok, soil_ok):
@@ -125,39 +188,123 @@ def get_sensor_status_summary(dht_ok, photo_ok, soil_ok):
 # ==========================================
 # 5. STATISTIK & ANALISIS
 # ==========================================
-def calculate_statistics(df):
-    if len(df) == 0:
+def calculate_statistics(history):
+    # Semua nilai sudah dihitung incremental oleh ring buffer (O(1))
+    if len(history) == 0:
         return None
     
+    counts = history.class_counts()
     stats = {
-        'temp_avg': df['Suhu Udara'].mean(),
-        'temp_max': df['Suhu Udara'].max(),
-        'temp_min': df['Suhu Udara'].min(),
-        'rh_air_avg': df['Kelembapan Udara'].mean(),
-        'rh_soil_avg': df['Tanah'].mean(),
-        'lux_avg': df['Cahaya'].mean(),
-        'normal_count': (df['Prediksi'] == 'NORMAL').sum(),
-        'warning_count': (df['Prediksi'] == 'WARNING').sum(),
-        'critical_count': (df['Prediksi'] == 'CRITICAL').sum()
+        'temp_avg': history.mean('Suhu Udara'),
+        'temp_max': history.max('Suhu Udara'),
+        'temp_min': history.min('Suhu Udara'),
+        'rh_air_avg': history.mean('Kelembapan Udara'),
+        'rh_soil_avg': history.mean('Tanah'),
+        'lux_avg': history.mean('Cahaya'),
+        'normal_count': counts['NORMAL'],
+        'warning_count': counts['WARNING'],
+        'critical_count': counts['CRITICAL']
     }
     return stats
 
 # ==========================================
 # 6. INITIALIZE SESSION STATE
 # ==========================================
-COL_NAMES = ['Waktu', 'Tanah', 'Suhu Udara', 'Kelembapan Udara', 'Cahaya', 'Prediksi']
+SENSOR_COLS = ['Tanah', 'Suhu Udara', 'Kelembapan Udara', 'Cahaya']
+STATUS_CLASSES = ['NORMAL', 'WARNING', 'CRITICAL']
+HISTORY_OPTIONS = [20, 50, 100, 200, 500, 1000, 5000, 20000, 100000]
+# Rentang grafik (detik); None = data mentah terbaru dari histori bersama
+CHART_RANGES = {"Data terbaru": None, "1 jam": 3600, "6 jam": 6 * 3600, "24 jam": 86400,
+                "7 hari": 7 * 86400, "30 hari": 30 * 86400}
+ROLLUP_BACKFILL_DAYS = 30
+# Kolom database -> kolom grafik (urutan sama dengan SENSOR_COLS)
+DB_TO_SENSOR_COLS = {'rh_soil': 'Tanah', 'temp': 'Suhu Udara', 'rh_air': 'Kelembapan Udara', 'lux': 'Cahaya'}
 
-if 'data_history' not in st.session_state:
-    st.session_state.data_history = pd.DataFrame(columns=COL_NAMES)
+def build_rollups():
+    # Isi awal rollup dari database agar grafik harian/mingguan langsung tersedia
+    rollups = SensorRollups(SENSOR_COLS)
+    try:
+        chunks = sensor_store.query(start=time.time() - ROLLUP_BACKFILL_DAYS * 86400,
+                                    device_id=DEFAULT_DEVICE_ID, chunksize=200_000)
+        for chunk in chunks:
+            chunk = chunk.dropna(subset=list(DB_TO_SENSOR_COLS))
+            rollups.extend(chunk['ts'].to_numpy(), chunk[list(DB_TO_SENSOR_COLS)].to_numpy())
+    except Exception as e:
+        print(f"⚠️ Gagal memuat histori grafik: {e}")
+    return rollups
 
-if 'sensor_error_log' not in st.session_state:
-    st.session_state.sensor_error_log = []
+@st.cache_resource
+def get_pipeline():
+    # Satu pipeline untuk semua sesi: setiap reading diprediksi & di-publish sekali saja,
+    # berapa pun jumlah browser yang membuka dashboard
+    return DashboardPipeline(get_reading_feed(), sensor_store, model, publisher, MQTT_TOPIC_PUB,
+                             worker_predictions, SENSOR_COLS, STATUS_CLASSES, rollups=build_rollups(),
+                             model_version=model_version)
 
-if 'total_predictions' not in st.session_state:
-    st.session_state.total_predictions = 0
+pipeline = get_pipeline()
+
+@st.cache_resource
+def get_model_manager():
+    # Cek drift & retraining di latar belakang; model baru dipasang ke pipeline tanpa restart
+    if not AUTO_RETRAIN:
+        return None
+    manager = ModelManager(model, sensor_store, DB_FILE, version=model_version)
+    manager.subscribe(pipeline.swap_model)
+    return manager.start()
+
+model_manager = get_model_manager()
+
+@st.cache_resource
+def follow_rule_profile():
+    # Profil aturan diganti dari sidebar: model cadangan ikut diganti tanpa restart
+    def apply(rules):
+        if pipeline.cache.version == RULE_MODEL_VERSION:
+            pipeline.swap_model(rules.model(), RULE_MODEL_VERSION)
+    rule_engine.subscribe(apply)
+    return apply
 
-if 'mqtt_sent_count' not in st.session_state:
-    st.session_state.mqtt_sent_count = 0
+follow_rule_profile()
+
+@st.cache_resource
+def record_cold_start(_start):
+    # Sekali per proses: waktu dari awal script pertama sampai model & pipeline siap
+    seconds = time.perf_counter() - _start
+    metrics.COLD_START_SECONDS.set(seconds)
+    print(f"🚀 Dashboard siap dalam {seconds:.2f} detik (muat model {model_load_seconds * 1e3:.0f} ms)")
+    return seconds
+
+cold_start_seconds = record_cold_start(_SCRIPT_START)
+
+if 'result_queue' not in st.session_state:
+    st.session_state.result_queue = pipeline.subscribe()
+
+def snapshot_history(chart_range, raw_rows=20):
+    """Salinan histori bersama untuk dirender sesi ini (dibaca di bawah lock pipeline)."""
+    with pipeline.lock:
+        history = pipeline.history
+        n = len(history)
+        if n == 0:
+            return None
+        if chart_range is None:
+            # Data mentah terbaru, maksimal MAX_CHART_POINTS titik
+            n_points = min(n, MAX_CHART_POINTS)
+            chart_df = pd.DataFrame(history.view()[-n_points:].copy(), columns=SENSOR_COLS,
+                                    index=history.times()[-n_points:].copy())
+            chart_caption = f"{n_points} data terakhir"
+        else:
+            # Resolusi rollup yang muat di grafik untuk rentang ini
+            level = pipeline.rollups.select(chart_range)
+            chart_df = pipeline.rollups.frame(level, start=time.time() - chart_range)
+            chart_caption = f"Rata-rata per {level} ({len(chart_df)} titik)"
+        return {
+            'size': n,
+            'means': {col: history.mean(col) for col in SENSOR_COLS},
+            'stats': calculate_statistics(history),
+            'status_counts': pd.Series(history.class_counts()),
+            'chart_df': chart_df,
+            'chart_caption': chart_caption,
+            'raw': history.to_frame('Waktu', 'Prediksi', last=raw_rows)
+        }
 
 # ==========================================
 # 7. UI HEADER
@@ -165,8 +312,9 @@ if 'mqtt_sent_count' not in st.session_state:
 st.title("📡 Dashboard Monitoring IoT & Machine Learning")
 st.caption("Sistem monitoring real-time dengan analisis prediktif dan health check sensor")
 
-if status_model == "dummy":
-    st.warning("⚠️ Menggunakan Model Simulasi (Dummy Model)")
+if pipeline.cache.version == RULE_MODEL_VERSION:
+    st.warning("⚠️ Model tidak ditemukan, memakai model cadangan "
+               f"(aturan threshold profil {rule_engine.active_rules().name})")
 else:
     if 'model_notified' not in st.session_state:
         st.toast("✅ Model ML Siap Digunakan!", icon="✅")
@@ -182,32 +330,88 @@ st.sidebar.header("🎛️ Panel Kontrol")
 # Tabs di sidebar
 tab_control, tab_settings, tab_info = st.sidebar.tabs(["Kontrol", "Pengaturan", "Info"])
 
+def to_parquet_bytes(df):
+    # pyarrow opsional dan baru di-import saat ekspor (tidak memperlambat start dashboard)
+    if importlib.util.find_spec('pyarrow') is None:
+        return None
+    buffer = io.BytesIO()
+    df.to_parquet(buffer, index=False)
+    return buffer.getvalue()
+
 with tab_control:
     is_running = st.toggle("🔴 Mulai Monitoring", value=False)
     
     if st.button("🗑️ Hapus Riwayat Data"):
-        st.session_state.data_history = pd.DataFrame(columns=COL_NAMES)
-        st.session_state.sensor_error_log = []
+        pipeline.clear()
         st.success("Data direset!")
     
     if st.button("📥 Ekspor Data CSV"):
-        if len(st.session_state.data_history) > 0:
-            csv = st.session_state.data_history.to_csv(index=False)
+        with pipeline.lock:
+            export_df = pipeline.history.to_frame('Waktu', 'Prediksi') if len(pipeline.history) > 0 else None
+        if export_df is not None:
+            csv = export_df.to_csv(index=False)
             st.download_button("Download CSV", csv, "sensor_data.csv", "text/csv")
+            parquet = to_parquet_bytes(export_df)
+            if parquet is not None:
+                st.download_button("Download Parquet", parquet, "sensor_data.parquet", "application/octet-stream")
         else:
             st.warning("Tidak ada data untuk diekspor")
 
+# Pengaturan pipeline berlaku untuk semua sesi; hanya diubah saat widget benar-benar digeser
+def set_poll_interval():
+    pipeline.poll_interval = st.session_state.refresh_rate
+
+def set_history_size():
+    pipeline.resize(st.session_state.max_history)
+
+def set_use_worker():
+    pipeline.use_worker = st.session_state.use_worker
+
+def set_rule_profile():
+    rule_engine.set_profile(st.session_state.rule_profile)
+
 with tab_settings:
-    refresh_rate = st.slider("Refresh Rate (detik)", 1.0, 10.0, 2.0, 0.5)
-    max_history = st.slider("Maksimal Data Tersimpan", 20, 200, 50, 10)
+    refresh_rate = st.slider("Interval Cek Database (detik)", 1.0, 10.0, float(pipeline.poll_interval), 0.5,
+                             key="refresh_rate", on_change=set_poll_interval,
+                             help="Dashboard update otomatis saat data MQTT masuk; database dicek jika tidak ada push")
+    st.select_slider("Maksimal Data Tersimpan", HISTORY_OPTIONS, value=pipeline.history.capacity,
+                     key="max_history", on_change=set_history_size,
+                     help="Histori dipakai bersama oleh semua penonton dashboard")
+    chart_range = CHART_RANGES[st.selectbox("Rentang Grafik", list(CHART_RANGES),
+                                            help="Rentang panjang memakai rata-rata per 1 menit / 15 menit / 1 jam")]
+    profiles = rule_engine.profile_names()
+    st.selectbox("Profil Aturan (tanaman/fase)", profiles, index=profiles.index(rule_engine.active_rules().name),
+                 key="rule_profile", on_change=set_rule_profile,
+                 help="Threshold untuk rekomendasi & model cadangan; berlaku untuk semua sesi")
     show_raw_data = st.checkbox("Tampilkan Data Mentah", value=False)
     show_stats = st.checkbox("Tampilkan Statistik", value=True)
+    st.checkbox("Prediksi dari inference_worker.py", value=pipeline.use_worker,
+                key="use_worker", on_change=set_use_worker,
+                help="Dashboard tidak menghitung & publish prediksi sendiri")
 
 with tab_info:
-    st.metric("Total Prediksi", st.session_state.total_predictions)
-    st.metric("MQTT Terkirim", st.session_state.mqtt_sent_count)
+    st.metric("Total Prediksi", pipeline.prediction_count)
+    st.metric("MQTT Terkirim", pipeline.publish_count)
+    st.caption(f"Cache prediksi: {len(pipeline.cache)} vektor | hit {pipeline.cache.hit_rate:.0%}")
+    if model_manager is not None:
+        report = model_manager.last_report
+        st.caption(f"Versi model: {pipeline.cache.version or '-'} | Diganti: {model_manager.swap_count}x"
+                   + (f" | Cek drift: {report['action']}" if report else ""))
+    else:
+        st.caption(f"Versi model: {pipeline.cache.version or '-'} | Retraining otomatis: nonaktif")
+    st.caption(f"Profil aturan: {rule_engine.active_rules().name}")
+    st.caption(f"Penonton aktif: {len(pipeline.results)}")
     st.caption(f"Broker: {MQTT_BROKER}")
     st.caption(f"Topik Pub: {MQTT_TOPIC_PUB}")
+    if publisher:
+        st.caption(f"{'🟢 Terhubung' if publisher.connected else '🔴 Terputus (mencoba ulang)'} | "
+                   f"In-flight: {publisher.inflight_count} | Antre: {publisher.pending_count} | "
+                   f"Diganti: {publisher.coalesced_count} | Dibuang: {publisher.dropped_count}")
+    p99 = metrics.INFERENCE_SECONDS.quantile(0.99)
+    if p99 is not None:
+        st.caption(f"Inferensi p99 ≤ {p99 * 1e3:g} ms | Gagal publish: {metrics.PUBLISH_FAILURES.value:g}")
+    st.caption(f"Cold start: {cold_start_seconds:.2f} s | Muat model: {model_load_seconds * 1e3:.0f} ms")
+    st.caption(f"Metrik: http://127.0.0.1:{METRICS_PORT}/metrics")
 
 # ==========================================
 # 9. MAIN DASHBOARD LOOP
@@ -219,24 +423,42 @@ placeholder_charts = st.empty()
 placeholder_stats = st.empty()
 placeholder_raw = st.empty()
 
+def next_result(results, timeout):
+    """Hasil pipeline terbaru untuk sesi ini; hasil yang menumpuk dilewati (histori sudah lengkap)."""
+    try:
+        result = results.get(timeout=timeout)
+    except queue.Empty:
+        # Sesi baru / tidak ada data baru: tampilkan hasil terakhir pipeline sekali
+        return pipeline.last_result
+    while True:
+        try:
+            result = results.get_nowait()
+        except queue.Empty:
+            return result
+
+# Setiap rerun (mis. pengaturan diubah) menggambar ulang hasil terakhir
+last_result = None
 while is_running:
-    sensor_data = get_sensor_data_esp32()
+    result = next_result(st.session_state.result_queue, refresh_rate)
     
-    if sensor_data is None:
+    if result is None:
         with placeholder_main.container():
-            st.error("❌ Tidak dapat membaca data sensor. Pastikan mqtt_subscriber.py berjalan!")
-        time.sleep(refresh_rate)
+            st.error("❌ Tidak dapat membaca data sensor. Pastikan mqtt_listener.py berjalan!")
+        continue
+    if result is last_result:
         continue
+    last_result = result
+    sensor_data = result['record']
     
     # Extract data
-    timestamp = sensor_data['timestamp']
-    temp = sensor_data['temp']
-    rh_air = sensor_data['rh_air']
-    rh_soil = sensor_data['rh_soil']
-    lux = sensor_data['lux']
-    dht_ok = sensor_data['dht_ok']
-    photo_ok = sensor_data['photo_ok']
-    soil_ok = sensor_data['soil_ok']
+    timestamp = sensor_data.timestamp
+    temp = sensor_data.temp
+    rh_air = sensor_data.rh_air
+    rh_soil = sensor_data.rh_soil
+    lux = sensor_data.lux
+    # Flag firmware digabung dengan hasil deteksi anomali (sensor macet/spike ikut dianggap bermasalah)
+    health = effective_health(sensor_data)
+    dht_ok, photo_ok, soil_ok = health['dht_ok'], health['photo_ok'], health['soil_ok']
     
     # SENSOR HEALTH CHECK
     with placeholder_health.container():
@@ -260,72 +482,37 @@ while is_running:
         else:
             col_s4.error(overall_msg)
         
-        # Log sensor errors
-        if not (dht_ok and photo_ok and soil_ok):
-            error_detail = []
-            if not dht_ok: error_detail.append("DHT22")
-            if not photo_ok: error_detail.append("BH1750")
-            if not soil_ok: error_detail.append("Soil")
-            
-            error_entry = {
-                'time': timestamp,
-                'sensors': ', '.join(error_detail)
-            }
-            if error_entry not in st.session_state.sensor_error_log[-5:]:
-                st.session_state.sensor_error_log.append(error_entry)
-        
-        # Show recent errors
-        if len(st.session_state.sensor_error_log) > 0:
+        # Show recent errors (dicatat pipeline)
+        recent_errors = list(pipeline.error_log)[-5:]
+        if len(recent_errors) > 0:
             with st.expander("📋 Riwayat Error Sensor (5 terakhir)"):
-                for err in st.session_state.sensor_error_log[-5:]:
+                for err in recent_errors:
                     st.caption(f"⏰ {err['time']} - Sensor bermasalah: {err['sensors']}")
     
     st.markdown("---")
-    
-    # PREDICTION
-    input_df = pd.DataFrame(
-        [[rh_soil, temp, rh_air, lux]], 
-        columns=['earth_humidity', 'air_temperature', 'air_humidity', 'luminance']
-    )
-    
-    try:
-        prediksi_label = model.predict(input_df)[0]
-        st.session_state.total_predictions += 1
-    except:
-        prediksi_label = 0 
 
-    label_map = {0: "NORMAL", 1: "WARNING", 2: "CRITICAL"}
-    status_text = label_map.get(prediksi_label, "UNKNOWN")
-    
-    # MQTT PUBLISH
-    if mqtt_client:
-        try:
-            payload_kirim = json.dumps({
-                "status": status_text,
-                "code": int(prediksi_label),
-                "timestamp": timestamp,
-                "sensors_ok": dht_ok and photo_ok and soil_ok
-            })
-            
-            mqtt_client.publish(MQTT_TOPIC_PUB, payload_kirim)
-            st.session_state.mqtt_sent_count += 1
-            
-        except Exception as e:
-            st.sidebar.error(f"MQTT Error: {e}")
-    
-    # SAVE HISTORY
-    new_row = pd.DataFrame({
-        'Waktu': [timestamp],
-        'Tanah': [rh_soil],
-        'Suhu Udara': [temp],
-        'Kelembapan Udara': [rh_air],
-        'Cahaya': [lux],
-        'Prediksi': [status_text]
-    })
+    # Nilai sensor kosong: jangan diprediksi dengan angka palsu
+    missing = result['missing']
+    if missing:
+        with placeholder_main.container():
+            st.warning(f"⚠️ Data sensor tidak lengkap ({', '.join(missing)} kosong) pada {timestamp}, "
+                       "prediksi dilewati")
+        continue
+    untrusted = result['untrusted']
+    if untrusted:
+        with placeholder_main.container():
+            kinds = ', '.join(f"{s}: {sensor_data.faults[s]}" for s in untrusted)
+            st.warning(f"⚠️ Nilai sensor tidak wajar ({kinds}) pada {timestamp}, prediksi dilewati")
+        continue
     
-    st.session_state.data_history = pd.concat([st.session_state.data_history, new_row], ignore_index=True)
-    if len(st.session_state.data_history) > max_history:
-        st.session_state.data_history = st.session_state.data_history.tail(max_history)
+    # Prediksi & publish sudah dilakukan sekali oleh pipeline bersama
+    prediksi_label = result['code']
+    status_text = result['status']
+    if result['confidence'] is not None:
+        status_text = f"{status_text} ({result['confidence']:.0%})"
+    snapshot = snapshot_history(chart_range)
+    n_history = snapshot['size'] if snapshot else 0
+    means = snapshot['means'] if snapshot else {}
 
     # MAIN KPI DISPLAY
     with placeholder_main.container():
@@ -333,16 +520,18 @@ while is_running:
         kpi1, kpi2, kpi3, kpi4, kpi5 = st.columns(5)
         
         kpi1.metric("🌡️ Suhu", f"{temp:.1f} °C", 
-                   delta=f"{temp - st.session_state.data_history['Suhu Udara'].mean():.1f}" if len(st.session_state.data_history) > 1 else None)
+                   delta=f"{temp - means['Suhu Udara']:.1f}" if n_history > 1 else None)
         kpi2.metric("💧 Kelembapan Udara", f"{rh_air:.1f} %",
-                   delta=f"{rh_air - st.session_state.data_history['Kelembapan Udara'].mean():.1f}" if len(st.session_state.data_history) > 1 else None)
+                   delta=f"{rh_air - means['Kelembapan Udara']:.1f}" if n_history > 1 else None)
         kpi3.metric("🌱 Kelembapan Tanah", f"{rh_soil:.1f} %",
-                   delta=f"{rh_soil - st.session_state.data_history['Tanah'].mean():.1f}" if len(st.session_state.data_history) > 1 else None)
+                   delta=f"{rh_soil - means['Tanah']:.1f}" if n_history > 1 else None)
         kpi4.metric("☀️ Intensitas Cahaya", f"{lux:.0f} lux",
-                   delta=f"{lux - st.session_state.data_history['Cahaya'].mean():.0f}" if len(st.session_state.data_history) > 1 else None)
+                   delta=f"{lux - means['Cahaya']:.0f}" if n_history > 1 else None)
         
         # Status Prediksi dengan warna
-        if prediksi_label == 0: 
+        if prediksi_label is None:
+            kpi5.info(f"⏳ {status_text}")
+        elif prediksi_label == 0: 
             kpi5.success(f"✅ {status_text}")
         elif prediksi_label == 1: 
             kpi5.warning(f"⚠️ {status_text}")
@@ -353,7 +542,7 @@ while is_running:
     
     # RECOMMENDATIONS
     with placeholder_recommendations.container():
-        recommendations = get_recommendations(temp, rh_air, rh_soil, lux, status_text)
+        recommendations = get_recommendations(temp, rh_air, rh_soil, lux, result['status'])
         
         st.subheader("💡 Rekomendasi & Analisis")
         for rec in recommendations:
@@ -370,21 +559,22 @@ while is_running:
     with placeholder_charts.container():
         st.subheader("📈 Grafik Monitoring Real-time")
         
-        if len(st.session_state.data_history) > 0:
+        if snapshot:
+            chart_df = snapshot['chart_df']
+            st.caption(snapshot['chart_caption'])
             chart_col1, chart_col2 = st.columns(2)
             
             with chart_col1:
                 st.caption("Suhu & Kelembapan")
-                st.line_chart(st.session_state.data_history.set_index('Waktu')[['Suhu Udara', 'Kelembapan Udara', 'Tanah']])
+                st.line_chart(chart_df[['Suhu Udara', 'Kelembapan Udara', 'Tanah']])
             
             with chart_col2:
                 st.caption("Intensitas Cahaya")
-                st.line_chart(st.session_state.data_history.set_index('Waktu')[['Cahaya']], color="#FFA500")
+                st.line_chart(chart_df[['Cahaya']], color="#FFA500")
             
             # Distribution chart
             st.caption("📊 Distribusi Status Prediksi")
-            status_counts = st.session_state.data_history['Prediksi'].value_counts()
-            st.bar_chart(status_counts)
+            st.bar_chart(snapshot['status_counts'])
     
     # STATISTICS
     if show_stats:
@@ -392,7 +582,7 @@ while is_running:
             st.markdown("---")
             st.subheader("📉 Statistik Sesi Monitoring")
             
-            stats = calculate_statistics(st.session_state.data_history)
+            stats = snapshot['stats'] if snapshot else None
             if stats:
                 stat_col1, stat_col2, stat_col3, stat_col4 = st.columns(4)
                 
@@ -410,9 +600,8 @@ while is_running:
         with placeholder_raw.container():
             st.markdown("---")
             st.subheader("📋 Tabel Data Mentah")
-            st.dataframe(st.session_state.data_history.tail(20), use_container_width=True)
-    
-    time.sleep(refresh_rate)
+            if snapshot:
+                st.dataframe(snapshot['raw'], use_container_width=True)
 
 # ==========================================
 # 10. INFO KETIKA TIDAK MONITORING
@@ -421,6 +610,31 @@ if not is_running:
     st.info("👆 Aktifkan toggle 'Mulai Monitoring' di sidebar untuk memulai monitoring real-time")
     
     # Show last data if available
-    if len(st.session_state.data_history) > 0:
+    with pipeline.lock:
+        last_rows = pipeline.history.to_frame('Waktu', 'Prediksi', last=10) if len(pipeline.history) > 0 else None
+    if last_rows is not None:
         st.subheader("📊 Data Terakhir yang Tersimpan")
-        st.dataframe(st.session_state.data_history.tail(10), use_container_width=True)
\ No newline at end of file
+        st.dataframe(last_rows, use_container_width=True)
+
+    # Histori dari database (query berdasarkan rentang waktu)
+    st.subheader("🗄️ Riwayat Sensor dari Database")
+    col_h1, col_h2 = st.columns(2)
+    hist_start = col_h1.date_input("Dari tanggal", value=datetime.now().date() - timedelta(days=1))
+    hist_end = col_h2.date_input("Sampai tanggal", value=datetime.now().date())
+
+    hist_from = datetime.combine(hist_start, datetime.min.time())
+    hist_to = datetime.combine(hist_end + timedelta(days=1), datetime.min.time())
+    n_rows = sensor_store.count(start=hist_from, end=hist_to)
+    if 0 < n_rows <= MAX_CHART_POINTS:
+        history = sensor_store.query(start=hist_from, end=hist_to)
+        st.caption(f"{n_rows} data ditemukan")
+        st.line_chart(history.set_index('timestamp')[['temp', 'rh_air', 'rh_soil']])
+    elif n_rows > MAX_CHART_POINTS:
+        # Agregasi di SQLite: hanya satu titik per bucket yang dibaca & dikirim ke grafik
+        bucket = bucket_seconds_for((hist_to - hist_from).total_seconds())
+        history = sensor_store.query_rollup(bucket, start=hist_from, end=hist_to)
+        st.caption(f"{n_rows} data ditemukan, ditampilkan rata-rata per {bucket // 60} menit")
+        chart_df = history.set_index('timestamp')[['temp_mean', 'rh_air_mean', 'rh_soil_mean']]
+        st.line_chart(chart_df.rename(columns=lambda c: c.removesuffix('_mean')))
+    else:
+        st.caption("Belum ada data pada rentang waktu ini")
\ No newline at end of file
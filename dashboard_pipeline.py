@@ -0,0 +1,173 @@
+import json
+import queue
+import threading
+import time
+from collections import deque
+
+from anomaly_detector import AnomalyDetector, HEALTH_SENSORS, untrusted_sensors
+from inference_worker import FEATURES, LABEL_MAP
+from live_feed import ReadingBroadcaster, reading_key
+from payload_codec import SensorRecord
+from prediction_cache import PredictionCache
+from ring_buffer import SensorRingBuffer
+
+# Nama modul sensor di dashboard -> flag health firmware
+SENSOR_MODULES = (("DHT22", 'dht_ok'), ("BH1750", 'photo_ok'), ("Soil", 'soil_ok'))
+
+# ==========================================
+# PIPELINE BERSAMA UNTUK SEMUA SESI DASHBOARD
+# ==========================================
+class DashboardPipeline:
+    """
+    Satu thread per proses dashboard yang mengambil reading baru (push MQTT, atau cek
+    database jika tidak ada push), memprediksi & publish tepat satu kali, lalu menyimpan
+    hasilnya di histori bersama. Sesi Streamlit hanya membaca: subscribe() untuk
+    notifikasi hasil baru, dan `with pipeline.lock:` saat membaca history/rollups.
+    Jadi beban CPU dan jumlah publish MQTT tidak bertambah walau penonton bertambah.
+    """
+
+    def __init__(self, feed, store, model, publisher, topic, worker_predictions, columns, classes,
+                 history_size=50, rollups=None, poll_interval=2.0, model_version=None):
+        self.store = store
+        # ESP32 sering mengirim ulang nilai yang sama -> prediksi diambil dari cache
+        self.cache = PredictionCache(model, FEATURES, version=model_version)
+        self.publisher = publisher
+        self.topic = topic
+        self.worker_predictions = worker_predictions
+        self.history = SensorRingBuffer(history_size, columns, classes)
+        self.rollups = rollups
+        self.error_log = deque(maxlen=50)
+        # Dicek sekali per reading di thread pipeline, bukan per sesi / per refresh
+        self.detector = AnomalyDetector()
+        self.lock = threading.Lock()
+
+        # Pengaturan bersama (diubah dari sidebar, berlaku untuk semua sesi)
+        self.poll_interval = poll_interval
+        self.use_worker = False
+
+        self.prediction_count = 0
+        self.publish_count = 0
+        self.last_result = None
+        self.results = ReadingBroadcaster()
+
+        self._input = feed.subscribe()
+        self._last = {'ts': None, 'key': None}
+        self._thread = threading.Thread(target=self._loop, name="dashboard-pipeline", daemon=True)
+        self._thread.start()
+
+    # --- API UNTUK SESI ---
+    def subscribe(self):
+        """Antrean hasil baru untuk satu sesi."""
+        return self.results.subscribe()
+
+    def resize(self, capacity):
+        with self.lock:
+            self.history.resize(capacity)
+
+    def swap_model(self, model, version=None):
+        """Hot-swap dari ModelManager: reading berikutnya diprediksi model baru."""
+        self.cache.swap_model(model, version)
+
+    def clear(self):
+        with self.lock:
+            self.history.clear()
+            self.error_log.clear()
+
+    # --- THREAD PIPELINE ---
+    def _next_reading(self):
+        try:
+            return self._input.get(timeout=self.poll_interval)
+        except queue.Empty:
+            pass
+        # Tidak ada push MQTT: cek apakah listener menyimpan data yang lebih baru
+        try:
+            data = self.store.latest()
+        except Exception as e:
+            print(f"❌ Error membaca data: {e}")
+            return None
+        if data is not None and data.get('ts') != self._last['ts']:
+            return data
+        return None
+
+    def _loop(self):
+        while True:
+            reading = self._next_reading()
+            if reading is None:
+                continue
+            # Lewati reading yang sama persis dengan sebelumnya (tidak perlu prediksi & redraw)
+            self._last['ts'] = reading.get('ts')
+            key = reading_key(reading)
+            if key == self._last['key']:
+                continue
+            self._last['key'] = key
+            try:
+                self._process(SensorRecord.from_reading(reading))
+            except Exception as e:
+                print(f"❌ Error di pipeline dashboard: {e}")
+
+    def _predict(self, record):
+        if self.use_worker:
+            # Sudah diklasifikasi sekali oleh inference_worker.py, dashboard hanya menampilkan
+            prediction = self.worker_predictions.get(record.device_id)
+            code = prediction['code'] if prediction else None
+            confidence = prediction.get('confidence') if prediction else None
+            version = prediction.get('model_version') if prediction else None
+            return code, LABEL_MAP.get(code, "MENUNGGU"), confidence, version
+
+        try:
+            codes, confidences, version = self.cache.predict_versioned(
+                [[record.rh_soil, record.temp, record.rh_air, record.lux]])
+            code, confidence = int(codes[0]), float(confidences[0])
+            self.prediction_count += 1
+        except Exception as e:
+            print(f"❌ Error prediksi: {e}")
+            code, confidence, version = 0, None, None
+        return code, LABEL_MAP.get(code, "UNKNOWN"), confidence, version
+
+    def _publish(self, record, code, status, confidence, version):
+        if self.publisher is None or self.use_worker:
+            return
+        payload = json.dumps({
+            "status": status,
+            "code": code,
+            "confidence": None if confidence is None else round(confidence, 4),
+            "timestamp": record.timestamp,
+            "sensors_ok": bool(record.dht_ok and record.photo_ok and record.soil_ok and not record.faults),
+            "sensor_faults": record.faults or {},
+            "model_version": version,
+            "sent_ts": record.sent_ts
+        })
+        # Non-blocking: dikirim thread publisher (QoS 1) saat broker siap
+        self.publisher.submit(self.topic, payload, origin_ts=record.sent_ts or record.ts)
+        self.publish_count += 1
+
+    def _process(self, record):
+        faults = self.detector.check(record)
+        failed = []
+        for name, flag in SENSOR_MODULES:
+            kinds = sorted({faults[s] for s in HEALTH_SENSORS[flag] if s in faults})
+            if not getattr(record, flag):
+                failed.append(name)
+            elif kinds:
+                failed.append(f"{name} ({', '.join(kinds)})")
+        if failed:
+            entry = {'time': record.timestamp, 'sensors': ', '.join(failed)}
+            if entry not in list(self.error_log)[-5:]:
+                self.error_log.append(entry)
+
+        result = {'record': record, 'code': None, 'status': None, 'confidence': None, 'model_version': None,
+                  'missing': record.missing(), 'untrusted': untrusted_sensors(faults)}
+        # Nilai sensor kosong / mustahil: jangan diprediksi dengan angka palsu
+        if not result['missing'] and not result['untrusted']:
+            code, status, confidence, version = self._predict(record)
+            self._publish(record, code, status, confidence, version)
+            values = [record.rh_soil, record.temp, record.rh_air, record.lux]
+            with self.lock:
+                self.history.append(record.timestamp, values, status)
+                if self.rollups is not None:
+                    self.rollups.add(record.ts or time.time(), values)
+            result['code'], result['status'], result['confidence'] = code, status, confidence
+            result['model_version'] = version
+
+        self.last_result = result
+        self.results.publish(result)
@@ -0,0 +1,98 @@
+import threading
+import zlib
+from collections import deque
+
+from sensor_store import DEFAULT_DEVICE_ID
+
+# ==========================================
+# 1. KONFIGURASI TOPIC MULTI-DEVICE
+# ==========================================
+# Topic lama (satu device) tetap didukung dan dipetakan ke device 'default'
+LEGACY_TOPIC = "chilihub/data/sensors"
+DEVICE_TOPIC_WILDCARD = "chilihub/+/data/sensors"
+LEGACY_PREDICTION_TOPIC = "chilihub/predictions/class"
+
+def device_topic(device_id):
+    """Topic publish untuk satu device, contoh: chilihub/esp32-001/data/sensors"""
+    return f"chilihub/{device_id}/data/sensors"
+
+def prediction_topic(device_id):
+    """Topic hasil prediksi. Device 'default' tetap memakai topic lama yang di-subscribe ESP32."""
+    if device_id == DEFAULT_DEVICE_ID:
+        return LEGACY_PREDICTION_TOPIC
+    return f"chilihub/{device_id}/predictions/class"
+
+def device_id_from_topic(topic):
+    """Ambil device_id dari topic. None jika topic bukan topic data sensor."""
+    if topic == LEGACY_TOPIC:
+        return DEFAULT_DEVICE_ID
+    parts = topic.split('/')
+    if len(parts) == 4 and parts[0] == 'chilihub' and parts[2] == 'data' and parts[3] == 'sensors':
+        return parts[1]
+    return None
+
+# ==========================================
+# 2. STATE PER DEVICE (SHARDED)
+# ==========================================
+class DeviceState:
+    __slots__ = ('latest', 'history', 'message_count')
+
+    def __init__(self, history_size):
+        self.latest = None
+        self.history = deque(maxlen=history_size)
+        self.message_count = 0
+
+class DeviceRegistry:
+    """
+    Menyimpan data terakhir + histori singkat per device di memori.
+
+    Device dibagi ke beberapa shard, masing-masing dengan lock sendiri,
+    sehingga thread yang membaca satu device tidak menahan update device lain.
+    """
+
+    def __init__(self, n_shards=16, history_size=100):
+        self.history_size = history_size
+        self._shards = [{} for _ in range(n_shards)]
+        self._locks = [threading.Lock() for _ in range(n_shards)]
+
+    def _shard(self, device_id):
+        return zlib.crc32(device_id.encode()) % len(self._shards)
+
+    def update(self, device_id, reading):
+        i = self._shard(device_id)
+        with self._locks[i]:
+            state = self._shards[i].get(device_id)
+            if state is None:
+                state = self._shards[i][device_id] = DeviceState(self.history_size)
+            state.latest = reading
+            state.history.append(reading)
+            state.message_count += 1
+
+    def latest(self, device_id):
+        i = self._shard(device_id)
+        with self._locks[i]:
+            state = self._shards[i].get(device_id)
+            return None if state is None else state.latest
+
+    def history(self, device_id):
+        """Salinan histori device (list, dari yang paling lama)."""
+        i = self._shard(device_id)
+        with self._locks[i]:
+            state = self._shards[i].get(device_id)
+            return [] if state is None else list(state.history)
+
+    def message_count(self, device_id):
+        i = self._shard(device_id)
+        with self._locks[i]:
+            state = self._shards[i].get(device_id)
+            return 0 if state is None else state.message_count
+
+    def devices(self):
+        result = []
+        for shard, lock in zip(self._shards, self._locks):
+            with lock:
+                result.extend(shard.keys())
+        return sorted(result)
+
+    def __len__(self):
+        return sum(len(shard) for shard in self._shards)
@@ -0,0 +1,361 @@
+"""
+Simulator ESP32 berkecepatan tinggi untuk uji beban listener, inference worker & dashboard.
+
+Ribuan device virtual dibagi ke beberapa proses; setiap proses punya satu koneksi MQTT
+dan publish payload berformat publishSensorDataJSON (esp32_code.ino) ke
+chilihub/<device_id>/data/sensors. Nilai sensor dibuat dengan generator
+dummy_data_maker.py (profil rule_engine.py / RANGES yang sama), ditambah fault opsional:
+
+- dropout   : satu modul sensor gagal membaca (nilai null, flag health false)
+- stuck     : kelembapan tanah satu device membeku selama --stuck-seconds detik (default
+              STUCK_SECONDS['rh_soil'] anomaly_detector.py); detector baru menandainya setelah
+              window itu lewat, jadi --duration harus lebih panjang agar 'stuck' terlihat
+- spike     : suhu di luar batas fisik (glitch DHT22)
+- malformed : JSON terpotong (harus ditolak listener)
+
+Setiap payload membawa sent_ts; proses utama subscribe ke topic prediksi dan menghitung
+latensi end-to-end dari sent_ts yang dikembalikan di payload prediksi. Format --packed
+menyimpan sent_ts sebagai detik bulat (uint32, sama dengan firmware), jadi latensi tidak
+diukur di mode itu; saturasi hanya dinilai dari laju prediksi. Dengan --ramp-to
+laju dinaikkan bertahap sehingga titik saturasi terlihat dari laporan per tahap.
+
+Contoh:
+    python device_simulator.py --broker localhost --devices 2000 --rate 1000 --duration 30
+    python device_simulator.py --devices 5000 --rate 500 --ramp-to 8000 --steps 8 --processes 4
+    python device_simulator.py --devices 100 --rate 200 --fault-rate 0.05 --faults dropout,stuck
+"""
+import argparse
+import json
+import multiprocessing
+import queue
+import random
+import threading
+import time
+from collections import Counter, deque
+
+import numpy as np
+
+from anomaly_detector import STUCK_SECONDS
+from device_registry import device_topic
+from dummy_data_maker import DEFAULT_CLASS_MIX, OUTPUT_COLUMNS, RANGES, generate_dataset
+from payload_codec import encode_json, encode_packed
+
+FAULT_KINDS = ('dropout', 'stuck', 'spike', 'malformed')
+# Modul sensor ESP32 -> flag health dan nilai yang dibacanya
+SENSOR_MODULES = {'dht_ok': ('temp', 'rh_air'), 'photo_ok': ('lux',), 'soil_ok': ('rh_soil',)}
+# Kolom generator -> field payload ESP32
+PAYLOAD_FIELDS = {'soil': 'rh_soil', 'temp': 'temp', 'air': 'rh_air', 'lux': 'lux'}
+PREDICTION_TOPICS = [("chilihub/predictions/class", 0), ("chilihub/+/predictions/class", 0)]
+TICK_SECONDS = 0.01
+# Batas pesan per tick agar proses yang tertinggal tidak membuat satu burst raksasa
+MAX_PER_TICK = 5000
+# Batas tunggu hasil per proses setelah join (proses yang crash tidak pernah mengirim hasil)
+RESULT_TIMEOUT = 5.0
+
+# ==========================================
+# 1. JADWAL LAJU PUBLISH
+# ==========================================
+def build_schedule(rate, duration, ramp_to=None, steps=1):
+    """List (detik_mulai, laju_total) per tahap."""
+    if ramp_to is None or steps <= 1:
+        return [(0.0, float(rate))]
+    step_seconds = duration / steps
+    return [(i * step_seconds, float(r)) for i, r in enumerate(np.linspace(rate, ramp_to, steps))]
+
+def rate_at(schedule, elapsed):
+    current = schedule[0][1]
+    for start, rate in schedule:
+        if elapsed >= start:
+            current = rate
+    return current
+
+# ==========================================
+# 2. PROSES DEVICE VIRTUAL
+# ==========================================
+class VirtualDevices:
+    """Sekumpulan device di satu proses: nilai dari generator + injeksi fault."""
+
+    def __init__(self, device_ids, fault_rate=0.0, faults=FAULT_KINDS, packed=False, seed=None,
+                 stuck_seconds=STUCK_SECONDS['rh_soil']):
+        self.device_ids = device_ids
+        self.topics = [device_topic(d) for d in device_ids]
+        self.fault_rate = fault_rate
+        self.faults = list(faults)
+        self.stuck_seconds = stuck_seconds
+        self.encode = encode_packed if packed else encode_json
+        self.rng = np.random.default_rng(seed)
+        self.random = random.Random(seed)
+        self.fault_counts = Counter()
+        self._next = 0
+        # device index -> (membeku sampai, nilai tanah yang membeku)
+        self._stuck = {}
+
+    def _inject(self, index, reading, now):
+        kind = self.random.choice(self.faults)
+        self.fault_counts[kind] += 1
+        if kind == 'dropout':
+            flag = self.random.choice(list(SENSOR_MODULES))
+            reading[flag] = False
+            for field in SENSOR_MODULES[flag]:
+                reading[field] = None
+        elif kind == 'stuck':
+            self._stuck[index] = (now + self.stuck_seconds, reading['rh_soil'])
+        elif kind == 'spike':
+            reading['temp'] = round(RANGES['temp'][1] * 2 + self.random.random(), 1)
+        return kind
+
+    def next_messages(self, n):
+        """n pesan (topic, payload) berikutnya, device bergiliran."""
+        df = generate_dataset(n, class_mix=DEFAULT_CLASS_MIX, rng=self.rng)
+        columns = {field: df[OUTPUT_COLUMNS[key]].tolist() for key, field in PAYLOAD_FIELDS.items()}
+        messages = []
+        now = time.time()
+        for i in range(n):
+            index = self._next
+            self._next = (self._next + 1) % len(self.device_ids)
+            reading = {field: values[i] for field, values in columns.items()}
+            reading.update(dht_ok=True, photo_ok=True, soil_ok=True, sent_ts=now)
+
+            stuck = self._stuck.get(index)
+            if stuck is not None:
+                if now < stuck[0]:
+                    reading['rh_soil'] = stuck[1]
+                else:
+                    del self._stuck[index]
+            kind = None
+            if self.fault_rate and self.random.random() < self.fault_rate:
+                kind = self._inject(index, reading, now)
+
+            payload = self.encode(reading)
+            if kind == 'malformed':
+                payload = payload[:len(payload) // 2]
+            messages.append((self.topics[index], payload))
+        return messages
+
+def _device_process(device_ids, schedule, duration, start_at, options, counter, results, seed):
+    import paho.mqtt.client as mqtt
+
+    devices = VirtualDevices(device_ids, options['fault_rate'], options['faults'], options['packed'], seed,
+                             options['stuck_seconds'])
+    share = options['share']
+    client = mqtt.Client()
+    client.connect(options['broker'], options['port'], 60)
+    client.loop_start()
+
+    # Semua proses mulai di waktu yang sama agar tahap laju sejajar dengan laporan
+    time.sleep(max(0.0, start_at - time.time()))
+    sent = errors = 0
+    due = 0.0
+    start = last = time.monotonic()
+    try:
+        while True:
+            now = time.monotonic()
+            elapsed = now - start
+            if elapsed >= duration:
+                break
+            due += rate_at(schedule, elapsed) * share * (now - last)
+            last = now
+            n = min(int(due) - sent, MAX_PER_TICK)
+            if n > 0:
+                for topic, payload in devices.next_messages(n):
+                    if client.publish(topic, payload, qos=options['qos']).rc != mqtt.MQTT_ERR_SUCCESS:
+                        errors += 1
+                sent += n
+                counter.value = sent
+            time.sleep(TICK_SECONDS)
+    finally:
+        client.loop_stop()
+        client.disconnect()
+    results.put({'sent': sent, 'errors': errors, 'faults': dict(devices.fault_counts),
+                 'behind': max(int(due) - sent, 0)})
+
+# ==========================================
+# 3. PENGUKUR LATENSI (PROSES UTAMA)
+# ==========================================
+class LatencyCollector:
+    """Subscribe prediksi; latensi = waktu terima - sent_ts yang dikembalikan di payload."""
+
+    def __init__(self, broker, port, measure_latency=True):
+        import paho.mqtt.client as mqtt
+
+        self.measure_latency = measure_latency
+        self.latencies = deque()
+        self.received = 0
+        self.client = mqtt.Client()
+        self.client.on_connect = lambda client, userdata, flags, rc: client.subscribe(PREDICTION_TOPICS)
+        self.client.on_message = self._on_message
+        self.client.connect(broker, port, 60)
+        self.client.loop_start()
+
+    def _on_message(self, client, userdata, msg):
+        now = time.time()
+        self.received += 1
+        if not self.measure_latency:
+            return
+        try:
+            sent_ts = json.loads(msg.payload).get('sent_ts')
+        except ValueError:
+            return
+        if sent_ts:
+            self.latencies.append(now - sent_ts)
+
+    def drain(self):
+        values = []
+        while self.latencies:
+            values.append(self.latencies.popleft())
+        return values
+
+    def close(self):
+        self.client.loop_stop()
+        self.client.disconnect()
+
+def _percentiles_ms(values):
+    if not values:
+        return "latensi -"
+    p50, p95, p99 = np.percentile(np.asarray(values) * 1e3, [50, 95, 99])
+    return f"p50 {p50:.0f} ms | p95 {p95:.0f} ms | p99 {p99:.0f} ms"
+
+# ==========================================
+# 4. CLI
+# ==========================================
+def run(args):
+    schedule = build_schedule(args.rate, args.duration, args.ramp_to, args.steps)
+    device_ids = [f"esp32-{d:05d}" for d in range(args.devices)]
+    n_processes = max(1, min(args.processes, args.devices))
+    options = {'broker': args.broker, 'port': args.port, 'qos': args.qos, 'packed': args.packed,
+               'fault_rate': args.fault_rate, 'faults': args.faults.split(','), 'stuck_seconds': args.stuck_seconds,
+               'share': 1 / n_processes}
+
+    collector = LatencyCollector(args.broker, args.port, measure_latency=not args.packed)
+    start_at = time.time() + args.startup_seconds
+
+    # spawn: proses utama sudah punya thread paho (collector)
+    ctx = multiprocessing.get_context('spawn')
+    results = ctx.Queue()
+    counters = [ctx.Value('q', 0, lock=False) for _ in range(n_processes)]
+    processes = [ctx.Process(target=_device_process, name=f"sim-{i}",
+                             args=(device_ids[i::n_processes], schedule, args.duration, start_at, options,
+                                   counters[i], results, i))
+                 for i in range(n_processes)]
+    for p in processes:
+        p.start()
+
+    print(f"🚀 {args.devices:,} device virtual di {n_processes} proses -> {args.broker}:{args.port}")
+    time.sleep(max(0.0, start_at - time.time()))
+    collector.drain()
+    steps = []
+    step_index = -1
+    started = last = time.monotonic()
+    last_sent, last_received = 0, collector.received
+    all_latencies = []
+    while any(p.is_alive() for p in processes):
+        time.sleep(args.report_interval)
+        now = time.monotonic()
+        elapsed = now - started
+        if elapsed > args.duration + args.report_interval:
+            break
+        sent = sum(c.value for c in counters)
+        received = collector.received
+        latencies = collector.drain()
+        all_latencies.extend(latencies)
+
+        current = sum(1 for start, _ in schedule if elapsed >= start) - 1
+        if current != step_index:
+            step_index = current
+            steps.append({'rate': schedule[max(current, 0)][1], 'sent': 0, 'received': 0, 'seconds': 0.0,
+                          'latencies': []})
+        step = steps[-1]
+        dt = now - last
+        step['sent'] += sent - last_sent
+        step['received'] += received - last_received
+        step['seconds'] += dt
+        step['latencies'].extend(latencies)
+        print(f"⏱️ {elapsed:5.1f}s | target {rate_at(schedule, elapsed):,.0f}/s | "
+              f"terkirim {(sent - last_sent) / dt:,.0f}/s | prediksi {(received - last_received) / dt:,.0f}/s | "
+              f"{_percentiles_ms(latencies)}")
+        last, last_sent, last_received = now, sent, received
+
+    for p in processes:
+        p.join()
+    # Beri waktu prediksi terakhir sampai
+    time.sleep(args.drain_seconds)
+    all_latencies.extend(collector.drain())
+    collector.close()
+
+    totals = Counter()
+    faults = Counter()
+    failed = [p for p in processes if p.exitcode != 0]
+    for p in failed:
+        print(f"❌ Proses {p.name} berhenti dengan kode {p.exitcode} (broker tidak bisa dihubungi?)")
+    for _ in range(len(processes) - len(failed)):
+        try:
+            result = results.get(timeout=RESULT_TIMEOUT)
+        except queue.Empty:
+            print("⚠️ Hasil sebagian proses tidak diterima, total di bawah ini tidak lengkap")
+            break
+        totals.update(sent=result['sent'], errors=result['errors'], behind=result['behind'])
+        faults.update(result['faults'])
+    elapsed = time.monotonic() - started
+    return totals, faults, steps, all_latencies, collector.received, elapsed
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulator ESP32 untuk uji beban Chili-Hub")
+    parser.add_argument('--broker', default='localhost')
+    parser.add_argument('--port', type=int, default=1883)
+    parser.add_argument('--devices', type=int, default=1000)
+    parser.add_argument('--rate', type=float, default=1000, help="Total pesan/detik dari semua device")
+    parser.add_argument('--ramp-to', type=float, default=None, help="Naikkan laju bertahap sampai nilai ini")
+    parser.add_argument('--steps', type=int, default=5, help="Jumlah tahap untuk --ramp-to")
+    parser.add_argument('--duration', type=float, default=30, help="Lama simulasi (detik)")
+    parser.add_argument('--processes', type=int, default=multiprocessing.cpu_count())
+    parser.add_argument('--qos', type=int, choices=[0, 1], default=0)
+    parser.add_argument('--packed', action='store_true', help="Payload biner 22 byte, bukan JSON")
+    parser.add_argument('--fault-rate', type=float, default=0.0, help="Peluang fault per pesan (0-1)")
+    parser.add_argument('--faults', default=','.join(FAULT_KINDS), help=f"Jenis fault: {', '.join(FAULT_KINDS)}")
+    parser.add_argument('--stuck-seconds', type=float, default=STUCK_SECONDS['rh_soil'],
+                        help="Lama nilai tanah membeku untuk fault stuck (>= window detector)")
+    parser.add_argument('--report-interval', type=float, default=1.0)
+    parser.add_argument('--startup-seconds', type=float, default=5.0,
+                        help="Jeda agar semua proses siap sebelum publish dimulai")
+    parser.add_argument('--drain-seconds', type=float, default=2.0, help="Tunggu prediksi terakhir setelah selesai")
+    parser.add_argument('--slo-ms', type=float, default=1000, help="Batas p99 latensi untuk deteksi saturasi")
+    args = parser.parse_args()
+
+    unknown = set(args.faults.split(',')) - set(FAULT_KINDS)
+    if unknown:
+        parser.error(f"jenis fault tidak dikenal: {', '.join(sorted(unknown))}")
+    if 'stuck' in args.faults.split(',') and args.fault_rate and args.duration <= args.stuck_seconds:
+        print(f"ℹ️ Fault stuck membeku {args.stuck_seconds:,.0f} detik; detector baru menandainya setelah window "
+              f"itu, jadi tidak akan terlihat dalam --duration {args.duration:,.0f} detik")
+    if args.packed:
+        print("⚠️ --packed: sent_ts hanya presisi 1 detik, latensi tidak diukur "
+              "(saturasi dinilai dari laju prediksi saja)")
+
+    totals, faults, steps, latencies, received, elapsed = run(args)
+
+    print(f"\n📨 {totals['sent']:,} pesan dalam {elapsed:.1f} detik ({totals['sent'] / elapsed:,.0f} pesan/detik), "
+          f"gagal publish {totals['errors']:,}, tertinggal jadwal {totals['behind']:,}")
+    if faults:
+        print(f"🧪 Fault: {', '.join(f'{k} {v:,}' for k, v in sorted(faults.items()))}")
+    print(f"🤖 {received:,} prediksi diterima | {_percentiles_ms(latencies)}")
+    if received == 0:
+        print("ℹ️ Tidak ada prediksi: jalankan inference_worker.py atau mqtt_listener.py --model")
+
+    if len(steps) > 1:
+        print(f"\n{'Target/s':>10}{'Terkirim/s':>12}{'Prediksi/s':>12}  Latensi")
+        saturated = None
+        for step in steps:
+            seconds = max(step['seconds'], 1e-9)
+            sent_rate, pred_rate = step['sent'] / seconds, step['received'] / seconds
+            p99 = np.percentile(step['latencies'], 99) * 1e3 if step['latencies'] else None
+            print(f"{step['rate']:>10,.0f}{sent_rate:>12,.0f}{pred_rate:>12,.0f}  {_percentiles_ms(step['latencies'])}")
+            # Saturasi: prediksi tidak lagi mengikuti laju kirim, atau p99 melewati SLO
+            if saturated is None and received and (pred_rate < 0.95 * sent_rate or (p99 or 0) > args.slo_ms):
+                saturated = step['rate']
+        if saturated is not None:
+            print(f"⚠️ Saturasi mulai sekitar {saturated:,.0f} pesan/detik")
+        elif received:
+            print("✅ Tidak ada saturasi sampai laju tertinggi")
+
+if __name__ == "__main__":
+    main()
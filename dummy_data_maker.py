@@ -1,17 +1,18 @@
+import argparse
+import numpy as np
 import pandas as pd
 import random
+import time
 from datetime import datetime, timedelta
+import rule_engine
+from sensor_dataset import write_frame
 
 # ==========================================
 # 1. KONFIGURASI THRESHOLD (Acuan Generate)
 # ==========================================
-# Kita simpan ini agar generator tau mana angka "bagus" dan "jelek"
-THRESHOLDS = {
-    'temp': {'min': 18, 'max': 27},
-    'soil': {'min': 60, 'max': 80},
-    'lux':  {'min': 19000, 'max': 40000},
-    'air':  {'min': 70, 'max': 80}
-}
+# Threshold didefinisikan sekali di rule_engine.py (profil per tanaman & fase tumbuh),
+# sehingga generator tau mana angka "bagus" dan "jelek" persis seperti labeling.py.
+# Kedua generator (vektorisasi & --legacy) memakai profil yang sama: --profile atau profil aktif.
 
 # Batas Fisik Sensor (Range Maksimal/Minimal yang mungkin terbaca alat)
 RANGES = {
@@ -24,14 +25,15 @@ RANGES = {
 # ==========================================
 # 2. FUNGSI GENERATOR NILAI
 # ==========================================
-def get_random_value(param, is_safe):
+def get_random_value(param, is_safe, thresholds):
     """
     Menghasilkan satu nilai sensor.
     is_safe = True  -> Nilai pasti Normal (dalam threshold)
     is_safe = False -> Nilai pasti Error (di luar threshold)
+    thresholds = CompiledRules.thresholds profil acuan (diambil sekali oleh pemanggil)
     """
-    t_min = THRESHOLDS[param]['min']
-    t_max = THRESHOLDS[param]['max']
+    t_min = thresholds[param]['min']
+    t_max = thresholds[param]['max']
     r_min, r_max = RANGES[param]
     
     if is_safe:
@@ -45,7 +47,7 @@ def get_random_value(param, is_safe):
             val = random.uniform(t_max + 2, r_max)
         return val
 
-def generate_raw_reading(scenario_type):
+def generate_raw_reading(scenario_type, thresholds):
     """
     Fungsi ini hanya meminjam logika skenario untuk memastikan
     data yang keluar bervariasi (tidak semuanya normal).
@@ -71,48 +73,187 @@ def generate_raw_reading(scenario_type):
     for sensor in sensors:
         # Jika sensor ada di list error, generate nilai ngaco. Jika tidak, nilai aman.
         is_safe = sensor not in error_sensors
-        vals[sensor] = round(get_random_value(sensor, is_safe), 1)
+        vals[sensor] = round(get_random_value(sensor, is_safe, thresholds), 1)
         
     return vals
 
 # ==========================================
-# 3. EKSEKUSI GENERATE 300 DATA
+# 3. GENERATOR VEKTORISASI (NumPy)
+# ==========================================
+SENSORS = ['temp', 'soil', 'lux', 'air']
+
+# Urutan kolom output (sama dengan CSV lama + device_id)
+OUTPUT_COLUMNS = {
+    'soil': 'earth_humidity',
+    'temp': 'air_temperature',
+    'air':  'air_humidity',
+    'lux':  'luminance'
+}
+
+# Komposisi skenario bawaan: 800 Normal, 600 Warning, 600 Critical dari 2000 baris
+DEFAULT_CLASS_MIX = (0.4, 0.3, 0.3)
+
+def _scenario_counts(n_rows, class_mix):
+    """Bagi n_rows ke 3 skenario sesuai class_mix (jumlah total selalu tepat n_rows)."""
+    mix = np.asarray(class_mix, dtype=np.float64)
+    mix = mix / mix.sum()
+    counts = np.floor(mix * n_rows).astype(np.int64)
+    # Sisa pembulatan diberikan ke skenario dengan pecahan terbesar
+    remainder = n_rows - counts.sum()
+    if remainder:
+        order = np.argsort(-(mix * n_rows - counts), kind='stable')
+        counts[order[:remainder]] += 1
+    return counts
+
+def generate_dataset(n_rows, n_devices=1, class_mix=DEFAULT_CLASS_MIX, seed=None,
+                     start_time=None, interval_minutes=15, row_offset=0, rng=None, rules=None):
+    """
+    Versi NumPy dari generate_raw_reading: semua baris dibuat sekaligus sebagai array.
+    - class_mix  : proporsi skenario (Normal, Warning, Critical)
+    - n_devices  : baris dibagi bergiliran ke device 'esp32-000', 'esp32-001', ...
+    - row_offset : nomor baris awal (dipakai saat generate per chunk agar waktu berlanjut)
+    - rules      : CompiledRules atau nama profil rule_engine (default: profil aktif)
+    """
+    rules = rule_engine.resolve(rules)
+    if rng is None:
+        rng = np.random.default_rng(seed)
+    if start_time is None:
+        start_time = datetime.now()
+
+    # Skenario bayangan dengan komposisi tepat, lalu diacak
+    scenario = np.repeat(np.arange(3, dtype=np.uint8), _scenario_counts(n_rows, class_mix))
+    rng.shuffle(scenario)
+
+    # Jumlah sensor error per baris: 0 | 1-2 | 3-4
+    num_errors = np.where(scenario == 0, 0, np.where(scenario == 1, 1, 3))
+    num_errors += (scenario > 0) * rng.integers(0, 2, size=n_rows)
+
+    # Pilih sensor error secara acak: ranking acak per baris, ambil sejumlah num_errors teratas
+    ranks = rng.random((n_rows, len(SENSORS))).argsort(axis=1).argsort(axis=1)
+    is_error = ranks < num_errors[:, None]
+
+    data = {}
+    for j, sensor in enumerate(SENSORS):
+        t_min = rules.thresholds[sensor]['min']
+        t_max = rules.thresholds[sensor]['max']
+        r_min, r_max = RANGES[sensor]
+
+        safe = rng.uniform(t_min, t_max, size=n_rows)
+        low = rng.uniform(r_min, t_min - 2, size=n_rows)
+        high = rng.uniform(t_max + 2, r_max, size=n_rows)
+        error = np.where(rng.random(n_rows) < 0.5, low, high)
+
+        data[sensor] = np.round(np.where(is_error[:, j], error, safe), 1)
+
+    # Setiap device mengirim data tiap interval_minutes, bergiliran
+    row_index = np.arange(row_offset, row_offset + n_rows, dtype=np.int64)
+    step = np.timedelta64(interval_minutes * 60, 's')
+    timestamps = np.datetime64(start_time, 'us') + (row_index // n_devices) * step
+    device_names = [f"esp32-{d:03d}" for d in range(n_devices)]
+
+    df = pd.DataFrame({
+        'timestamp': timestamps,
+        'device_id': pd.Categorical.from_codes(row_index % n_devices, categories=device_names),
+    })
+    for sensor, column in OUTPUT_COLUMNS.items():
+        df[column] = data[sensor]
+    return df
+
+def write_dataset(filename, n_rows, chunk_size=1_000_000, n_devices=1,
+                  class_mix=DEFAULT_CLASS_MIX, seed=None, start_time=None, rules=None):
+    """
+    Generate dan tulis dataset per chunk, sehingga memori tetap terbatas
+    berapapun jumlah barisnya (10 juta+ baris). Mengembalikan jumlah baris ditulis.
+    filename: .csv, atau folder .parquet / .arrow (dataset partisi device & tanggal).
+    """
+    rng = np.random.default_rng(seed)
+    if start_time is None:
+        start_time = datetime.now()
+
+    written = 0
+    while written < n_rows:
+        size = min(chunk_size, n_rows - written)
+        chunk = generate_dataset(size, n_devices=n_devices, class_mix=class_mix,
+                                 start_time=start_time, row_offset=written, rng=rng, rules=rules)
+        write_frame(chunk, filename, append=written > 0)
+        written += size
+    return written
+
+# ==========================================
+# 4. EKSEKUSI GENERATE (Mode Lama, baris per baris)
 # ==========================================
-data_rows = []
-start_time = datetime.now()
+def generate_legacy(rules=None):
+    # Profil dikompilasi sekali untuk semua baris (rules: nama profil / None = profil aktif)
+    thresholds = rule_engine.resolve(rules).thresholds
+    data_rows = []
+    start_time = datetime.now()
 
-# Kita buat "Skenario Bayangan" agar data nanti pas di-labeling hasilnya imbang.
-# 100 data potensi Normal, 100 data potensi Warning, 100 data potensi Critical
-seeds = [0]*800 + [1]*600 + [2]*600
-random.shuffle(seeds)
+    # Kita buat "Skenario Bayangan" agar data nanti pas di-labeling hasilnya imbang.
+    # 100 data potensi Normal, 100 data potensi Warning, 100 data potensi Critical
+    seeds = [0]*800 + [1]*600 + [2]*600
+    random.shuffle(seeds)
 
-print("🔄 Sedang men-generate 300 data mentah...")
+    print("🔄 Sedang men-generate 300 data mentah...")
 
-for i, seed in enumerate(seeds):
-    current_time = start_time + timedelta(minutes=i*15)
+    for i, seed in enumerate(seeds):
+        current_time = start_time + timedelta(minutes=i*15)
     
-    # Ambil nilai sensor
-    readings = generate_raw_reading(seed)
+        # Ambil nilai sensor
+        readings = generate_raw_reading(seed, thresholds)
     
-    data_rows.append({
-        'timestamp': current_time,
-        'earth_humidity': readings['soil'],      
-        'air_temperature': readings['temp'],    
-        'air_humidity': readings['air'],       
-        'luminance': readings['lux']
-        # Tidak ada label, tidak ada violation_count
-    })
+        data_rows.append({
+            'timestamp': current_time,
+            'earth_humidity': readings['soil'],      
+            'air_temperature': readings['temp'],    
+            'air_humidity': readings['air'],       
+            'luminance': readings['lux']
+            # Tidak ada label, tidak ada violation_count
+        })
+
+    # --- SIMPAN CSV ---
+    df = pd.DataFrame(data_rows)
+    df = df.set_index('timestamp')
+
+    filename = 'raw_sensor_data.csv'
+    df.to_csv(filename)
+
+    print(f"✅ Selesai! File '{filename}' telah dibuat.")
+    print(f"📊 Dimensi Data: {df.shape} (300 Baris, 4 Kolom Sensor)")
+    print("\nContoh 5 Data Mentah Teratas:")
+    print(df.head())
 
 # ==========================================
-# 4. SIMPAN CSV
+# 5. MAIN
 # ==========================================
-df = pd.DataFrame(data_rows)
-df = df.set_index('timestamp')
+def main():
+    parser = argparse.ArgumentParser(description="Generator data sensor mentah (dummy)")
+    parser.add_argument('--legacy', action='store_true',
+                        help="Pakai generator lama (2000 baris, baris per baris)")
+    parser.add_argument('--rows', type=int, default=2000)
+    parser.add_argument('--devices', type=int, default=1)
+    parser.add_argument('--mix', type=float, nargs=3, default=list(DEFAULT_CLASS_MIX),
+                        metavar=('NORMAL', 'WARNING', 'CRITICAL'))
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--chunk-size', type=int, default=1_000_000)
+    parser.add_argument('--output', default='raw_sensor_data.csv',
+                        help="File .csv, atau folder .parquet / .arrow (dataset kolumnar)")
+    parser.add_argument('--profile', default=None, choices=rule_engine.profile_names(),
+                        help="Profil aturan tanaman/fase acuan generate (default: profil aktif)")
+    args = parser.parse_args()
+
+    if args.legacy:
+        generate_legacy(args.profile)
+        return
+
+    print(f"🔄 Sedang men-generate {args.rows} data mentah untuk {args.devices} device...")
+    start = time.perf_counter()
+    written = write_dataset(args.output, args.rows, chunk_size=args.chunk_size,
+                            n_devices=args.devices, class_mix=args.mix, seed=args.seed,
+                            rules=args.profile)
+    elapsed = time.perf_counter() - start
 
-filename = 'raw_sensor_data.csv'
-df.to_csv(filename)
+    print(f"✅ Selesai! File '{args.output}' telah dibuat.")
+    print(f"📊 {written} baris dalam {elapsed:.2f} detik ({written / max(elapsed, 1e-9):,.0f} baris/detik)")
 
-print(f"✅ Selesai! File '{filename}' telah dibuat.")
-print(f"📊 Dimensi Data: {df.shape} (300 Baris, 4 Kolom Sensor)")
-print("\nContoh 5 Data Mentah Teratas:")
-print(df.head())
\ No newline at end of file
+if __name__ == "__main__":
+    main()
@@ -22,6 +22,9 @@ const char* MQTT_CLIENT_ID = "esp32_chilihub_client_001";
 const char* TOPIC_PUBLISH_DATA = "chilihub/data/sensors";
 const char* TOPIC_SUBSCRIBE_PRED = "chilihub/predictions/class";
 
+// 1 = kirim payload biner 22 byte (lihat payload_codec.py) alih-alih JSON ~150 byte
+#define USE_PACKED_PAYLOAD 0
+
 // ----------------------- Pin Definitions ------------------------ //
 const int PHOTO_PIN = 33;      
 const int DHT1_PIN = 5;       
@@ -121,7 +124,11 @@ void loop() {
 
     if (millis() - lastReadTime > readInterval) {
         readSensors();
+#if USE_PACKED_PAYLOAD
+        publishSensorDataPacked();
+#else
         publishSensorDataJSON(); 
+#endif
         updateDisplay();
         lastReadTime = millis();
     }
@@ -364,6 +371,32 @@ void publishSensorDataJSON() {
     mqttClient.publish(TOPIC_PUBLISH_DATA, buffer);
 }
 
+// Format sama dengan PACKED_FORMAT di payload_codec.py ('<BffffBI', little-endian)
+#pragma pack(push, 1)
+struct PackedReading {
+    uint8_t version;    // 1
+    float temp;
+    float rh_air;
+    float rh_soil;
+    float lux;
+    uint8_t health;     // bit0 = dht_ok, bit1 = photo_ok, bit2 = soil_ok
+    uint32_t sent_ts;   // epoch detik, 0 = tidak ada (belum sinkron NTP)
+};
+#pragma pack(pop)
+
+void publishSensorDataPacked() {
+    PackedReading reading;
+    reading.version = 1;
+    reading.temp = temp1;
+    reading.rh_air = humidity1;
+    reading.rh_soil = humidity2;
+    reading.lux = lightValue;
+    reading.health = (sensorStatus.dht_ok ? 1 : 0) | (sensorStatus.photo_ok ? 2 : 0) | (sensorStatus.soil_ok ? 4 : 0);
+    reading.sent_ts = 0;
+
+    mqttClient.publish(TOPIC_PUBLISH_DATA, (const uint8_t*)&reading, sizeof(reading));
+}
+
 // ------------------- Display Update ------------------- //
 
 void updateDisplay() {
@@ -0,0 +1,371 @@
+"""
+Prediktor cepat untuk RandomForestClassifier (model_final.pkl) tanpa sklearn.
+
+Semua pohon diratakan menjadi beberapa array NumPy (left, right, feature, threshold,
+value). Hasil predict identik dengan sklearn karena:
+- input di-cast ke float32 seperti sklearn sebelum dibandingkan dengan threshold,
+- NaN mengikuti missing_go_to_left per node (sklearn >= 1.3; file .npz lama: NaN ke kanan),
+- probabilitas daun dinormalisasi dengan cara yang sama,
+- probabilitas dijumlahkan per pohon dengan urutan yang sama lalu dibagi jumlah pohon.
+
+Untuk batch besar traversal pohon sklearn (Cython) tetap lebih cepat daripada traversal
+NumPy, jadi FastForest hasil load_model() meneruskan batch >= SKLEARN_MIN_ROWS baris ke
+model sklearn (.pkl dengan nama sama di samping .npz, dimuat saat pertama dibutuhkan).
+Aturan ini berlaku untuk semua pemakai load_model (dashboard, inference worker, model manager).
+
+Contoh:
+    python fast_forest.py export --model model_final.pkl --output model_final.npz
+    python fast_forest.py verify --fast model_final.npz --data data_sensor.csv
+"""
+import argparse
+import os
+import time
+import zipfile
+
+import numpy as np
+
+FAST_MODEL_PATH = 'model_final.npz'
+# Batch kecil (mis. 1 reading dari dashboard) memakai jalur skalar Python
+SCALAR_MAX_ROWS = 4
+# Batch sebesar ini atau lebih diprediksi model sklearn (.pkl), jika tersedia. Titik impas
+# ~600 baris (100 pohon, data_sensor.csv): batch inference worker (max 256) tetap di FastForest
+SKLEARN_MIN_ROWS = 512
+
+# ==========================================
+# 1. EXPORT (sklearn -> array datar)
+# ==========================================
+def flatten_forest(model):
+    """Gabungkan semua pohon model menjadi dict array. Daun menunjuk ke dirinya sendiri."""
+    lefts, rights, features, thresholds, values, roots, missing_lefts = [], [], [], [], [], [], []
+    offset = 0
+    max_depth = 0
+
+    for estimator in model.estimators_:
+        tree = estimator.tree_
+        n = tree.node_count
+        is_leaf = tree.children_left == -1
+        node_ids = np.arange(offset, offset + n, dtype=np.int32)
+
+        # Daun: kedua anak = dirinya sendiri, threshold +inf -> traversal bisa diulang
+        # sebanyak max_depth kali tanpa perlu cek apakah sudah sampai daun
+        lefts.append(np.where(is_leaf, node_ids, tree.children_left + offset).astype(np.int32))
+        rights.append(np.where(is_leaf, node_ids, tree.children_right + offset).astype(np.int32))
+        features.append(np.where(is_leaf, 0, tree.feature).astype(np.int32))
+        thresholds.append(np.where(is_leaf, np.inf, tree.threshold))
+        # Arah NaN per node (sklearn < 1.3 tidak punya atribut ini: NaN selalu ke kanan)
+        missing_left = getattr(tree, 'missing_go_to_left', None)
+        missing_lefts.append(np.zeros(n, dtype=bool) if missing_left is None
+                             else (np.asarray(missing_left) != 0) & ~is_leaf)
+
+        # Normalisasi sama seperti DecisionTreeClassifier.predict_proba
+        value = tree.value[:, 0, :model.n_classes_].astype(np.float64)
+        normalizer = value.sum(axis=1)[:, np.newaxis]
+        normalizer[normalizer == 0.0] = 1.0
+        values.append(value / normalizer)
+
+        roots.append(offset)
+        max_depth = max(max_depth, tree.max_depth)
+        offset += n
+
+    return {
+        'left': np.concatenate(lefts),
+        'right': np.concatenate(rights),
+        'feature': np.concatenate(features),
+        'threshold': np.concatenate(thresholds),
+        'missing_left': np.concatenate(missing_lefts),
+        'value': np.concatenate(values),
+        'roots': np.array(roots, dtype=np.int32),
+        'max_depth': np.array(max_depth, dtype=np.int32),
+        'classes': np.asarray(model.classes_),
+        'feature_names': np.asarray(getattr(model, 'feature_names_in_', []), dtype=str)
+    }
+
+def export_forest(model, path=FAST_MODEL_PATH):
+    # np.savez tidak mengompres -> setiap array bisa di-memory-map langsung dari file
+    np.savez(path, **flatten_forest(model))
+
+def threshold_forest(bounds, label_by_violations, feature_names, classes=(0, 1, 2)):
+    """
+    Model cadangan tanpa training: satu pohon yang menghitung jumlah fitur di luar
+    rentang [min, max] lalu memetakannya ke label (label_by_violations[jumlah]).
+    bounds: list (min, max) sesuai urutan feature_names. Subpohon dengan (fitur, jumlah
+    pelanggaran) yang sama dipakai bersama, jadi ukurannya hanya O(fitur^2) node.
+    """
+    left, right, feature, threshold, value = [], [], [], [], []
+    n_features = len(bounds)
+
+    def add(f, thr, v):
+        left.append(len(left))
+        right.append(len(right))
+        feature.append(f)
+        threshold.append(thr)
+        value.append(v)
+        return len(left) - 1
+
+    # Daun: satu per jumlah pelanggaran, probabilitas one-hot label
+    leaves = []
+    for label in label_by_violations[:n_features + 1]:
+        leaves.append(add(0, np.inf, [1.0 if c == label else 0.0 for c in classes]))
+
+    # Bangun dari fitur terakhir ke pertama: node[i][v] = subpohon mulai fitur i dengan v pelanggaran
+    nodes = [leaves]
+    for i in reversed(range(n_features)):
+        below, above = bounds[i]
+        nxt = nodes[0]
+        level = []
+        for v in range(i + 1):
+            # x <= max -> OK (lanjut dengan v), selain itu (termasuk NaN) -> pelanggaran
+            upper = add(i, float(above), [0.0] * len(classes))
+            left[upper], right[upper] = nxt[v], nxt[v + 1]
+            # x < min -> pelanggaran; float32 terbesar di bawah min agar x == min tetap OK
+            lower = add(i, float(np.nextafter(np.float32(below), np.float32(-np.inf))), [0.0] * len(classes))
+            left[lower], right[lower] = nxt[v + 1], upper
+            level.append(lower)
+        nodes.insert(0, level)
+
+    return FastForest({
+        'left': np.array(left, dtype=np.int32),
+        'right': np.array(right, dtype=np.int32),
+        'feature': np.array(feature, dtype=np.int32),
+        'threshold': np.array(threshold, dtype=np.float64),
+        'missing_left': np.zeros(len(left), dtype=bool),
+        'value': np.array(value, dtype=np.float64),
+        'roots': np.array([nodes[0][0]], dtype=np.int32),
+        'max_depth': np.array(2 * n_features, dtype=np.int32),
+        'classes': np.asarray(classes),
+        'feature_names': np.asarray(feature_names, dtype=str)
+    })
+
+def _mmap_npz(path):
+    """
+    Buka setiap array .npy di dalam .npz (tanpa kompresi) sebagai memmap read-only:
+    tidak ada copy/decompress saat start, halaman file dibaca OS saat benar-benar dipakai.
+    """
+    arrays = {}
+    with zipfile.ZipFile(path) as archive, open(path, 'rb') as f:
+        for info in archive.infolist():
+            if info.compress_type != zipfile.ZIP_STORED:
+                raise ValueError(f"{info.filename} terkompresi, tidak bisa di-memory-map")
+            # Local file header: 30 byte + nama file + extra field, lalu data .npy
+            f.seek(info.header_offset + 26)
+            name_len, extra_len = np.frombuffer(f.read(4), dtype='<u2')
+            f.seek(info.header_offset + 30 + int(name_len) + int(extra_len))
+            version = np.lib.format.read_magic(f)
+            if version == (1, 0):
+                shape, fortran, dtype = np.lib.format.read_array_header_1_0(f)
+            elif version == (2, 0):
+                shape, fortran, dtype = np.lib.format.read_array_header_2_0(f)
+            else:
+                raise ValueError(f"format .npy versi {version} tidak didukung")
+            key = info.filename.removesuffix('.npy')
+            if dtype.hasobject or 0 in shape:
+                # Array kosong / objek tidak bisa di-memmap (dan memang kecil)
+                with archive.open(info.filename) as member:
+                    arrays[key] = np.load(member, allow_pickle=False)
+                continue
+            arrays[key] = np.memmap(path, dtype=dtype, mode='r', offset=f.tell(), shape=shape,
+                                    order='F' if fortran else 'C')
+    return arrays
+
+# ==========================================
+# 2. PREDIKTOR
+# ==========================================
+class FastForest:
+    """Pengganti ringan model.predict / model.predict_proba untuk RandomForest hasil export."""
+
+    def __init__(self, arrays, batch_model_path=None):
+        self.left = arrays['left']
+        self.right = arrays['right']
+        # [left0, right0, left1, right1, ...] -> anak = children[2 * node + belok_kanan].
+        # intp: indeks int32 harus dikonversi NumPy di setiap gather
+        self.children = np.column_stack([self.left, self.right]).ravel().astype(np.intp)
+        self.feature = arrays['feature']
+        self._feature_index = np.asarray(self.feature, dtype=np.intp)
+        self.threshold = arrays['threshold']
+        missing_left = arrays.get('missing_left')
+        self.missing_left = np.zeros(len(self.left), dtype=bool) if missing_left is None else missing_left
+        self.value = arrays['value']
+        self.roots = arrays['roots']
+        self.max_depth = int(arrays['max_depth'])
+        self.classes_ = arrays['classes']
+        self.feature_names_in_ = arrays['feature_names']
+        self.n_estimators = len(self.roots)
+        self.is_leaf = self.left == np.arange(len(self.left))
+        self.batch_model_path = batch_model_path
+        self._batch_model = None
+        self._tables = None
+
+    @classmethod
+    def load(cls, path=FAST_MODEL_PATH, mmap=True, batch_model_path=None):
+        if mmap:
+            try:
+                return cls(_mmap_npz(path), batch_model_path)
+            except ValueError:
+                pass  # mis. dibuat dengan np.savez_compressed
+        with np.load(path) as data:
+            return cls({key: data[key] for key in data.files}, batch_model_path)
+
+    def _as_matrix(self, X):
+        # DataFrame -> urutkan kolom sesuai fitur training; lalu float32 seperti sklearn
+        if hasattr(X, 'columns'):
+            names = self.feature_names_in_.tolist()
+            if names and X.columns.tolist() != names:
+                X = X[names]
+            X = X.to_numpy(dtype=np.float32)
+        X = np.asarray(X, dtype=np.float32)
+        if X.ndim == 1:
+            X = X[np.newaxis, :]
+        return X
+
+    def apply(self, X):
+        """Indeks daun (global) untuk setiap sampel x pohon, shape (n_samples, n_trees)."""
+        X = self._as_matrix(X)
+        n_samples = len(X)
+        # Nilai float32 di-cast sekali ke float64 (perbandingan dengan threshold tetap sama)
+        flat = X.astype(np.float64).ravel()
+        leaves = np.tile(self.roots.astype(np.intp), n_samples)
+
+        # Traversal semua (sampel, pohon) sekaligus; pasangan yang sudah sampai daun
+        # dikeluarkan dari set aktif agar iterasi berikutnya makin ringan. Pemadatan hanya
+        # tiap 2 langkah: daun menunjuk ke dirinya sendiri, jadi langkah ekstra tidak mengubah hasil
+        active = np.arange(n_samples * self.n_estimators)
+        nodes = leaves.copy()
+        row_base = np.repeat(np.arange(n_samples, dtype=np.intp) * X.shape[1], self.n_estimators)
+        has_nan = bool(np.isnan(flat).any())
+        step = 0
+        while len(active):
+            # ~(x <= threshold): NaN belok kanan, kecuali node dengan missing_go_to_left
+            x = flat[row_base + self._feature_index[nodes]]
+            go_right = ~(x <= self.threshold[nodes])
+            if has_nan:
+                go_right &= ~(np.isnan(x) & self.missing_left[nodes])
+            nodes = self.children[2 * nodes + go_right]
+            step += 1
+            if step % 2 == 0 or step >= self.max_depth:
+                leaves[active] = nodes
+                keep = ~self.is_leaf[nodes]
+                active, nodes, row_base = active[keep], nodes[keep], row_base[keep]
+        return leaves.reshape(n_samples, self.n_estimators)
+
+    def _sklearn(self):
+        # Dimuat saat batch besar pertama: proses yang hanya memprediksi 1 reading tidak import sklearn
+        if self._batch_model is None:
+            self._batch_model = load_model(self.batch_model_path)
+        return self._batch_model
+
+    def _scalar_tables(self):
+        # List Python untuk jalur satu baris: lebih cepat daripada operasi NumPy kecil berulang
+        if self._tables is None:
+            self._tables = (self.left.tolist(), self.right.tolist(), self.feature.tolist(),
+                            self.threshold.tolist(), self.value.tolist(), self.is_leaf.tolist(),
+                            np.asarray(self.missing_left).tolist())
+        return self._tables
+
+    def predict_proba_one(self, x):
+        """Jalur cepat untuk satu reading (urutan nilai sesuai feature_names_in_)."""
+        left, right, feature, threshold, value, is_leaf, missing_left = self._scalar_tables()
+        x = np.asarray(x, dtype=np.float32).ravel().tolist()
+        proba = [0.0] * len(value[0])
+        for node in self.roots.tolist():
+            while not is_leaf[node]:
+                v = x[feature[node]]
+                if v <= threshold[node] or (v != v and missing_left[node]):
+                    node = left[node]
+                else:
+                    node = right[node]
+            for c, v in enumerate(value[node]):
+                proba[c] += v
+        return np.array(proba) / self.n_estimators
+
+    def predict_proba(self, X):
+        if self.batch_model_path is not None and len(X) >= SKLEARN_MIN_ROWS:
+            return self._sklearn().predict_proba(self._as_frame(X))
+        X = self._as_matrix(X)
+        if len(X) <= SCALAR_MAX_ROWS:
+            return np.array([self.predict_proba_one(row) for row in X]).reshape(len(X), -1)
+        leaves = self.apply(X)
+        # Dijumlahkan berurutan per pohon (sama dengan sklearn), sehingga hasilnya identik bit per bit
+        proba = self.value[leaves[:, 0]]
+        for tree in range(1, self.n_estimators):
+            proba += self.value[leaves[:, tree]]
+        return proba / self.n_estimators
+
+    def _as_frame(self, X):
+        # sklearn dilatih dengan nama kolom: kirim DataFrame agar tidak ada peringatan / salah urut
+        if hasattr(X, 'columns'):
+            return X
+        import pandas as pd
+        return pd.DataFrame(np.asarray(X).reshape(len(X), -1), columns=self.feature_names_in_.tolist())
+
+    def predict(self, X):
+        return self.classes_.take(np.argmax(self.predict_proba(X), axis=1), axis=0)
+
+def load_model(path):
+    """
+    Muat model dari .npz (FastForest) atau .pkl (joblib/sklearn), keduanya memory-mapped.
+    FastForest memakai .pkl dengan nama sama (jika ada) untuk batch >= SKLEARN_MIN_ROWS.
+    """
+    if path.endswith('.npz'):
+        batch_model_path = path.removesuffix('.npz') + '.pkl'
+        return FastForest.load(path, batch_model_path=batch_model_path if os.path.exists(batch_model_path) else None)
+    import joblib
+    # Array pohon dibaca langsung dari file (joblib.dump tanpa kompresi), bukan di-copy ke RAM
+    return joblib.load(path, mmap_mode='r')
+
+# ==========================================
+# 3. CLI: EXPORT & VERIFIKASI
+# ==========================================
+def _latency_us(fn, X, repeat=200):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn(X)
+    return (time.perf_counter() - start) / repeat * 1e6
+
+def verify(model, fast, df):
+    features = list(fast.feature_names_in_)
+    X = df[features]
+
+    sk_labels = model.predict(X)
+    fast_labels = fast.predict(X)
+    identical = np.array_equal(sk_labels, fast_labels)
+    proba_identical = np.array_equal(model.predict_proba(X), fast.predict_proba(X))
+
+    print(f"🔍 {len(df)} baris: label identik = {identical}, probabilitas identik = {proba_identical}")
+
+    one_row = X.iloc[[0]]
+    print(f"⏱️ 1 baris  : sklearn {_latency_us(model.predict, one_row):,.0f} µs | "
+          f"fast {_latency_us(fast.predict, one_row):,.0f} µs")
+    print(f"⏱️ {len(df)} baris: sklearn {_latency_us(model.predict, X, 5):,.0f} µs | "
+          f"fast {_latency_us(fast.predict, X, 5):,.0f} µs")
+    return identical
+
+def main():
+    parser = argparse.ArgumentParser(description="Export & verifikasi prediktor RandomForest cepat")
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    p_export = sub.add_parser('export', help="Ratakan model sklearn menjadi file .npz")
+    p_export.add_argument('--model', default='model_final.pkl')
+    p_export.add_argument('--output', default=FAST_MODEL_PATH)
+
+    p_verify = sub.add_parser('verify', help="Bandingkan label dengan sklearn")
+    p_verify.add_argument('--model', default='model_final.pkl')
+    p_verify.add_argument('--fast', default=FAST_MODEL_PATH)
+    p_verify.add_argument('--data', default='data_sensor.csv')
+    args = parser.parse_args()
+
+    import joblib
+    model = joblib.load(args.model)
+
+    if args.command == 'export':
+        export_forest(model, args.output)
+        fast = FastForest.load(args.output)
+        print(f"💾 {fast.n_estimators} pohon ({len(fast.left)} node) disimpan sebagai '{args.output}'")
+    else:
+        import pandas as pd
+        ok = verify(model, FastForest.load(args.fast), pd.read_csv(args.data))
+        if not ok:
+            raise SystemExit("❌ Label berbeda dengan sklearn!")
+        print("✅ Label identik dengan sklearn")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,260 @@
+import argparse
+import json
+import queue
+import threading
+import time
+
+import numpy as np
+import paho.mqtt.client as mqtt
+
+import metrics
+from anomaly_detector import AnomalyDetector, untrusted_sensors
+from device_registry import prediction_topic
+from fast_forest import load_model
+from model_manager import ModelManager, active_version
+from prediction_cache import CACHE_SIZE, PredictionCache
+from mqtt_listener import BROKER, PORT, TOPICS, parse_message
+
+# ==========================================
+# 1. KONFIGURASI
+# ==========================================
+MODEL_PATH = 'model_final.pkl'
+FEATURES = ['earth_humidity', 'air_temperature', 'air_humidity', 'luminance']
+# Kolom payload ESP32 dengan urutan yang sama dengan FEATURES
+PAYLOAD_FEATURES = ['rh_soil', 'temp', 'rh_air', 'lux']
+LABEL_MAP = {0: "NORMAL", 1: "WARNING", 2: "CRITICAL"}
+
+# ==========================================
+# 2. MICRO-BATCHER
+# ==========================================
+class MicroBatcher:
+    """
+    Mengumpulkan item dari banyak thread, lalu memanggil handler(batch) sekali
+    untuk setiap max_batch item atau setelah max_delay detik (mana yang lebih dulu).
+    """
+
+    def __init__(self, handler, max_batch=256, max_delay=0.2, max_queue=100_000, name="micro-batcher"):
+        self.handler = handler
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.dropped_count = 0
+
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._loop, name=name, daemon=True)
+        self._thread.start()
+
+    def submit(self, item):
+        """Non-blocking. False jika antrean penuh (item dibuang)."""
+        try:
+            self._queue.put_nowait(item)
+            return True
+        except queue.Full:
+            self.dropped_count += 1
+            return False
+
+    def _loop(self):
+        while not (self._stop.is_set() and self._queue.empty()):
+            try:
+                first = self._queue.get(timeout=0.1)
+            except queue.Empty:
+                continue
+
+            batch = [first]
+            deadline = time.monotonic() + self.max_delay
+            while len(batch) < self.max_batch:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=timeout))
+                except queue.Empty:
+                    break
+
+            try:
+                self.handler(batch)
+            except Exception as e:
+                print(f"❌ Error saat memproses batch: {e}")
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    def flush(self):
+        """Tunggu sampai semua item yang sudah di-submit selesai diproses."""
+        self._queue.join()
+
+    def close(self):
+        self._stop.set()
+        self._thread.join()
+
+# ==========================================
+# 3. INFERENCE WORKER
+# ==========================================
+def prediction_payload(reading, code, confidence, model_version=None):
+    return {
+        "device_id": reading['device_id'],
+        "status": LABEL_MAP.get(int(code), "UNKNOWN"),
+        "code": int(code),
+        "confidence": round(float(confidence), 4),
+        "timestamp": reading.get('timestamp'),
+        "sensors_ok": bool(reading.get('dht_ok') and reading.get('photo_ok') and reading.get('soil_ok')
+                           and not reading.get('faults')),
+        "sensor_faults": reading.get('faults') or {},
+        "model_version": model_version,
+        # Waktu kirim reading dari device, dikembalikan apa adanya agar pengirim bisa mengukur latensi
+        "sent_ts": reading.get('sent_ts')
+    }
+
+class InferenceWorker:
+    """
+    Klasifikasi setiap reading tepat satu kali, dalam micro-batch.
+    Satu batch = paling banyak satu panggilan predict_proba (reading yang nilainya sudah
+    pernah diprediksi diambil dari cache), lalu hasil dikirim ke publish(topic, payload)
+    per device.
+
+    Reading dengan nilai sensor kosong atau sensor di luar batas (record.faults) tidak diprediksi.
+    detector diisi jika reading belum dicek sebelumnya (mode standalone); di gateway
+    pengecekan sudah dilakukan di tahap enrich.
+    """
+
+    def __init__(self, model, publish, max_batch=256, max_delay=0.2, cache_size=CACHE_SIZE, detector=None,
+                 model_version=None):
+        self.detector = detector
+        self.cache = PredictionCache(model, FEATURES, maxsize=cache_size, version=model_version)
+        self.publish = publish
+        self.batch_count = 0
+        self.prediction_count = 0
+        self.skipped_count = 0
+        self.publish_errors = 0
+        self._batcher = MicroBatcher(self._predict_batch, max_batch=max_batch,
+                                     max_delay=max_delay, name="inference-worker")
+
+    def submit(self, reading):
+        return self._batcher.submit(reading)
+
+    @property
+    def model(self):
+        return self.cache.model
+
+    def swap_model(self, model, version=None):
+        """Hot-swap (dipanggil ModelManager): batch berikutnya memakai model baru."""
+        self.cache.swap_model(model, version)
+
+    def _features(self, readings):
+        # Nilai kosong -> NaN (bukan 0 palsu); _predict_batch sudah menyaring reading seperti ini
+        return np.array([[r.get(c) for c in PAYLOAD_FEATURES] for r in readings], dtype=np.float64)
+
+    def predict(self, readings):
+        """Prediksi sekumpulan reading sekaligus. Mengembalikan (codes, confidences)."""
+        return self.cache.predict(self._features(readings))
+
+    def _predict_batch(self, batch):
+        if self.detector is not None:
+            self.detector.process(batch)
+        # Sama seperti pipeline dashboard: nilai kosong atau tidak wajar tidak diprediksi
+        trusted = [r for r in batch if not r.missing() and not untrusted_sensors(r.get('faults'))]
+        if len(trusted) < len(batch):
+            self.skipped_count += len(batch) - len(trusted)
+            metrics.PREDICTIONS_SKIPPED.inc(len(batch) - len(trusted))
+            batch = trusted
+        if not batch:
+            return
+        codes, confidences, version = self.cache.predict_versioned(self._features(batch))
+        self.batch_count += 1
+        self.prediction_count += len(batch)
+
+        for reading, code, confidence in zip(batch, codes, confidences):
+            payload = prediction_payload(reading, code, confidence, version)
+            try:
+                info = self.publish(prediction_topic(reading['device_id']), json.dumps(payload))
+                # client.publish tidak melempar error saat terputus, cukup mengembalikan rc != 0
+                if getattr(info, 'rc', mqtt.MQTT_ERR_SUCCESS) != mqtt.MQTT_ERR_SUCCESS:
+                    raise RuntimeError(mqtt.error_string(info.rc))
+            except Exception as e:
+                self.publish_errors += 1
+                metrics.PUBLISH_FAILURES.inc()
+                print(f"❌ Gagal publish prediksi {reading['device_id']}: {e}")
+                continue
+            metrics.END_TO_END_SECONDS.observe(time.time() - (reading.get('sent_ts') or reading['ts']))
+
+    @property
+    def dropped_count(self):
+        return self._batcher.dropped_count
+
+    def flush(self):
+        self._batcher.flush()
+
+    def close(self):
+        self._batcher.close()
+
+def start_model_manager(worker, db_path):
+    """Retraining berbasis drift di latar belakang; model baru langsung dipakai worker."""
+    from sensor_store import SensorStore
+
+    manager = ModelManager(worker.model, SensorStore(db_path, readonly=True), db_path,
+                           version=worker.cache.version)
+    manager.subscribe(worker.swap_model)
+    print(f"🔁 Retraining otomatis aktif (cek drift setiap {manager.check_interval} detik)")
+    return manager.start()
+
+# ==========================================
+# 4. MODE STANDALONE (subscribe MQTT)
+# ==========================================
+def on_connect(client, userdata, flags, rc):
+    print(f"✅ Inference worker terhubung ke MQTT Broker! (Code: {rc})")
+    client.subscribe(TOPICS)
+
+def on_message(client, userdata, msg):
+    try:
+        reading = parse_message(msg)
+        if reading is not None:
+            userdata['worker'].submit(reading)
+    except Exception as e:
+        print(f"❌ Error: {e}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Inference worker micro-batch Chili-Hub")
+    parser.add_argument('--broker', default=BROKER)
+    parser.add_argument('--port', type=int, default=PORT)
+    parser.add_argument('--model', default=MODEL_PATH, help="model .pkl (sklearn) atau .npz (fast_forest)")
+    parser.add_argument('--max-batch', type=int, default=256)
+    parser.add_argument('--max-delay', type=float, default=0.2, help="Detik maksimal menunggu batch penuh")
+    parser.add_argument('--cache-size', type=int, default=CACHE_SIZE, help="Jumlah vektor fitur di cache prediksi")
+    parser.add_argument('--retrain-db', default=None,
+                        help="Database histori (.db): retraining otomatis saat drift + hot-swap model")
+    parser.add_argument('--metrics-port', type=int, default=None, help="Buka endpoint Prometheus di port ini")
+    parser.add_argument('--metrics-file', default=None, help="Tulis metrik ke file ini secara berkala")
+    args = parser.parse_args()
+
+    if args.metrics_port:
+        metrics.start_metrics_server(args.metrics_port)
+        print(f"📈 Metrik tersedia di http://127.0.0.1:{args.metrics_port}/metrics")
+    if args.metrics_file:
+        metrics.start_metrics_file(args.metrics_file)
+
+    model = load_model(args.model)
+    userdata = {}
+    client = mqtt.Client(userdata=userdata)
+    client.on_connect = on_connect
+    client.on_message = on_message
+
+    worker = InferenceWorker(model, client.publish, max_batch=args.max_batch, max_delay=args.max_delay,
+                             cache_size=args.cache_size, detector=AnomalyDetector(), model_version=active_version())
+    userdata['worker'] = worker
+    manager = None
+    if args.retrain_db:
+        manager = start_model_manager(worker, args.retrain_db)
+
+    print(f"🤖 Inference worker berjalan (batch ≤ {args.max_batch}, tunggu ≤ {args.max_delay}s)...")
+    client.connect(args.broker, args.port, 60)
+    try:
+        client.loop_forever()
+    finally:
+        if manager is not None:
+            manager.close()
+        worker.close()
+        print(f"📊 {worker.prediction_count} prediksi dalam {worker.batch_count} batch "
+              f"(cache hit {worker.cache.hit_rate:.1%}, {worker.skipped_count} dilewati karena sensor rusak)")
+
+if __name__ == "__main__":
+    main()
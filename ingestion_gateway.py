@@ -0,0 +1,272 @@
+"""
+Gateway ingestion berbasis asyncio untuk data sensor MQTT.
+
+Pipeline (setiap panah = asyncio.Queue terbatas; setelah receive, isi antrean berupa batch):
+
+    receive (callback paho) -> parse & validasi -> enrich (waktu, anomali) -> fan-out
+                                                                          ├─> storage
+                                                                          ├─> registry
+                                                                          └─> inference (opsional)
+
+I/O jaringan paho dijalankan langsung di event loop (add_reader/add_writer), tanpa
+loop_forever. Setiap sink punya antrean sendiri: sink yang lambat hanya membuang data
+miliknya sendiri (dihitung), tidak menahan pesan yang masuk maupun sink lain.
+"""
+import asyncio
+import time
+
+import paho.mqtt.client as mqtt
+
+import metrics
+from anomaly_detector import AnomalyDetector
+from device_registry import device_id_from_topic
+from payload_codec import PayloadError, decode_payload
+from prediction_publisher import RECONNECT_MIN_DELAY, RECONNECT_MAX_DELAY
+
+QUEUE_SIZE = 10_000
+BATCH_SIZE = 256
+
+# ==========================================
+# 1. PAHO DI DALAM EVENT LOOP ASYNCIO
+# ==========================================
+class AsyncioMqttAdapter:
+    """Hubungkan socket paho ke event loop; reconnect dengan exponential backoff."""
+
+    def __init__(self, loop, client):
+        self.loop = loop
+        self.client = client
+        self._misc = None
+        self._closed = None
+        client.on_socket_open = self._on_socket_open
+        client.on_socket_close = self._on_socket_close
+        client.on_socket_register_write = self._on_socket_register_write
+        client.on_socket_unregister_write = self._on_socket_unregister_write
+
+    def _on_socket_open(self, client, userdata, sock):
+        self.loop.add_reader(sock, client.loop_read)
+        self._misc = self.loop.create_task(self._misc_loop())
+
+    def _on_socket_close(self, client, userdata, sock):
+        self.loop.remove_reader(sock)
+        self.loop.remove_writer(sock)
+        if self._misc is not None:
+            self._misc.cancel()
+        if self._closed is not None and not self._closed.done():
+            self._closed.set_result(None)
+
+    def _on_socket_register_write(self, client, userdata, sock):
+        self.loop.add_writer(sock, client.loop_write)
+
+    def _on_socket_unregister_write(self, client, userdata, sock):
+        self.loop.remove_writer(sock)
+
+    async def _misc_loop(self):
+        # Keepalive/ping & retry QoS, pengganti bagian periodik dari loop_forever
+        while self.client.loop_misc() == mqtt.MQTT_ERR_SUCCESS:
+            await asyncio.sleep(1)
+
+    async def maintain_connection(self, broker, port, keepalive=60):
+        delay = RECONNECT_MIN_DELAY
+        while True:
+            self._closed = self.loop.create_future()
+            try:
+                self.client.connect(broker, port, keepalive)
+                delay = RECONNECT_MIN_DELAY
+                await self._closed
+                print("⚠️ Koneksi MQTT terputus")
+            except OSError as e:
+                print(f"❌ Gagal koneksi ke {broker}:{port}: {e}")
+            print(f"🔁 Mencoba ulang dalam {delay} detik...")
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, RECONNECT_MAX_DELAY)
+
+# ==========================================
+# 2. PIPELINE
+# ==========================================
+async def _get_batch(queue, max_items):
+    """Tunggu minimal satu item, lalu ambil sisanya yang sudah tersedia (tanpa menunggu)."""
+    batch = [await queue.get()]
+    while len(batch) < max_items:
+        try:
+            batch.append(queue.get_nowait())
+        except asyncio.QueueEmpty:
+            break
+    return batch
+
+def _done(queue, batch):
+    for _ in batch:
+        queue.task_done()
+
+def _for_each(fn):
+    def handler(batch):
+        for reading in batch:
+            fn(reading)
+    return handler
+
+class Sink:
+    __slots__ = ('name', 'handler', 'queue', 'dropped_count', 'processed_count')
+
+    def __init__(self, name, handler, max_batches):
+        self.name = name
+        self.handler = handler  # handler(batch) non-blocking
+        self.queue = asyncio.Queue(maxsize=max_batches)
+        self.dropped_count = 0
+        self.processed_count = 0
+
+class IngestionGateway:
+    """
+    receive() dipanggil dari callback paho (di thread event loop). Tahap berikutnya
+    berjalan sebagai task asyncio dan memproses data per batch.
+    """
+
+    def __init__(self, store, registry, worker=None, queue_size=QUEUE_SIZE,
+                 batch_size=BATCH_SIZE, verbose=False, detector=None):
+        self.batch_size = batch_size
+        # Satu detektor untuk semua device, dijalankan sebelum fan-out -> setiap sink
+        # menerima record yang sudah berisi faults
+        self.detector = AnomalyDetector() if detector is None else detector
+        self.verbose = verbose
+        self.received_count = 0
+        self.dropped_count = 0
+        self.invalid_count = 0
+        # Pesan yang gagal diproses karena error tak terduga (bukan payload tidak valid)
+        self.error_count = 0
+
+        # Antrean setelah receive berisi batch -> batasi jumlah batch, bukan jumlah pesan
+        max_batches = max(1, queue_size // batch_size)
+        self._raw = asyncio.Queue(maxsize=queue_size)
+        self._parsed = asyncio.Queue(maxsize=max_batches)
+        self.sinks = [
+            Sink('registry', _for_each(lambda r: registry.update(r['device_id'], r)), max_batches),
+            Sink('storage', store.append_many, max_batches)
+        ]
+        if worker is not None:
+            self.sinks.append(Sink('inference', _for_each(worker.submit), max_batches))
+        self._tasks = []
+
+    # --- TAHAP 1: RECEIVE ---
+    def receive(self, topic, payload, recv_ts=None):
+        self.received_count += 1
+        metrics.MESSAGES_RECEIVED.inc()
+        try:
+            self._raw.put_nowait((topic, payload, time.time() if recv_ts is None else recv_ts))
+        except asyncio.QueueFull:
+            self.dropped_count += 1
+            metrics.INGEST_DROPPED.inc()
+
+    def on_message(self, client, userdata, msg):
+        self.receive(msg.topic, msg.payload)
+
+    # --- TAHAP 2: PARSE & VALIDASI ---
+    def _parse(self, topic, payload, recv_ts):
+        device_id = device_id_from_topic(topic)
+        if device_id is None:
+            return None
+        record = decode_payload(payload, device_id, ts=recv_ts)
+        if self.verbose:
+            print(f"📩 Terima Data [{device_id}]: {record.to_dict()}")
+        return record
+
+    def _count_errors(self, n, stage, error):
+        self.error_count += n
+        metrics.MESSAGE_ERRORS.inc(n)
+        print(f"❌ Error di tahap {stage} ({n} pesan): {error!r}")
+
+    async def _parse_stage(self):
+        # Error apa pun hanya membuang pesan/batch itu: task tahap tidak boleh mati,
+        # kalau tidak antrean penuh dan ingestion berhenti diam-diam
+        while True:
+            batch = await _get_batch(self._raw, self.batch_size)
+            try:
+                parsed_batch = []
+                for topic, payload, recv_ts in batch:
+                    try:
+                        record = self._parse(topic, payload, recv_ts)
+                    except PayloadError as e:
+                        self.invalid_count += 1
+                        print(f"❌ Pesan tidak valid dari {topic}: {e}")
+                        continue
+                    except Exception as e:
+                        self._count_errors(1, 'parse', e)
+                        continue
+                    if record is not None:
+                        parsed_batch.append(record)
+                if parsed_batch:
+                    await self._parsed.put(parsed_batch)
+            except Exception as e:
+                self._count_errors(len(batch), 'parse', e)
+            finally:
+                _done(self._raw, batch)
+
+    # --- TAHAP 3: ENRICH + FAN-OUT ---
+    async def _enrich_stage(self):
+        while True:
+            readings = await self._parsed.get()
+            try:
+                for record in readings:
+                    record.timestamp = time.strftime("%H:%M:%S", time.localtime(record.ts))
+                self.detector.process(readings)
+                for sink in self.sinks:
+                    try:
+                        sink.queue.put_nowait(readings)
+                    except asyncio.QueueFull:
+                        sink.dropped_count += len(readings)
+                        metrics.INGEST_DROPPED.inc(len(readings))
+            except Exception as e:
+                self._count_errors(len(readings), 'enrich', e)
+            finally:
+                self._parsed.task_done()
+
+    # --- TAHAP 4: SINK ---
+    async def _sink_stage(self, sink):
+        while True:
+            batch = await sink.queue.get()
+            try:
+                sink.handler(batch)
+                sink.processed_count += len(batch)
+            except Exception as e:
+                print(f"❌ Error di sink {sink.name}: {e}")
+            finally:
+                sink.queue.task_done()
+            # Beri giliran ke tahap lain di antara batch
+            await asyncio.sleep(0)
+
+    # --- KONTROL ---
+    def start(self):
+        self._tasks = [asyncio.create_task(self._parse_stage(), name="parse"),
+                       asyncio.create_task(self._enrich_stage(), name="enrich")]
+        self._tasks += [asyncio.create_task(self._sink_stage(s), name=s.name) for s in self.sinks]
+
+    async def drain(self):
+        """Tunggu sampai semua pesan yang sudah diterima melewati seluruh tahap."""
+        await self._raw.join()
+        await self._parsed.join()
+        for sink in self.sinks:
+            await sink.queue.join()
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    def stats(self):
+        return {
+            'received': self.received_count,
+            'dropped': self.dropped_count,
+            'invalid': self.invalid_count,
+            'errors': self.error_count,
+            'sensor_faults': self.detector.fault_count,
+            'sinks': {s.name: {'processed': s.processed_count, 'dropped': s.dropped_count} for s in self.sinks}
+        }
+
+async def run_gateway(client, gateway, broker, port, keepalive=60):
+    """Jalankan gateway + koneksi MQTT sampai dibatalkan (Ctrl+C)."""
+    loop = asyncio.get_running_loop()
+    adapter = AsyncioMqttAdapter(loop, client)
+    client.on_message = gateway.on_message
+    gateway.start()
+    try:
+        await adapter.maintain_connection(broker, port, keepalive)
+    finally:
+        await gateway.stop()
+        client.disconnect()
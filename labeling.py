@@ -1,40 +1,43 @@
+import argparse
+import numpy as np
 import pandas as pd
+import rule_engine
+from rule_engine import LABEL_BY_VIOLATIONS, SENSOR_COLUMNS
 
 # ==========================================
-# 1. KONFIGURASI THRESHOLD (Sama dengan Generator)
+# 1. KONFIGURASI THRESHOLD (rule_engine.py)
 # ==========================================
-# Pastikan angka ini SAMA PERSIS dengan acuan saat generate data
-THRESHOLDS = {
-    'temp': {'min': 18, 'max': 27},         # Suhu Udara (Celcius)
-    'soil': {'min': 60, 'max': 80},         # Kelembaban Tanah (%)
-    'lux':  {'min': 19000, 'max': 40000},   # Cahaya (Lux)
-    'air':  {'min': 70, 'max': 80}          # Kelembaban Udara (%)
-}
+# Threshold per profil dan SENSOR_COLUMNS didefinisikan sekali di rule_engine.py,
+# dipakai bersama generator & dashboard. Labeling memakai profil aktif (lihat --profile).
+
+LABEL_NAMES = {0: '0 - Normal', 1: '1 - Warning', 2: '2 - Critical'}
 
 def determine_label(row):
     """
     Fungsi untuk memeriksa satu baris data dan menentukan labelnya
+    (versi acuan baris per baris; reading MQTT memakai rule_engine label_reading)
     """
+    thresholds = rule_engine.active_rules().thresholds
     violations = 0
     
     # 1. Cek Suhu (air_temperature)
     val_temp = row['air_temperature']
-    if not (THRESHOLDS['temp']['min'] <= val_temp <= THRESHOLDS['temp']['max']):
+    if not (thresholds['temp']['min'] <= val_temp <= thresholds['temp']['max']):
         violations += 1
         
     # 2. Cek Tanah (earth_humidity)
     val_soil = row['earth_humidity']
-    if not (THRESHOLDS['soil']['min'] <= val_soil <= THRESHOLDS['soil']['max']):
+    if not (thresholds['soil']['min'] <= val_soil <= thresholds['soil']['max']):
         violations += 1
         
     # 3. Cek Cahaya (luminance)
     val_lux = row['luminance']
-    if not (THRESHOLDS['lux']['min'] <= val_lux <= THRESHOLDS['lux']['max']):
+    if not (thresholds['lux']['min'] <= val_lux <= thresholds['lux']['max']):
         violations += 1
         
     # 4. Cek Udara (air_humidity)
     val_air = row['air_humidity']
-    if not (THRESHOLDS['air']['min'] <= val_air <= THRESHOLDS['air']['max']):
+    if not (thresholds['air']['min'] <= val_air <= thresholds['air']['max']):
         violations += 1
     
     # --- LOGIKA PELABELAN ---
@@ -46,34 +49,105 @@ def determine_label(row):
         return 2  # Critical (3 atau lebih)
 
 # ==========================================
-# 2. EKSEKUSI LABELING
+# 2. LABELING VEKTORISASI (NumPy)
 # ==========================================
-filename_input = 'raw_sensor_data.csv'
-filename_output = 'labeled_sensor_data_1.csv'
+def violation_masks(df, profile=None):
+    """
+    Cek semua baris sekaligus terhadap threshold profil (default: profil aktif).
+    Mengembalikan dict {param: array bool}, True = nilai di luar threshold.
+    Nilai kosong (NaN) dihitung sebagai pelanggaran, sama seperti determine_label.
+    """
+    return rule_engine.resolve(profile).violation_masks(df)
 
-try:
-    # Load data mentah
-    print(f"📂 Membaca file '{filename_input}'...")
-    df = pd.read_csv(filename_input)
-    
-    # Terapkan fungsi labeling ke setiap baris
-    print("🏷️ Sedang melakukan labeling otomatis...")
-    df['label'] = df.apply(determine_label, axis=1)
-    
-    # Simpan hasil
-    df.to_csv(filename_output, index=False)
-    
-    # ==========================================
-    # 3. LAPORAN HASIL
-    # ==========================================
-    print(f"\n✅ Berhasil! File '{filename_output}' telah disimpan.")
-    print("-" * 30)
-    print("Statistik Label yang Terbentuk:")
-    print(df['label'].value_counts().sort_index().rename({0: '0 - Normal', 1: '1 - Warning', 2: '2 - Critical'}))
-    
-    print("\nContoh Data Hasil Labeling:")
-    # Menampilkan data beserta labelnya
-    print(df[['earth_humidity', 'air_temperature', 'luminance', 'label']].head(5))
+def labels_from_masks(masks):
+    """Jumlahkan pelanggaran per baris lalu petakan ke label 0/1/2 (uint8)."""
+    violations = np.zeros(len(next(iter(masks.values()))), dtype=np.uint8)
+    for mask in masks.values():
+        violations += mask
+    return LABEL_BY_VIOLATIONS[violations]
+
+def label_dataframe(df, return_masks=False, profile=None):
+    """
+    Hasil sama persis dengan df.apply(determine_label, axis=1), tetapi dalam satu pass.
+    return_masks=True -> juga mengembalikan mask pelanggaran per sensor.
+    """
+    rules = rule_engine.resolve(profile)
+    if not return_masks:
+        return rules.label_frame(df)
+    masks = rules.violation_masks(df)
+    return labels_from_masks(masks), masks
+
+def rule_model(feature_names=('earth_humidity', 'air_temperature', 'air_humidity', 'luminance'), profile=None):
+    """
+    Aturan threshold dalam bentuk model (predict / predict_proba seperti sklearn).
+    Dipakai sebagai model cadangan saat model_final tidak bisa dimuat: langsung jadi,
+    tanpa training, dan hasilnya sama dengan label_dataframe (profil yang sama).
+    """
+    return rule_engine.resolve(profile).model(feature_names)
+
+def label_csv(filename_input, filename_output, chunksize=None, profile=None):
+    """
+    Labeling file CSV atau dataset .parquet / .arrow (input & output boleh beda format).
+    Jika chunksize diisi, file dibaca per potongan sehingga data yang lebih besar
+    dari RAM tetap bisa diproses.
+    Mengembalikan (jumlah per label, contoh 5 baris pertama); contoh None jika input
+    tidak berisi chunk sama sekali (file output tidak dibuat).
+    """
+    from sensor_dataset import iter_frames, write_frame
+
+    counts = np.zeros(len(LABEL_NAMES), dtype=np.int64)
+    preview = None
+
+    for i, chunk in enumerate(iter_frames(filename_input, chunksize=chunksize)):
+        labels = label_dataframe(chunk, profile=profile)
+        chunk['label'] = labels
+        write_frame(chunk, filename_output, append=i > 0)
+        counts += np.bincount(labels, minlength=len(LABEL_NAMES))
+        if preview is None:
+            preview = chunk.head(5)
+
+    return pd.Series(counts, index=list(LABEL_NAMES.values())), preview
+
+# ==========================================
+# 3. EKSEKUSI LABELING
+# ==========================================
+def main():
+    parser = argparse.ArgumentParser(description="Labeling otomatis data sensor mentah")
+    parser.add_argument('--input', default='raw_sensor_data.csv')
+    parser.add_argument('--output', default='labeled_sensor_data_1.csv')
+    parser.add_argument('--chunksize', type=int, default=None,
+                        help="Jumlah baris per potongan untuk file yang sangat besar")
+    parser.add_argument('--profile', default=None, choices=rule_engine.profile_names(),
+                        help="Profil aturan tanaman/fase (default: profil aktif)")
+    args = parser.parse_args()
+
+    try:
+        print(f"📂 Membaca file '{args.input}'...")
+        print(f"🏷️ Sedang melakukan labeling otomatis (profil {rule_engine.resolve(args.profile).name})...")
+        counts, preview = label_csv(args.input, args.output, chunksize=args.chunksize, profile=args.profile)
+        if preview is None:
+            print(f"⚠️ Tidak ada data di '{args.input}', file '{args.output}' tidak dibuat.")
+            return
+
+        # ==========================================
+        # 4. LAPORAN HASIL
+        # ==========================================
+        print(f"\n✅ Berhasil! File '{args.output}' telah disimpan.")
+        print("-" * 30)
+        print("Statistik Label yang Terbentuk:")
+        print(counts)
+
+        if preview.empty:
+            print("\nℹ️ Input hanya berisi header, tidak ada baris yang dilabeli.")
+        else:
+            print("\nContoh Data Hasil Labeling:")
+            # Menampilkan data beserta labelnya
+            print(preview[['earth_humidity', 'air_temperature', 'luminance', 'label']])
+
+    except FileNotFoundError:
+        print(f"❌ Error: File '{args.input}' tidak ditemukan. Jalankan kode generate data dulu!")
+    except pd.errors.EmptyDataError:
+        print(f"❌ Error: File '{args.input}' kosong (tanpa header kolom).")
 
-except FileNotFoundError:
-    print(f"❌ Error: File '{filename_input}' tidak ditemukan. Jalankan kode generate data dulu!")
\ No newline at end of file
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,185 @@
+"""
+Harness throughput untuk mqtt_listener.py.
+
+Mode 'mock' (default): pesan MQTT palsu dikirim langsung ke on_message, tanpa broker.
+Mode 'gateway'     : pesan palsu dikirim ke IngestionGateway (pipeline asyncio), tanpa broker.
+Mode 'broker'      : listener & publisher sungguhan lewat broker lokal (mis. mosquitto).
+
+Contoh:
+    python listener_harness.py --devices 1000 --messages 20
+    python listener_harness.py --mode gateway --devices 1000 --messages 20
+    python listener_harness.py --mode broker --broker localhost --devices 200 --messages 10
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import tempfile
+import time
+
+import paho.mqtt.client as mqtt
+
+import mqtt_listener
+from anomaly_detector import AnomalyDetector
+from sensor_store import SensorStore
+from device_registry import DeviceRegistry, device_topic
+
+class FakeMessage:
+    __slots__ = ('topic', 'payload')
+
+    def __init__(self, topic, payload):
+        self.topic = topic
+        self.payload = payload
+
+def make_payload(rng, seq):
+    # Format sama dengan publishSensorDataJSON() di esp32_code.ino; 'seq' membuat tiap payload unik
+    return json.dumps({
+        'temp': round(rng.uniform(15, 35), 1),
+        'rh_air': round(rng.uniform(50, 95), 1),
+        'rh_soil': round(rng.uniform(30, 90), 1),
+        'lux': round(rng.uniform(0, 60000), 2),
+        'sensor_health': {'dht_ok': True, 'photo_ok': True, 'soil_ok': True},
+        'seq': seq
+    }).encode()
+
+def build_messages(n_devices, n_messages, seed=0):
+    """Pesan berselang-seling antar device, seperti device yang publish bersamaan."""
+    rng = random.Random(seed)
+    devices = [f"esp32-{d:04d}" for d in range(n_devices)]
+    return devices, [
+        FakeMessage(device_topic(device), make_payload(rng, seq))
+        for seq in range(n_messages)
+        for device in devices
+    ]
+
+def check_registry(registry, devices, n_messages):
+    """Setiap device harus punya tepat n_messages pesan."""
+    errors = []
+    for device in devices:
+        count = registry.message_count(device)
+        if count != n_messages:
+            errors.append(f"{device}: {count} pesan (harusnya {n_messages})")
+    if len(registry) != len(devices):
+        errors.append(f"jumlah device {len(registry)} (harusnya {len(devices)})")
+    return errors
+
+def run_mock(n_devices, n_messages, db_path):
+    devices, messages = build_messages(n_devices, n_messages)
+    store = SensorStore(db_path)
+    registry = DeviceRegistry()
+    userdata = {'store': store, 'registry': registry, 'detector': AnomalyDetector()}
+
+    start = time.perf_counter()
+    for msg in messages:
+        mqtt_listener.on_message(None, userdata, msg)
+    elapsed = time.perf_counter() - start
+
+    store.flush()
+    flushed = time.perf_counter() - start
+    store.close()
+
+    errors = check_registry(registry, devices, n_messages)
+    if store.written_count != len(messages):
+        errors.append(f"tersimpan {store.written_count} dari {len(messages)} pesan (drop: {store.dropped_count})")
+    return len(messages), elapsed, flushed, errors
+
+def run_gateway(n_devices, n_messages, db_path):
+    from ingestion_gateway import IngestionGateway
+
+    devices, messages = build_messages(n_devices, n_messages)
+    store = SensorStore(db_path)
+    registry = DeviceRegistry()
+
+    async def feed():
+        gateway = IngestionGateway(store, registry, queue_size=len(messages))
+        gateway.start()
+        start = time.perf_counter()
+        for i, msg in enumerate(messages):
+            gateway.receive(msg.topic, msg.payload)
+            # Seperti socket paho: beri giliran ke tahap lain setiap beberapa pesan
+            if i % 256 == 255:
+                await asyncio.sleep(0)
+        await gateway.drain()
+        elapsed = time.perf_counter() - start
+        await gateway.stop()
+        return elapsed, start, gateway.stats()
+
+    elapsed, start, stats = asyncio.run(feed())
+    store.flush()
+    flushed = time.perf_counter() - start
+    store.close()
+
+    errors = check_registry(registry, devices, n_messages)
+    if stats['dropped'] or stats['errors'] or any(s['dropped'] for s in stats['sinks'].values()):
+        errors.append(f"ada pesan yang dibuang: {stats}")
+    if store.written_count != len(messages):
+        errors.append(f"tersimpan {store.written_count} dari {len(messages)} pesan (drop: {store.dropped_count})")
+    return len(messages), elapsed, flushed, errors
+
+def run_broker(n_devices, n_messages, db_path, broker, port, timeout=60.0):
+    devices, messages = build_messages(n_devices, n_messages)
+    store = SensorStore(db_path)
+    registry = DeviceRegistry()
+
+    listener = mqtt.Client(userdata={'store': store, 'registry': registry, 'detector': AnomalyDetector()})
+    listener.on_connect = mqtt_listener.on_connect
+    listener.on_message = mqtt_listener.on_message
+    listener.connect(broker, port, 60)
+    listener.loop_start()
+    time.sleep(1.0)  # tunggu subscribe selesai
+
+    publisher = mqtt.Client()
+    publisher.connect(broker, port, 60)
+    publisher.loop_start()
+
+    start = time.perf_counter()
+    for msg in messages:
+        publisher.publish(msg.topic, msg.payload, qos=1)
+
+    # Tunggu sampai semua pesan diterima listener (atau timeout)
+    while time.perf_counter() - start < timeout:
+        if sum(registry.message_count(d) for d in devices) >= len(messages):
+            break
+        time.sleep(0.01)
+    elapsed = time.perf_counter() - start
+
+    publisher.loop_stop()
+    listener.loop_stop()
+    store.flush()
+    flushed = time.perf_counter() - start
+    store.close()
+
+    return len(messages), elapsed, flushed, check_registry(registry, devices, n_messages)
+
+def main():
+    parser = argparse.ArgumentParser(description="Uji throughput mqtt_listener.py")
+    parser.add_argument('--mode', choices=['mock', 'gateway', 'broker'], default='mock')
+    parser.add_argument('--devices', type=int, default=1000)
+    parser.add_argument('--messages', type=int, default=20, help="Jumlah pesan per device")
+    parser.add_argument('--broker', default='localhost')
+    parser.add_argument('--port', type=int, default=1883)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'harness.db')
+        if args.mode == 'mock':
+            total, elapsed, flushed, errors = run_mock(args.devices, args.messages, db_path)
+        elif args.mode == 'gateway':
+            total, elapsed, flushed, errors = run_gateway(args.devices, args.messages, db_path)
+        else:
+            total, elapsed, flushed, errors = run_broker(args.devices, args.messages, db_path,
+                                                         args.broker, args.port)
+
+    print(f"📨 {total} pesan dari {args.devices} device")
+    print(f"⚡ Ingest : {total / elapsed:,.0f} pesan/detik ({elapsed:.2f} detik)")
+    print(f"💾 + disk : {total / flushed:,.0f} pesan/detik ({flushed:.2f} detik)")
+    if errors:
+        print(f"❌ {len(errors)} masalah ditemukan:")
+        for err in errors[:10]:
+            print(f"   - {err}")
+        raise SystemExit(1)
+    print("✅ Semua pesan dari semua device tercatat lengkap")
+
+if __name__ == "__main__":
+    main()
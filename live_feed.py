@@ -0,0 +1,49 @@
+import queue
+import threading
+import weakref
+
+# ==========================================
+# BROADCAST DATA SENSOR KE SESI DASHBOARD
+# ==========================================
+class ReadingBroadcaster:
+    """
+    Meneruskan setiap reading dari callback MQTT ke semua sesi dashboard yang aktif.
+
+    Setiap sesi punya antrean sendiri (subscribe()). Antrean disimpan sebagai weakref,
+    jadi sesi yang sudah ditutup otomatis berhenti menerima data. Jika sebuah sesi
+    lambat dan antreannya penuh, data paling lama dibuang agar yang terbaru tetap masuk.
+    """
+
+    def __init__(self, maxsize=100):
+        self.maxsize = maxsize
+        self._subscribers = weakref.WeakSet()
+        self._lock = threading.Lock()
+
+    def subscribe(self):
+        q = queue.Queue(maxsize=self.maxsize)
+        with self._lock:
+            self._subscribers.add(q)
+        return q
+
+    def publish(self, reading):
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for q in subscribers:
+            while True:
+                try:
+                    q.put_nowait(reading)
+                    break
+                except queue.Full:
+                    try:
+                        q.get_nowait()
+                    except queue.Empty:
+                        pass
+
+    def __len__(self):
+        with self._lock:
+            return len(self._subscribers)
+
+def reading_key(reading):
+    """Kunci untuk mendeteksi reading duplikat berturut-turut (nilai sensor + health sama)."""
+    return (reading.get('temp'), reading.get('rh_air'), reading.get('rh_soil'), reading.get('lux'),
+            reading.get('dht_ok'), reading.get('photo_ok'), reading.get('soil_ok'))
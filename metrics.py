@@ -0,0 +1,216 @@
+"""
+Instrumentasi ringan (tanpa dependensi) untuk listener, inference worker & dashboard.
+
+Counter dan Histogram disimpan di REGISTRY, lalu bisa dibaca lewat:
+- endpoint HTTP format teks Prometheus  : start_metrics_server(port) -> http://localhost:<port>/metrics
+- file yang ditulis ulang berkala        : start_metrics_file(path, interval)
+"""
+import bisect
+import os
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DEFAULT_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025,
+                   0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# ==========================================
+# 1. JENIS METRIK
+# ==========================================
+class Counter:
+    def __init__(self, name, help_text):
+        self.name = name
+        self.help = help_text
+        self._value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1):
+        with self._lock:
+            self._value += amount
+
+    @property
+    def value(self):
+        return self._value
+
+    def render(self):
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter",
+                f"{self.name} {self._value:g}"]
+
+class Gauge(Counter):
+    def set(self, value):
+        with self._lock:
+            self._value = value
+
+    def render(self):
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} gauge",
+                f"{self.name} {self._value:g}"]
+
+class Histogram:
+    """Histogram dengan bucket tetap (detik). observe() O(log jumlah bucket)."""
+
+    def __init__(self, name, help_text, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.buckets = tuple(buckets)
+        self._counts = [0] * (len(self.buckets) + 1)
+        self._sum = 0.0
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self._counts[i] += 1
+            self._sum += value
+            self._count += 1
+
+    @contextmanager
+    def time(self):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start)
+
+    @property
+    def count(self):
+        return self._count
+
+    def quantile(self, q):
+        """Perkiraan kuantil dari bucket (batas atas bucket tempat kuantil jatuh)."""
+        with self._lock:
+            counts, total = list(self._counts), self._count
+        if total == 0:
+            return None
+        target = q * total
+        cumulative = 0
+        for i, c in enumerate(counts):
+            cumulative += c
+            if cumulative >= target:
+                return self.buckets[i] if i < len(self.buckets) else float('inf')
+        return float('inf')
+
+    def render(self):
+        with self._lock:
+            counts, total, sum_ = list(self._counts), self._count, self._sum
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        cumulative = 0
+        for bound, c in zip(self.buckets, counts):
+            cumulative += c
+            lines.append(f'{self.name}_bucket{{le="{bound:g}"}} {cumulative}')
+        lines.append(f'{self.name}_bucket{{le="+Inf"}} {total}')
+        lines.append(f"{self.name}_sum {sum_:g}")
+        lines.append(f"{self.name}_count {total}")
+        return lines
+
+# ==========================================
+# 2. REGISTRY
+# ==========================================
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _get_or_create(self, cls, name, help_text, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, help_text, **kwargs)
+            return metric
+
+    def counter(self, name, help_text):
+        return self._get_or_create(Counter, name, help_text)
+
+    def gauge(self, name, help_text):
+        return self._get_or_create(Gauge, name, help_text)
+
+    def histogram(self, name, help_text, buckets=DEFAULT_BUCKETS):
+        return self._get_or_create(Histogram, name, help_text, buckets=buckets)
+
+    def render(self):
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+REGISTRY = MetricsRegistry()
+
+# ==========================================
+# 3. METRIK CHILI-HUB
+# ==========================================
+MESSAGES_RECEIVED = REGISTRY.counter('chilihub_messages_received_total', "Pesan MQTT data sensor yang diterima")
+MESSAGE_ERRORS = REGISTRY.counter('chilihub_message_errors_total', "Pesan MQTT yang gagal diproses")
+INGEST_DROPPED = REGISTRY.counter('chilihub_ingest_dropped_total', "Pesan dibuang karena antrean tahap ingestion penuh")
+PARSE_SECONDS = REGISTRY.histogram('chilihub_json_parse_seconds', "Waktu decode + validasi payload sensor")
+SENSOR_FAULTS = REGISTRY.counter('chilihub_sensor_faults_total', "Nilai sensor yang ditandai anomali (stuck/spike/out_of_range)")
+PAYLOAD_REJECTED = REGISTRY.counter('chilihub_payload_rejected_total', "Payload sensor yang ditolak karena tidak sesuai skema")
+DISK_WRITE_SECONDS = REGISTRY.histogram('chilihub_disk_write_seconds', "Waktu tulis satu batch ke SQLite")
+DISK_WRITE_ROWS = REGISTRY.counter('chilihub_disk_rows_written_total', "Baris yang tersimpan ke SQLite")
+STORE_DROPPED = REGISTRY.counter('chilihub_store_dropped_total', "Reading yang dibuang karena antrean storage penuh/gagal tulis")
+INFERENCE_SECONDS = REGISTRY.histogram('chilihub_inference_seconds', "Waktu satu panggilan prediksi model (per batch)")
+PREDICTIONS = REGISTRY.counter('chilihub_predictions_total', "Jumlah reading yang sudah diklasifikasi")
+PREDICTIONS_SKIPPED = REGISTRY.counter('chilihub_predictions_skipped_total', "Reading yang tidak diprediksi karena sensornya rusak")
+PREDICTION_CACHE_HITS = REGISTRY.counter('chilihub_prediction_cache_hits_total', "Prediksi yang diambil dari cache LRU")
+PREDICTION_CACHE_MISSES = REGISTRY.counter('chilihub_prediction_cache_misses_total', "Prediksi yang harus dihitung model")
+PREDICTION_CACHE_HIT_RATIO = REGISTRY.gauge('chilihub_prediction_cache_hit_ratio', "Rasio hit cache prediksi sejak start")
+END_TO_END_SECONDS = REGISTRY.histogram(
+    'chilihub_end_to_end_seconds',
+    "Waktu dari publish ESP32 (sent_ts di payload, atau waktu terima jika tidak ada) sampai prediksi dipublish"
+)
+PUBLISH_FAILURES = REGISTRY.counter('chilihub_mqtt_publish_failures_total', "Publish MQTT yang gagal")
+PUBLISH_DROPPED = REGISTRY.counter('chilihub_publish_dropped_total', "Prediksi dibuang karena antrean publish penuh")
+PUBLISH_COALESCED = REGISTRY.counter('chilihub_publish_coalesced_total', "Prediksi tertunda yang diganti prediksi lebih baru")
+PUBLISH_PENDING = REGISTRY.gauge('chilihub_publish_pending', "Prediksi di antrean publish")
+PUBLISH_INFLIGHT = REGISTRY.gauge('chilihub_publish_inflight', "Publish QoS 1 yang belum di-ack broker")
+COLD_START_SECONDS = REGISTRY.gauge('chilihub_cold_start_seconds', "Waktu start proses sampai model & pipeline siap")
+
+# ==========================================
+# 4. EKSPOR: HTTP ENDPOINT & FILE
+# ==========================================
+def _make_handler(registry):
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path not in ('/metrics', '/'):
+                self.send_error(404)
+                return
+            body = registry.render().encode()
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/plain; version=0.0.4')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass  # jangan penuhi terminal dengan log akses
+
+    return MetricsHandler
+
+def start_metrics_server(port, host='127.0.0.1', registry=REGISTRY):
+    """Jalankan endpoint /metrics di thread daemon. Mengembalikan objek server."""
+    server = ThreadingHTTPServer((host, port), _make_handler(registry))
+    threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+    return server
+
+def write_metrics_file(path, registry=REGISTRY):
+    # Tulis ke file sementara lalu rename, agar pembaca tidak melihat file setengah jadi
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w') as f:
+        f.write(registry.render())
+    os.replace(tmp_path, path)
+
+def start_metrics_file(path, interval=10.0, registry=REGISTRY):
+    """Tulis ulang file metrik setiap interval detik di thread daemon."""
+    def loop():
+        while True:
+            try:
+                write_metrics_file(path, registry)
+            except OSError as e:
+                print(f"❌ Gagal menulis metrik ke {path}: {e}")
+            time.sleep(interval)
+
+    thread = threading.Thread(target=loop, name="metrics-file", daemon=True)
+    thread.start()
+    return thread
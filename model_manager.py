@@ -0,0 +1,428 @@
+"""
+Retraining di latar belakang + hot-swap model tanpa restart.
+
+ModelManager berjalan di satu thread per proses (dashboard, inference worker, listener):
+
+1. Setiap check_interval detik, ambil histori sensor window terakhir dari database
+   (mqtt_listener.py) lalu labeli dengan profil aturan standar (bukan profil aktif di
+   dashboard: model produksi selalu dilatih dengan label yang sama).
+2. Bandingkan distribusinya dengan distribusi data training model aktif (PSI per fitur
+   dan per label). Drift jika PSI > PSI_THRESHOLD. Model yang belum punya distribusi
+   referensi (model lama) dicatat dengan window ini sebagai referensi, tanpa retraining.
+   Model cadangan aturan tidak dicek (tidak ada yang bisa dibandingkan).
+3. Jika drift, training kandidat dijalankan di proses terpisah (ProcessPoolExecutor)
+   supaya prediksi & ingestion tidak ikut melambat.
+4. Kandidat dan model aktif dinilai pada data validasi yang sama (20% data terbaru).
+   Kandidat hanya dipakai jika F1-nya tidak lebih buruk.
+5. File kandidat (model_vN.pkl/.npz) disalin ke model_final.* lewat os.replace (atomik,
+   proses lain yang sedang mmap file lama tidak terganggu), lalu setiap subscriber
+   (PredictionCache.swap_model) menerima model baru. Reading yang sedang diproses tetap
+   selesai dengan model lama, tidak ada yang dibuang.
+
+Semua versi (diterima/ditolak) dicatat di MANIFEST_PATH, versi aktif ikut di payload
+prediksi sebagai "model_version".
+
+Contoh:
+    python model_manager.py status
+    python model_manager.py check --db sensor_history.db
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import shutil
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+from fast_forest import FAST_MODEL_PATH, export_forest, load_model
+
+MODEL_PATH = 'model_final.pkl'
+MANIFEST_PATH = 'model_versions.json'
+# Versi untuk model cadangan aturan threshold (labeling.rule_model)
+RULE_MODEL_VERSION = 'rule'
+FEATURES = ['earth_humidity', 'air_temperature', 'air_humidity', 'luminance']
+CLASSES = (0, 1, 2)
+
+# PSI > 0.2 = pergeseran distribusi yang berarti (aturan umum untuk PSI)
+PSI_THRESHOLD = 0.2
+REFERENCE_BINS = 10
+CHECK_INTERVAL = 600
+WINDOW_HOURS = 24
+MIN_ROWS = 1000
+# Jeda minimal antar retraining, walau drift masih terdeteksi
+RETRAIN_COOLDOWN = 3600
+VALIDATION_FRACTION = 0.2
+
+# ==========================================
+# 1. DISTRIBUSI REFERENSI & DRIFT
+# ==========================================
+def feature_reference(df, bins=REFERENCE_BINS):
+    """Distribusi data training: batas bin kuantil + proporsi per fitur, proporsi label."""
+    reference = {'features': {}, 'labels': None, 'rows': int(len(df))}
+    for feature in FEATURES:
+        values = df[feature].dropna().to_numpy(dtype=np.float64)
+        edges = np.unique(np.quantile(values, np.linspace(0, 1, bins + 1)[1:-1]))
+        reference['features'][feature] = {'edges': edges.tolist(),
+                                          'proportions': _proportions(values, edges).tolist()}
+    if 'label' in df:
+        counts = np.bincount(df['label'].to_numpy(dtype=np.int64), minlength=len(CLASSES))[:len(CLASSES)]
+        reference['labels'] = (counts / max(counts.sum(), 1)).tolist()
+    return reference
+
+def _proportions(values, edges):
+    # Bin pertama/terakhir terbuka (-inf, e0) dan [eN, inf)
+    counts = np.bincount(np.searchsorted(edges, values, side='right'), minlength=len(edges) + 1)
+    return counts / max(counts.sum(), 1)
+
+def psi(expected, actual, eps=1e-4):
+    """Population Stability Index antara dua vektor proporsi."""
+    expected = np.clip(np.asarray(expected, dtype=np.float64), eps, None)
+    actual = np.clip(np.asarray(actual, dtype=np.float64), eps, None)
+    return float(np.sum((actual - expected) * np.log(actual / expected)))
+
+def drift_report(reference, df, threshold=PSI_THRESHOLD):
+    """PSI per fitur & label data df terhadap reference. 'drifted' berisi nama yang melewati threshold."""
+    scores = {}
+    for feature, ref in reference['features'].items():
+        values = df[feature].dropna().to_numpy(dtype=np.float64)
+        scores[feature] = psi(ref['proportions'], _proportions(values, np.asarray(ref['edges'])))
+    if reference.get('labels') is not None and 'label' in df:
+        counts = np.bincount(df['label'].to_numpy(dtype=np.int64), minlength=len(CLASSES))[:len(CLASSES)]
+        scores['label'] = psi(reference['labels'], counts / max(counts.sum(), 1))
+    return {'psi': scores, 'drifted': [name for name, score in scores.items() if score > threshold]}
+
+# ==========================================
+# 2. MANIFEST VERSI MODEL
+# ==========================================
+def load_manifest(path=MANIFEST_PATH):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {'active': None, 'versions': []}
+
+def save_manifest(manifest, path=MANIFEST_PATH):
+    # Tulis ke file sementara lalu ganti: pembaca tidak pernah melihat file setengah jadi
+    tmp = f"{path}.tmp"
+    with open(tmp, 'w') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp, path)
+
+def _next_version(manifest):
+    return f"v{len(manifest['versions']) + 1}"
+
+def _install(src, dst):
+    """Salin src ke dst secara atomik (salin ke file sementara, lalu os.replace)."""
+    tmp = f"{dst}.tmp"
+    shutil.copyfile(src, tmp)
+    os.replace(tmp, dst)
+
+def record_model_version(model_path, fast_path, reference, source, metrics=None, activate=True,
+                         manifest_path=MANIFEST_PATH):
+    """Catat model hasil train_model.py sebagai versi baru (dan versi aktif)."""
+    manifest = load_manifest(manifest_path)
+    version = _next_version(manifest)
+    manifest['versions'].append({
+        'version': version, 'created': datetime.now().isoformat(timespec='seconds'),
+        'source': source, 'model_path': model_path, 'fast_path': fast_path,
+        'status': 'active' if activate else 'candidate', 'metrics': metrics or {}, 'reference': reference
+    })
+    if activate:
+        _mark_active(manifest, version)
+    save_manifest(manifest, manifest_path)
+    return version
+
+def _mark_active(manifest, version):
+    for entry in manifest['versions']:
+        if entry['status'] == 'active' and entry['version'] != version:
+            entry['status'] = 'retired'
+        elif entry['version'] == version:
+            entry['status'] = 'active'
+    manifest['active'] = version
+
+def active_entry(manifest):
+    for entry in manifest['versions']:
+        if entry['version'] == manifest.get('active'):
+            return entry
+    return None
+
+def active_version(manifest_path=MANIFEST_PATH):
+    """Versi model aktif, None jika model belum tercatat (mis. model lama / model cadangan)."""
+    return load_manifest(manifest_path).get('active')
+
+# ==========================================
+# 3. TRAINING KANDIDAT (DI PROSES WORKER)
+# ==========================================
+def labeled_history(store, start, end=None):
+    """Histori sensor [start, end) dalam format data training, dilabeli profil aturan standar."""
+    from labeling import label_dataframe
+    from rule_engine import STANDARD_PROFILE
+    from sensor_store import to_feature_frame
+
+    df = to_feature_frame(store.query(start=start, end=end)).dropna(subset=FEATURES)
+    df['label'] = label_dataframe(df, profile=STANDARD_PROFILE)
+    return df.reset_index(drop=True)
+
+def weighted_f1(y_true, y_pred):
+    """Sama dengan sklearn f1_score(average='weighted'), tanpa perlu impor sklearn."""
+    y_true, y_pred = np.asarray(y_true), np.asarray(y_pred)
+    score = 0.0
+    for label in np.unique(y_true):
+        actual, predicted = y_true == label, y_pred == label
+        tp = np.sum(actual & predicted)
+        score += actual.sum() * (2 * tp / (actual.sum() + predicted.sum()))
+    return float(score / max(len(y_true), 1))
+
+def _evaluate(model, df):
+    return weighted_f1(df['label'].to_numpy(), model.predict(df[FEATURES]))
+
+def train_candidate(db_path, start, end, model_path, fast_path, params=None):
+    """
+    Dijalankan di proses worker: training RandomForest pada window histori, validasi pada
+    VALIDATION_FRACTION data terbaru (urut waktu, bukan acak: model dinilai pada data
+    setelah data latihnya). Mengembalikan ringkasan + path file kandidat.
+    """
+    import joblib
+    from sklearn.ensemble import RandomForestClassifier
+    from sensor_store import SensorStore
+
+    df = labeled_history(SensorStore(db_path, readonly=True), start, end)
+    split = int(len(df) * (1 - VALIDATION_FRACTION))
+    train, validation = df.iloc[:split], df.iloc[split:]
+
+    started = time.perf_counter()
+    model = RandomForestClassifier(random_state=42, n_jobs=1, **(params or {'n_estimators': 100}))
+    model.fit(train[FEATURES], train['label'])
+    # Tanpa kompresi agar bisa dimuat dengan mmap_mode='r'
+    joblib.dump(model, model_path)
+    export_forest(model, fast_path)
+    return {'model_path': model_path, 'fast_path': fast_path, 'rows': len(df),
+            'train_seconds': round(time.perf_counter() - started, 2),
+            'f1': _evaluate(model, validation), 'validation_start': validation['timestamp'].min().isoformat(),
+            'reference': feature_reference(train)}
+
+# ==========================================
+# 4. MODEL MANAGER (THREAD LATAR BELAKANG)
+# ==========================================
+class ModelManager:
+    """
+    Pemilik model aktif di satu proses. subscribe(callback) -> callback(model, version)
+    dipanggil setiap kali model diganti (dari thread manager).
+    """
+
+    def __init__(self, model, store, db_path, version=None, manifest_path=MANIFEST_PATH,
+                 model_path=MODEL_PATH, fast_path=FAST_MODEL_PATH, check_interval=CHECK_INTERVAL,
+                 window_hours=WINDOW_HOURS, min_rows=MIN_ROWS, cooldown=RETRAIN_COOLDOWN):
+        self.model = model
+        self.version = version
+        self.store = store
+        self.db_path = db_path
+        self.manifest_path = manifest_path
+        self.model_path = model_path
+        self.fast_path = fast_path
+        self.check_interval = check_interval
+        self.window = timedelta(hours=window_hours)
+        self.min_rows = min_rows
+        self.cooldown = cooldown
+        self.last_report = None
+        self.last_retrain = 0.0
+        self.retrain_count = 0
+        self.swap_count = 0
+
+        self._callbacks = []
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def subscribe(self, callback):
+        with self._lock:
+            self._callbacks.append(callback)
+
+    def start(self):
+        self._thread = threading.Thread(target=self._loop, name="model-manager", daemon=True)
+        self._thread.start()
+        return self
+
+    def close(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def _loop(self):
+        while not self._stop.wait(self.check_interval):
+            try:
+                self.check_once()
+            except Exception as e:
+                print(f"❌ Error di model manager: {e}")
+
+    # --- DRIFT ---
+    def check_once(self, now=None):
+        """Cek drift sekali; retraining + swap jika perlu. Mengembalikan laporan."""
+        now = now or datetime.now()
+        entry = active_entry(load_manifest(self.manifest_path))
+        if entry is not None and entry['version'] != self.version and os.path.exists(entry['fast_path']):
+            # Versi baru dari proses lain (train_model.py / manager di proses lain): cukup dimuat
+            self.swap(load_model(entry['fast_path']), entry['version'])
+            print(f"✅ Model {entry['version']} dimuat ulang dari {entry['fast_path']}")
+            self.last_report = {'rows': 0, 'drifted': [], 'psi': {}, 'action': 'reloaded'}
+            return self.last_report
+        if self.version == RULE_MODEL_VERSION:
+            # Model cadangan = aturan pelabelan itu sendiri: F1 baseline selalu ~1, kandidat
+            # apa pun pasti ditolak. Tunggu model hasil train_model.py (dimuat di atas)
+            self.last_report = {'rows': 0, 'drifted': [], 'psi': {}, 'action': 'rule_model'}
+            return self.last_report
+
+        df = labeled_history(self.store, now - self.window, now)
+        report = {'rows': len(df), 'drifted': [], 'psi': {}, 'action': None}
+        reference = entry.get('reference') if entry and entry['version'] == self.version else None
+        if len(df) < self.min_rows:
+            report['action'] = 'not_enough_data'
+        elif reference is None:
+            # Model belum tercatat (model lama): window ini jadi referensi, bukan alasan retraining
+            self.record_reference(entry, df, now)
+            report['action'] = 'reference_recorded'
+        else:
+            report.update(drift_report(reference, df))
+            if not report['drifted']:
+                report['action'] = 'ok'
+            elif time.time() - self.last_retrain < self.cooldown:
+                report['action'] = 'cooldown'
+            elif not self._acquire_retrain_lock():
+                report['action'] = 'busy'
+            else:
+                try:
+                    report['action'] = self.retrain(now - self.window, now, df, report)
+                finally:
+                    os.remove(self._lock_path)
+        self.last_report = report
+        return report
+
+    def record_reference(self, entry, df, now):
+        """Catat distribusi df sebagai referensi model aktif (versi baru jika belum tercatat)."""
+        reference = feature_reference(df)
+        if entry is not None and entry['version'] == self.version:
+            manifest = load_manifest(self.manifest_path)
+            for item in manifest['versions']:
+                if item['version'] == self.version:
+                    item['reference'] = reference
+            save_manifest(manifest, self.manifest_path)
+            print(f"📌 Referensi distribusi model {self.version} dicatat dari histori")
+            return self.version
+        version = record_model_version(self.model_path, self.fast_path, reference,
+                                       f"{self.db_path} (referensi {now.isoformat(timespec='seconds')})",
+                                       manifest_path=self.manifest_path)
+        # Model tetap sama, hanya versinya yang kini tercatat (ikut di payload prediksi)
+        self.swap(self.model, version)
+        print(f"📌 Model aktif dicatat sebagai {version} dengan referensi dari histori")
+        return version
+
+    @property
+    def _lock_path(self):
+        return f"{self.manifest_path}.lock"
+
+    def _acquire_retrain_lock(self):
+        """Satu retraining sekaligus untuk semua proses yang memakai manifest yang sama."""
+        try:
+            if time.time() - os.path.getmtime(self._lock_path) > self.cooldown:
+                # Sisa proses yang mati di tengah retraining
+                os.remove(self._lock_path)
+        except OSError:
+            pass
+        try:
+            os.close(os.open(self._lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+            return True
+        except FileExistsError:
+            return False
+
+    # --- RETRAINING ---
+    def retrain(self, start, end, df, report):
+        self.last_retrain = time.time()
+        self.retrain_count += 1
+        manifest = load_manifest(self.manifest_path)
+        version = _next_version(manifest)
+        model_path, fast_path = f"model_{version}.pkl", f"model_{version}.npz"
+        entry = active_entry(manifest)
+        params = entry.get('metrics', {}).get('params') if entry else None
+
+        print(f"🔁 Drift terdeteksi ({', '.join(report['drifted'])}), training kandidat {version}...")
+        # Satu proses worker per retraining: sklearn tidak pernah di-import di proses utama.
+        # spawn (bukan fork): proses ini punya banyak thread (MQTT, pipeline, Streamlit)
+        with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context('spawn')) as pool:
+            result = pool.submit(train_candidate, self.db_path, start.isoformat(), end.isoformat(),
+                                 model_path, fast_path, params).result()
+
+        # Model aktif dinilai pada data validasi yang sama dengan kandidat
+        validation = df[df['timestamp'] >= pd.Timestamp(result['validation_start'])]
+        baseline_f1 = _evaluate(self.model, validation)
+        accepted = result['f1'] >= baseline_f1
+        manifest['versions'].append({
+            'version': version, 'created': datetime.now().isoformat(timespec='seconds'),
+            'source': f"{self.db_path} [{start.isoformat(timespec='seconds')}, {end.isoformat(timespec='seconds')})",
+            'model_path': model_path, 'fast_path': fast_path,
+            'status': 'candidate' if accepted else 'rejected', 'reference': result['reference'],
+            'metrics': {'f1': result['f1'], 'baseline_f1': baseline_f1, 'baseline_version': self.version,
+                        'rows': result['rows'], 'train_seconds': result['train_seconds'],
+                        'psi': report['psi'], 'drifted': report['drifted'], 'params': params}
+        })
+        if not accepted:
+            save_manifest(manifest, self.manifest_path)
+            print(f"⚠️ Kandidat {version} ditolak (F1 {result['f1']:.4f} < {baseline_f1:.4f})")
+            return 'rejected'
+
+        _install(fast_path, self.fast_path)
+        _install(model_path, self.model_path)
+        _mark_active(manifest, version)
+        save_manifest(manifest, self.manifest_path)
+        self.swap(load_model(fast_path), version)
+        print(f"✅ Model {version} aktif (F1 {result['f1']:.4f} vs {baseline_f1:.4f})")
+        return 'swapped'
+
+    def swap(self, model, version):
+        """Ganti model aktif di semua subscriber (tanpa menghentikan prediksi)."""
+        with self._lock:
+            self.model, self.version = model, version
+            callbacks = list(self._callbacks)
+        for callback in callbacks:
+            callback(model, version)
+        self.swap_count += 1
+
+# ==========================================
+# 5. CLI
+# ==========================================
+def main():
+    parser = argparse.ArgumentParser(description="Versi model & retraining berbasis drift Chili-Hub")
+    parser.add_argument('--manifest', default=MANIFEST_PATH)
+    sub = parser.add_subparsers(dest='command', required=True)
+    sub.add_parser('status', help="Tampilkan semua versi model")
+    p_check = sub.add_parser('check', help="Cek drift sekali (dan retraining jika perlu)")
+    p_check.add_argument('--db', default='sensor_history.db')
+    p_check.add_argument('--window-hours', type=float, default=WINDOW_HOURS)
+    p_check.add_argument('--min-rows', type=int, default=MIN_ROWS)
+    args = parser.parse_args()
+
+    if args.command == 'status':
+        manifest = load_manifest(args.manifest)
+        for entry in manifest['versions']:
+            f1 = entry['metrics'].get('f1')
+            print(f"{entry['version']:<6}{entry['status']:<10}{entry['created']}  "
+                  f"F1={'-' if f1 is None else f'{f1:.4f}'}  {entry['source']}")
+        print(f"🏷️ Versi aktif: {manifest['active']}")
+        return
+
+    from sensor_store import SensorStore
+
+    version = active_version(args.manifest)
+    path = FAST_MODEL_PATH if os.path.exists(FAST_MODEL_PATH) else MODEL_PATH
+    manager = ModelManager(load_model(path), SensorStore(args.db, readonly=True), args.db, version=version,
+                           manifest_path=args.manifest, window_hours=args.window_hours, min_rows=args.min_rows)
+    report = manager.check_once()
+    print(f"📊 {report['rows']:,} baris, PSI: { {k: round(v, 3) for k, v in report['psi'].items()} }")
+    print(f"➡️ Hasil: {report['action']}")
+
+if __name__ == "__main__":
+    main()
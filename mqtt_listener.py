@@ -1,40 +1,132 @@
 import paho.mqtt.client as mqtt
-import json
+import argparse
+import asyncio
 import time
 
+from anomaly_detector import AnomalyDetector
+from payload_codec import decode_payload
+from sensor_store import SensorStore, DB_FILE
+from device_registry import DeviceRegistry, device_id_from_topic, LEGACY_TOPIC, DEVICE_TOPIC_WILDCARD
+import metrics
+
 # --- KONFIGURASI ---
 # Kita pakai broker gratisan publik untuk tes
 BROKER = "broker.emqx.io"
 PORT = 1883
-TOPIC = "chilihub/data/sensors"
-DATA_FILE = "latest_data.json"
+# Topic lama (1 device) + wildcard untuk banyak device: chilihub/<device_id>/data/sensors
+TOPICS = [(LEGACY_TOPIC, 0), (DEVICE_TOPIC_WILDCARD, 0)]
 
 def on_connect(client, userdata, flags, rc):
     print(f"✅ Terhubung ke MQTT Broker! (Code: {rc})")
-    client.subscribe(TOPIC)
+    client.subscribe(TOPICS)
+
+def parse_message(msg, verbose=False):
+    """
+    Ubah pesan MQTT menjadi satu SensorRecord (bisa diakses seperti dict datar).
+    None jika topic bukan data sensor; PayloadError jika payload tidak sesuai skema.
+    """
+    device_id = device_id_from_topic(msg.topic)
+    if device_id is None:
+        return None
+
+    metrics.MESSAGES_RECEIVED.inc()
+    # Tambahkan waktu terima
+    record = decode_payload(msg.payload, device_id, timestamp=time.strftime("%H:%M:%S"))
+    if verbose:
+        print(f"📩 Terima Data [{device_id}]: {record.to_dict()}")
+    return record
 
 def on_message(client, userdata, msg):
     try:
-        payload = msg.payload.decode()
-        print(f"📩 Terima Data: {payload}")
-        
-        # Parse data JSON
-        data = json.loads(payload)
-        
-        # Tambahkan waktu terima
-        data['timestamp'] = time.strftime("%H:%M:%S")
-        
-        # Simpan ke file agar bisa dibaca Dashboard
-        with open(DATA_FILE, 'w') as f:
-            json.dump(data, f)
-            
+        reading = parse_message(msg, userdata.get('verbose'))
+        if reading is None:
+            return
+
+        # Tandai sensor macet/spike/di luar batas sebelum disimpan
+        userdata['detector'].check(reading)
+        # State per device di memori + antrean storage (ditulis ke disk oleh thread writer)
+        userdata['registry'].update(reading['device_id'], reading)
+        userdata['store'].append(reading)
+
     except Exception as e:
+        metrics.MESSAGE_ERRORS.inc()
         print(f"❌ Error: {e}")
 
-client = mqtt.Client()
-client.on_connect = on_connect
-client.on_message = on_message
+def run_threaded(args, store, registry):
+    """Mode lama: semua diproses langsung di thread callback paho (loop_forever)."""
+    client = mqtt.Client(userdata={'store': store, 'registry': registry, 'detector': AnomalyDetector(),
+                                   'verbose': args.verbose})
+    client.on_connect = on_connect
+    client.on_message = on_message
+    client.connect(args.broker, args.port, 60)
+    client.loop_forever()
+
+def run_async(args, store, registry):
+    from ingestion_gateway import IngestionGateway, run_gateway
+
+    async def runner():
+        loop = asyncio.get_running_loop()
+        client = mqtt.Client()
+        client.on_connect = on_connect
+        worker = manager = None
+        if args.model:
+            from fast_forest import load_model
+            from inference_worker import InferenceWorker, start_model_manager
+            from model_manager import active_version
+            # Publish dari thread worker diteruskan ke event loop (socket paho milik loop)
+            worker = InferenceWorker(load_model(args.model),
+                                     lambda topic, payload: loop.call_soon_threadsafe(client.publish, topic, payload),
+                                     model_version=active_version())
+            if args.retrain:
+                manager = start_model_manager(worker, args.db)
+        gateway = IngestionGateway(store, registry, worker=worker, verbose=args.verbose)
+        try:
+            await run_gateway(client, gateway, args.broker, args.port)
+        finally:
+            if manager is not None:
+                manager.close()
+            if worker is not None:
+                worker.close()
+            print(f"📊 {gateway.stats()}")
+
+    try:
+        asyncio.run(runner())
+    except KeyboardInterrupt:
+        pass
+
+def main():
+    parser = argparse.ArgumentParser(description="Listener MQTT data sensor Chili-Hub")
+    parser.add_argument('--broker', default=BROKER)
+    parser.add_argument('--port', type=int, default=PORT)
+    parser.add_argument('--db', default=DB_FILE)
+    parser.add_argument('--verbose', action='store_true', help="Tampilkan setiap pesan yang masuk")
+    parser.add_argument('--model', default=None,
+                        help="Klasifikasi & publish prediksi langsung di gateway (.pkl atau .npz)")
+    parser.add_argument('--retrain', action='store_true',
+                        help="Dengan --model: retraining otomatis saat drift + hot-swap model")
+    parser.add_argument('--threaded', action='store_true',
+                        help="Pakai mode lama loop_forever (tanpa pipeline asyncio)")
+    parser.add_argument('--metrics-port', type=int, default=None, help="Buka endpoint Prometheus di port ini")
+    parser.add_argument('--metrics-file', default=None, help="Tulis metrik ke file ini secara berkala")
+    args = parser.parse_args()
+
+    if args.metrics_port:
+        metrics.start_metrics_server(args.metrics_port)
+        print(f"📈 Metrik tersedia di http://127.0.0.1:{args.metrics_port}/metrics")
+    if args.metrics_file:
+        metrics.start_metrics_file(args.metrics_file)
+
+    store = SensorStore(args.db)
+    registry = DeviceRegistry()
+
+    print(f"📡 Sedang mendengarkan data dari MQTT... (histori disimpan di '{args.db}')")
+    try:
+        if args.threaded:
+            run_threaded(args, store, registry)
+        else:
+            run_async(args, store, registry)
+    finally:
+        store.close()
 
-print("📡 Sedang mendengarkan data dari MQTT...")
-client.connect(BROKER, PORT, 60)
-client.loop_forever()
\ No newline at end of file
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,206 @@
+"""
+Decoder payload sensor ESP32 (format publishSensorDataJSON di esp32_code.ino).
+
+Satu kali jalan: bytes -> SensorRecord (__slots__), dengan validasi skema.
+Pesan yang rusak ditolak dengan PayloadError (dan dihitung di metrik), bukan diubah jadi 0.
+
+Format yang diterima (dideteksi dari byte pertama):
+- JSON   : {"temp": 27.5, "rh_air": 70.1, "rh_soil": 45.0, "lux": 12000,
+            "sensor_health": {"dht_ok": true, "photo_ok": true, "soil_ok": true}}
+           Nilai sensor boleh null (ArduinoJson menulis NaN sebagai null saat sensor gagal).
+- Packed : struct little-endian PACKED_FORMAT (22 byte), diawali PACKED_VERSION.
+- CBOR   : map dengan kunci yang sama seperti JSON (butuh paket opsional cbor2).
+"""
+import json
+import math
+import struct
+import time
+
+import metrics
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import cbor2
+except ImportError:
+    cbor2 = None
+
+SENSOR_FIELDS = ('temp', 'rh_air', 'rh_soil', 'lux')
+HEALTH_FIELDS = ('dht_ok', 'photo_ok', 'soil_ok')
+
+# versi(uint8), temp, rh_air, rh_soil, lux (float32), bit health (uint8), sent_ts (uint32, 0 = tidak ada)
+PACKED_VERSION = 1
+PACKED_FORMAT = struct.Struct('<BffffBI')
+
+class PayloadError(ValueError):
+    """Payload tidak sesuai skema."""
+
+# ==========================================
+# 1. RECORD
+# ==========================================
+class SensorRecord:
+    """
+    Satu reading sensor. Bisa dipakai seperti dict datar hasil flatten_reading
+    (record['temp'], record.get('dht_ok'), dict(record)), jadi storage, registry dan
+    inference worker tidak perlu tahu bedanya.
+    """
+
+    __slots__ = ('device_id', 'ts', 'temp', 'rh_air', 'rh_soil', 'lux',
+                 'dht_ok', 'photo_ok', 'soil_ok', 'timestamp', 'sent_ts', 'faults')
+
+    def __init__(self, device_id, ts, temp, rh_air, rh_soil, lux,
+                 dht_ok=None, photo_ok=None, soil_ok=None, timestamp=None, sent_ts=None, faults=None):
+        self.device_id = device_id
+        self.ts = ts
+        self.temp = temp
+        self.rh_air = rh_air
+        self.rh_soil = rh_soil
+        self.lux = lux
+        self.dht_ok = dht_ok
+        self.photo_ok = photo_ok
+        self.soil_ok = soil_ok
+        self.timestamp = timestamp
+        self.sent_ts = sent_ts
+        # {sensor: jenis_fault} dari anomaly_detector, None jika semua wajar
+        self.faults = faults
+
+    @classmethod
+    def from_reading(cls, reading):
+        """Dari dict datar (mis. tabel latest di SQLite) atau SensorRecord lain."""
+        if isinstance(reading, cls):
+            return reading
+        return cls(**{f: reading.get(f) for f in cls.__slots__})
+
+    # --- akses gaya dict ---
+    def __getitem__(self, key):
+        if key not in _FIELD_SET:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def get(self, key, default=None):
+        if key not in _FIELD_SET:
+            return default
+        return getattr(self, key)
+
+    def keys(self):
+        return self.__slots__
+
+    def to_dict(self):
+        return {f: getattr(self, f) for f in self.__slots__}
+
+    def missing(self):
+        """Nama nilai sensor yang kosong (sensor gagal membaca)."""
+        return [f for f in SENSOR_FIELDS if getattr(self, f) is None]
+
+    def __repr__(self):
+        return f"SensorRecord({self.to_dict()})"
+
+_FIELD_SET = frozenset(SensorRecord.__slots__)
+
+# ==========================================
+# 2. DECODE
+# ==========================================
+_NUMBER_TYPES = (int, float)
+
+def _check_number(key, value):
+    # bool adalah subclass int, tapi bukan nilai sensor yang valid
+    if type(value) not in _NUMBER_TYPES or not math.isfinite(value):
+        raise PayloadError(f"field '{key}' bukan angka: {value!r}")
+    return float(value)
+
+def _health(data):
+    health = data.get('sensor_health')
+    if health is None:
+        return None, None, None
+    if type(health) is not dict:
+        raise PayloadError("sensor_health bukan objek")
+    flags = (health.get('dht_ok'), health.get('photo_ok'), health.get('soil_ok'))
+    for key, value in zip(HEALTH_FIELDS, flags):
+        if value is not None and type(value) is not bool:
+            raise PayloadError(f"sensor_health.{key} bukan boolean: {value!r}")
+    return flags
+
+def record_from_mapping(data, device_id, ts=None, timestamp=None):
+    """Validasi dict hasil parse JSON/CBOR lalu buat SensorRecord."""
+    if type(data) is not dict:
+        raise PayloadError("payload bukan objek")
+    try:
+        values = [data['temp'], data['rh_air'], data['rh_soil'], data['lux']]
+    except KeyError as e:
+        raise PayloadError(f"field {e} tidak ada") from None
+    for i, value in enumerate(values):
+        if value is not None:
+            values[i] = _check_number(SENSOR_FIELDS[i], value)
+    sent_ts = data.get('sent_ts')
+    if sent_ts is not None:
+        sent_ts = _check_number('sent_ts', sent_ts)
+    return SensorRecord(device_id, time.time() if ts is None else ts, *values,
+                        *_health(data), timestamp, sent_ts)
+
+def _decode_packed(payload, device_id, ts, timestamp):
+    if len(payload) != PACKED_FORMAT.size:
+        raise PayloadError(f"payload packed harus {PACKED_FORMAT.size} byte, bukan {len(payload)}")
+    _, temp, rh_air, rh_soil, lux, health, sent_ts = PACKED_FORMAT.unpack(payload)
+    # float32 NaN = sensor gagal membaca (sama dengan null di JSON);
+    # dibulatkan agar 70.1 tidak menjadi 70.09999847 karena presisi float32
+    values = [None if math.isnan(v) else round(v, 2) for v in (temp, rh_air, rh_soil, lux)]
+    if any(v is not None and math.isinf(v) for v in values):
+        raise PayloadError("nilai sensor tak hingga")
+    return SensorRecord(device_id, time.time() if ts is None else ts, *values,
+                        bool(health & 1), bool(health & 2), bool(health & 4),
+                        timestamp, float(sent_ts) if sent_ts else None)
+
+def decode_payload(payload, device_id, ts=None, timestamp=None):
+    """
+    bytes/str payload MQTT -> SensorRecord. ts = waktu terima (epoch), timestamp = label
+    waktu untuk tampilan. Gagal -> PayloadError (dan metrik chilihub_payload_rejected_total).
+    """
+    start = time.perf_counter()
+    try:
+        if isinstance(payload, str):
+            payload = payload.encode()
+        if not payload:
+            raise PayloadError("payload kosong")
+        first = payload[0]
+        if first == PACKED_VERSION:
+            record = _decode_packed(payload, device_id, ts, timestamp)
+        else:
+            if 0xa0 <= first <= 0xbf:
+                if cbor2 is None:
+                    raise PayloadError("payload CBOR butuh paket cbor2 (pip install cbor2)")
+                data = cbor2.loads(payload)
+            else:
+                data = orjson.loads(payload) if orjson is not None else json.loads(payload)
+            record = record_from_mapping(data, device_id, ts, timestamp)
+    except PayloadError:
+        metrics.PAYLOAD_REJECTED.inc()
+        raise
+    except Exception as e:
+        # JSON/CBOR rusak, bukan UTF-8, dll.
+        metrics.PAYLOAD_REJECTED.inc()
+        raise PayloadError(f"payload tidak bisa di-decode: {e}") from e
+    metrics.PARSE_SECONDS.observe(time.perf_counter() - start)
+    return record
+
+# ==========================================
+# 3. ENCODE (simulator, tes & referensi firmware)
+# ==========================================
+def encode_json(reading):
+    data = {
+        'temp': reading.get('temp'),
+        'rh_air': reading.get('rh_air'),
+        'rh_soil': reading.get('rh_soil'),
+        'lux': reading.get('lux'),
+        'sensor_health': {key: bool(reading.get(key)) for key in HEALTH_FIELDS}
+    }
+    if reading.get('sent_ts') is not None:
+        data['sent_ts'] = reading.get('sent_ts')
+    return json.dumps(data).encode()
+
+def encode_packed(reading):
+    values = [math.nan if reading.get(f) is None else reading.get(f) for f in SENSOR_FIELDS]
+    health = sum(1 << i for i, key in enumerate(HEALTH_FIELDS) if reading.get(key))
+    return PACKED_FORMAT.pack(PACKED_VERSION, *values, health, int(reading.get('sent_ts') or 0))
@@ -0,0 +1,122 @@
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+import metrics
+
+# Sensor ESP32 melapor dengan presisi 0.1 -> kunci cache dibulatkan ke 1 desimal
+CACHE_DECIMALS = 1
+CACHE_SIZE = 4096
+
+# ==========================================
+# CACHE LRU HASIL PREDIKSI
+# ==========================================
+class PredictionCache:
+    """
+    Bungkus model: predict(rows) -> (codes, confidences) dari predict_proba.
+
+    Hasil disimpan di LRU terbatas dengan kunci vektor fitur yang dibulatkan ke
+    CACHE_DECIMALS. Model juga menerima nilai yang sudah dibulatkan, jadi hasil dari
+    cache selalu sama dengan hasil hitung ulang. Baris yang belum ada di cache
+    diprediksi sekaligus dalam satu panggilan predict_proba.
+
+    swap_model() mengganti model (dan versinya) tanpa menghentikan prediksi: batch yang
+    sedang berjalan selesai dengan model lama, batch berikutnya memakai model baru.
+    """
+
+    def __init__(self, model, feature_names, maxsize=CACHE_SIZE, decimals=CACHE_DECIMALS, version=None):
+        self.model = model
+        self.version = version
+        # Naik setiap swap_model: hasil hitungan model lama tidak boleh masuk cache baru
+        self._generation = 0
+        self.feature_names = list(feature_names)
+        self.maxsize = maxsize
+        self.decimals = decimals
+        self.hits = 0
+        self.misses = 0
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._cache)
+
+    @property
+    def hit_rate(self):
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def _lookup(self, keys, generation):
+        found = {}
+        with self._lock:
+            if generation != self._generation:
+                return found
+            for key in keys:
+                if key not in found and key in self._cache:
+                    self._cache.move_to_end(key)
+                    found[key] = self._cache[key]
+        return found
+
+    def _store(self, results, generation):
+        with self._lock:
+            if generation != self._generation:
+                return
+            for key, value in results.items():
+                self._cache[key] = value
+                self._cache.move_to_end(key)
+            while len(self._cache) > self.maxsize:
+                self._cache.popitem(last=False)
+
+    def swap_model(self, model, version=None):
+        """Ganti model secara atomik; isi cache dari model lama dibuang."""
+        with self._lock:
+            self.model = model
+            self.version = version
+            self._generation += 1
+            self._cache.clear()
+
+    def predict(self, rows):
+        """rows: list/array nilai fitur (urutan feature_names). Mengembalikan (codes, confidences)."""
+        codes, confidences, _ = self.predict_versioned(rows)
+        return codes, confidences
+
+    def predict_versioned(self, rows):
+        """Seperti predict, ditambah versi model yang menghasilkan prediksi batch ini."""
+        X = np.round(np.asarray(rows, dtype=np.float64).reshape(-1, len(self.feature_names)), self.decimals)
+        keys = [tuple(row) for row in X.tolist()]
+        with self._lock:
+            model, version, generation = self.model, self.version, self._generation
+        found = self._lookup(keys, generation)
+
+        # Baris unik yang belum ada di cache -> satu panggilan model
+        pending = list(dict.fromkeys(key for key in keys if key not in found))
+        if pending:
+            with metrics.INFERENCE_SECONDS.time():
+                proba = model.predict_proba(pd.DataFrame(pending, columns=self.feature_names))
+            best = proba.argmax(axis=1)
+            codes = model.classes_[best]
+            confidences = proba[np.arange(len(best)), best]
+            computed = {key: (int(code), float(conf)) for key, code, conf in zip(pending, codes, confidences)}
+            self._store(computed, generation)
+            found.update(computed)
+
+        n_hits = len(keys) - len(pending)
+        self.hits += n_hits
+        self.misses += len(pending)
+        metrics.PREDICTION_CACHE_HITS.inc(n_hits)
+        metrics.PREDICTION_CACHE_MISSES.inc(len(pending))
+        metrics.PREDICTION_CACHE_HIT_RATIO.set(self.hit_rate)
+        metrics.PREDICTIONS.inc(len(keys))
+
+        results = [found[key] for key in keys]
+        return (np.array([code for code, _ in results], dtype=np.int64),
+                np.array([conf for _, conf in results], dtype=np.float64), version)
+
+    def predict_one(self, values):
+        codes, confidences = self.predict([values])
+        return int(codes[0]), float(confidences[0])
+
+    def clear(self):
+        with self._lock:
+            self._cache.clear()
@@ -0,0 +1,149 @@
+import threading
+import time
+from collections import OrderedDict
+
+import paho.mqtt.client as mqtt
+
+import metrics
+
+# ==========================================
+# PUBLISHER PREDIKSI (antrean terbatas + coalescing)
+# ==========================================
+RECONNECT_MIN_DELAY = 1
+RECONNECT_MAX_DELAY = 60
+
+def connect_with_backoff(client, broker, port, keepalive=60):
+    """
+    Koneksi non-blocking: paho mencoba (ulang) di thread loop-nya sendiri dengan jeda
+    yang berlipat dua dari RECONNECT_MIN_DELAY sampai RECONNECT_MAX_DELAY detik,
+    termasuk jika koneksi pertama gagal.
+    """
+    client.reconnect_delay_set(min_delay=RECONNECT_MIN_DELAY, max_delay=RECONNECT_MAX_DELAY)
+    client.connect_async(broker, port, keepalive)
+    client.loop_start()
+
+class PredictionPublisher:
+    """
+    Lapisan publish di antara dashboard/worker dan paho.
+
+    submit() tidak pernah blok. Setiap topic (= satu device) paling banyak punya satu
+    payload tertunda: jika yang lama belum terkirim, diganti dengan yang terbaru
+    (coalesced). Antrean dibatasi max_pending topic; jika penuh, yang paling lama dibuang.
+    Thread pengirim hanya publish selama terhubung dan pesan in-flight (QoS 1 belum
+    di-ack broker) kurang dari max_inflight, jadi memori tetap terbatas saat broker lambat.
+    """
+
+    def __init__(self, client, qos=1, max_pending=1000, max_inflight=20):
+        self.client = client
+        self.qos = qos
+        self.max_pending = max_pending
+        self.max_inflight = max_inflight
+        self.sent_count = 0
+        self.dropped_count = 0
+        self.coalesced_count = 0
+        self.failed_count = 0
+
+        self._pending = OrderedDict()   # topic -> (payload, origin_ts)
+        self._inflight = []             # MQTTMessageInfo yang belum selesai
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._loop, name="prediction-publisher", daemon=True)
+        self._thread.start()
+
+    # --- API ---
+    def submit(self, topic, payload, origin_ts=None):
+        """
+        Masukkan payload ke antrean. origin_ts (epoch) = waktu asal reading untuk metrik
+        latensi end-to-end. False jika ada payload lain yang harus dibuang.
+        """
+        accepted = True
+        with self._lock:
+            if topic in self._pending:
+                self.coalesced_count += 1
+                metrics.PUBLISH_COALESCED.inc()
+                del self._pending[topic]
+            elif len(self._pending) >= self.max_pending:
+                self._pending.popitem(last=False)
+                self.dropped_count += 1
+                metrics.PUBLISH_DROPPED.inc()
+                accepted = False
+            self._pending[topic] = (payload, origin_ts)
+            metrics.PUBLISH_PENDING.set(len(self._pending))
+        self._wakeup.set()
+        return accepted
+
+    @property
+    def pending_count(self):
+        return len(self._pending)
+
+    @property
+    def inflight_count(self):
+        return len(self._inflight)
+
+    @property
+    def connected(self):
+        return self.client.is_connected()
+
+    def flush(self, timeout=5.0):
+        """Tunggu sampai antrean & in-flight kosong. False jika timeout (mis. broker down)."""
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            with self._lock:
+                self._prune_inflight()
+                if not self._pending and not self._inflight:
+                    return True
+            self._wakeup.set()
+            time.sleep(0.01)
+        return False
+
+    def close(self, timeout=2.0):
+        self.flush(timeout)
+        self._stop.set()
+        self._wakeup.set()
+        self._thread.join()
+
+    # --- THREAD PENGIRIM ---
+    def _prune_inflight(self):
+        self._inflight = [info for info in self._inflight if not info.is_published()]
+        metrics.PUBLISH_INFLIGHT.set(len(self._inflight))
+
+    def _loop(self):
+        while not self._stop.is_set():
+            # Bangun jika ada submit baru, atau berkala untuk cek ack/koneksi
+            self._wakeup.wait(timeout=0.1)
+            self._wakeup.clear()
+            with self._lock:
+                self._prune_inflight()
+                if not self.client.is_connected():
+                    continue
+                while self._pending and len(self._inflight) < self.max_inflight:
+                    if not self._publish_next():
+                        break
+                metrics.PUBLISH_PENDING.set(len(self._pending))
+
+    def _publish_next(self):
+        topic, (payload, origin_ts) = self._pending.popitem(last=False)
+        try:
+            info = self.client.publish(topic, payload, qos=self.qos)
+        except Exception as e:
+            info = None
+            print(f"❌ Gagal publish ke {topic}: {e}")
+
+        if info is not None and info.rc == mqtt.MQTT_ERR_SUCCESS:
+            self._inflight.append(info)
+            self.sent_count += 1
+            if origin_ts is not None:
+                metrics.END_TO_END_SECONDS.observe(time.time() - origin_ts)
+            return True
+
+        if info is not None and info.rc == mqtt.MQTT_ERR_NO_CONN:
+            # Terputus: kembalikan ke depan antrean (kecuali sudah ada yang lebih baru)
+            if topic not in self._pending:
+                self._pending[topic] = (payload, origin_ts)
+                self._pending.move_to_end(topic, last=False)
+            return False
+
+        self.failed_count += 1
+        metrics.PUBLISH_FAILURES.inc()
+        return True
@@ -0,0 +1,298 @@
+"""
+Replay histori sensor: klasifikasi ulang (backfill) atau kirim ulang ke MQTT.
+
+score : baca histori (database .db, CSV, atau dataset .parquet / .arrow) per chunk besar,
+        labeli dengan aturan labeling.py dan prediksi dengan model aktif secara vektorisasi
+        di process pool, lalu tulis hasilnya sekaligus per chunk:
+        - output .db  -> tabel predictions (default: database input itu sendiri)
+        - output lain -> CSV / dataset (fitur + label + prediksi), lewat sensor_dataset.py
+        Dipakai setelah threshold profil diubah atau model baru dirilis.
+mqtt  : publish ulang histori ke topic per device dengan kecepatan N x waktu asli
+        (--speed 0 = secepat mungkin), untuk uji beban listener / worker / dashboard.
+
+Contoh:
+    python replay.py score --input sensor_history.db --jobs 8
+    python replay.py score --input data_sensor.parquet --output predictions.parquet --start 2026-01-01
+    python replay.py mqtt --input sensor_history.db --speed 60 --broker localhost
+"""
+import argparse
+import math
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from fast_forest import FAST_MODEL_PATH, load_model
+import rule_engine
+from labeling import label_dataframe, rule_model
+from model_manager import MODEL_PATH, RULE_MODEL_VERSION, active_version
+from sensor_dataset import columns_of, iter_frames, write_frame
+from sensor_store import DEFAULT_DEVICE_ID, FEATURE_COLUMNS, SensorStore
+
+FEATURES = ['earth_humidity', 'air_temperature', 'air_humidity', 'luminance']
+HEALTH_COLUMNS = ['dht_ok', 'photo_ok', 'soil_ok']
+CHUNKSIZE = 200_000
+# Baris per panggilan predict_proba: traversal FastForest memakai array (baris x pohon),
+# jadi batch dibatasi agar memori per proses tetap kecil
+PREDICT_BATCH = 20_000
+
+# ==========================================
+# 1. BACA HISTORI
+# ==========================================
+def _epoch(timestamps):
+    """Timestamp lokal (naif, seperti sensor_store) -> epoch detik."""
+    local_tz = datetime.now().astimezone().tzinfo
+    ts = pd.to_datetime(timestamps).dt.tz_localize(local_tz)
+    return (ts - pd.Timestamp(0, tz='UTC')).dt.total_seconds().to_numpy()
+
+def iter_history(source, start=None, end=None, device_id=None, chunksize=CHUNKSIZE):
+    """
+    Histori per chunk dengan kolom ts (epoch), timestamp, device_id dan FEATURES,
+    ditambah flag health jika sumbernya database.
+    """
+    if source.endswith('.db'):
+        store = SensorStore(source, readonly=True)
+        for chunk in store.query(start=start, end=end, device_id=device_id, chunksize=chunksize):
+            yield chunk.rename(columns=FEATURE_COLUMNS)
+        return
+
+    available = columns_of(source)
+    columns = ['timestamp', *FEATURES] + (['device_id'] if 'device_id' in available else [])
+    for chunk in iter_frames(source, columns=columns, start=start, end=end, device_id=device_id,
+                             chunksize=chunksize):
+        if 'device_id' not in chunk:
+            chunk['device_id'] = DEFAULT_DEVICE_ID
+        chunk['ts'] = _epoch(chunk['timestamp'])
+        yield chunk
+
+# ==========================================
+# 2. SCORING (DI PROSES WORKER)
+# ==========================================
+# Model dimuat sekali per proses worker (lewat initializer), bukan dikirim per chunk
+_WORKER = {}
+
+def resolve_model(path):
+    """(path model atau None untuk model aturan, versi untuk kolom model_version)."""
+    if path is None:
+        # Chunk replay jauh di atas SKLEARN_MIN_ROWS (fast_forest.py): sklearn lebih cepat di sini,
+        # jadi langsung .pkl tanpa memuat .npz
+        path = next((p for p in (MODEL_PATH, FAST_MODEL_PATH) if os.path.exists(p)), None)
+        if path is None:
+            return None, RULE_MODEL_VERSION
+    if not os.path.exists(path):
+        raise FileNotFoundError(path)
+    # Model default = versi aktif di manifest; file lain dicatat dengan nama filenya
+    is_default = os.path.abspath(path) in (os.path.abspath(FAST_MODEL_PATH), os.path.abspath(MODEL_PATH))
+    version = active_version() if is_default else None
+    return path, version or os.path.basename(path)
+
+def _init_worker(model_path, profile=None):
+    # Nama profil dikirim eksplisit: proses spawn tidak mewarisi profil aktif proses utama
+    _WORKER['profile'] = profile
+    _WORKER['model'] = rule_model(profile=profile) if model_path is None else load_model(model_path)
+
+def score_chunk(df, model=None):
+    """
+    Label aturan + prediksi model untuk satu chunk. Baris dengan nilai sensor kosong
+    tidak diprediksi (code -1), sama seperti dashboard & inference worker.
+    """
+    model = model or _WORKER['model']
+    X = df[FEATURES].to_numpy(dtype=np.float64)
+    valid = ~np.isnan(X).any(axis=1)
+    codes = np.full(len(df), -1, dtype=np.int8)
+    confidences = np.full(len(df), np.nan)
+
+    rows = np.flatnonzero(valid)
+    for i in range(0, len(rows), PREDICT_BATCH):
+        batch = rows[i:i + PREDICT_BATCH]
+        proba = model.predict_proba(pd.DataFrame(X[batch], columns=FEATURES))
+        best = proba.argmax(axis=1)
+        codes[batch] = np.asarray(model.classes_)[best]
+        confidences[batch] = proba[np.arange(len(best)), best]
+
+    out = df[['ts', 'timestamp', 'device_id', *FEATURES]].copy()
+    out['label'] = label_dataframe(df, profile=_WORKER.get('profile'))
+    out['code'] = codes
+    out['confidence'] = confidences
+    return out
+
+def _bounded_map(pool, fn, items, max_pending):
+    """Seperti pool.map, tetapi paling banyak max_pending chunk di memori sekaligus (urutan tetap)."""
+    pending = deque()
+    for item in items:
+        pending.append(pool.submit(fn, item))
+        if len(pending) >= max_pending:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+def backfill(source, output, model_path=None, start=None, end=None, device_id=None,
+             jobs=None, chunksize=CHUNKSIZE, profile=None):
+    """Klasifikasi ulang seluruh histori. Mengembalikan ringkasan hasil."""
+    profile = rule_engine.resolve(profile).name
+    model_path, version = resolve_model(model_path)
+    jobs = jobs or os.cpu_count()
+    chunks = iter_history(source, start, end, device_id, chunksize)
+    # Bukan read-only: write_predictions() butuh tabel predictions
+    store = SensorStore(output) if output.endswith('.db') else None
+
+    summary = {'rows': 0, 'predicted': 0, 'agree': 0, 'codes': np.zeros(3, dtype=np.int64),
+               'model_version': version, 'profile': profile}
+    started = time.perf_counter()
+    if jobs > 1:
+        pool = ProcessPoolExecutor(max_workers=jobs, initializer=_init_worker, initargs=(model_path, profile))
+        results = _bounded_map(pool, score_chunk, chunks, max_pending=jobs * 2)
+    else:
+        pool = None
+        _init_worker(model_path, profile)
+        results = map(score_chunk, chunks)
+
+    try:
+        for scored in results:
+            # Tulis sekaligus per chunk: satu transaksi SQLite / satu file dataset
+            if store is not None:
+                store.write_predictions(scored, version)
+            else:
+                write_frame(scored.drop(columns=['ts']).assign(model_version=version), output,
+                            append=summary['rows'] > 0)
+
+            predicted = scored['code'].to_numpy() >= 0
+            summary['rows'] += len(scored)
+            summary['predicted'] += int(predicted.sum())
+            summary['agree'] += int((scored['code'].to_numpy() == scored['label'].to_numpy())[predicted].sum())
+            summary['codes'] += np.bincount(scored['code'].to_numpy()[predicted], minlength=3)[:3]
+            elapsed = time.perf_counter() - started
+            print(f"\r⚙️ {summary['rows']:,} baris ({summary['rows'] / max(elapsed, 1e-9):,.0f} baris/detik)", end="")
+    finally:
+        if pool is not None:
+            pool.shutdown()
+        if store is not None:
+            store.close()
+    print()
+    summary['seconds'] = time.perf_counter() - started
+    return summary
+
+# ==========================================
+# 3. REPLAY KE MQTT
+# ==========================================
+_PAYLOAD_COLUMNS = {feature: key for key, feature in FEATURE_COLUMNS.items()}
+
+def _none_if_nan(value):
+    return None if value is None or (isinstance(value, float) and math.isnan(value)) else value
+
+def replay_mqtt(source, broker, port, speed=1.0, start=None, end=None, device_id=None,
+                packed=False, chunksize=CHUNKSIZE):
+    """
+    Publish histori ke chilihub/<device_id>/data/sensors. Jarak antar pesan = selisih ts
+    asli / speed (speed 0 = tanpa jeda). sent_ts diisi waktu kirim, jadi latensi end-to-end
+    di listener/worker tetap terukur.
+    """
+    import paho.mqtt.client as mqtt
+    from device_registry import device_topic
+    from payload_codec import encode_json, encode_packed
+
+    encode = encode_packed if packed else encode_json
+    client = mqtt.Client()
+    client.connect(broker, port, 60)
+    client.loop_start()
+
+    sent = 0
+    max_lag = 0.0
+    first_ts = wall_start = None
+    info = None
+    started = time.perf_counter()
+    try:
+        for chunk in iter_history(source, start, end, device_id, chunksize):
+            has_health = all(c in chunk for c in HEALTH_COLUMNS)
+            columns = [chunk['ts'].tolist(), chunk['device_id'].tolist()]
+            columns += [chunk[f].tolist() for f in FEATURES]
+            columns += [chunk[c].tolist() for c in HEALTH_COLUMNS] if has_health else []
+            for ts, device, *values in zip(*columns):
+                if first_ts is None:
+                    first_ts, wall_start = ts, time.monotonic()
+                if speed > 0:
+                    delay = wall_start + (ts - first_ts) / speed - time.monotonic()
+                    if delay > 0.001:
+                        time.sleep(delay)
+                    else:
+                        max_lag = max(max_lag, -delay)
+                reading = {_PAYLOAD_COLUMNS[f]: _none_if_nan(v) for f, v in zip(FEATURES, values)}
+                if has_health:
+                    reading.update(zip(HEALTH_COLUMNS, (v == 1 for v in values[len(FEATURES):])))
+                else:
+                    # File tanpa flag health: sensor dianggap sehat jika nilainya ada
+                    reading.update(dht_ok=reading['temp'] is not None and reading['rh_air'] is not None,
+                                   photo_ok=reading['lux'] is not None, soil_ok=reading['rh_soil'] is not None)
+                reading['sent_ts'] = time.time()
+                info = client.publish(device_topic(device), encode(reading))
+                sent += 1
+            elapsed = time.perf_counter() - started
+            print(f"\r📤 {sent:,} pesan ({sent / max(elapsed, 1e-9):,.0f} pesan/detik, "
+                  f"tertinggal maks {max_lag:.2f} s)", end="")
+        if info is not None:
+            info.wait_for_publish(timeout=30)
+    finally:
+        client.loop_stop()
+        client.disconnect()
+    print()
+    return {'sent': sent, 'seconds': time.perf_counter() - started, 'max_lag': max_lag}
+
+# ==========================================
+# 4. CLI
+# ==========================================
+def main():
+    parser = argparse.ArgumentParser(description="Replay histori sensor Chili-Hub (backfill prediksi / MQTT)")
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    p_score = sub.add_parser('score', help="Klasifikasi ulang histori dengan labeling + model aktif")
+    p_score.add_argument('--output', default=None,
+                         help=".db -> tabel predictions (default: database input), .csv/.parquet/.arrow -> file")
+    p_score.add_argument('--model', default=None, help="Default: model_final.pkl / .npz, atau model aturan")
+    p_score.add_argument('--jobs', type=int, default=None, help="Jumlah proses (default: semua core)")
+    p_score.add_argument('--profile', default=None, choices=rule_engine.profile_names(),
+                         help="Profil aturan tanaman/fase untuk kolom label (default: profil aktif)")
+
+    p_mqtt = sub.add_parser('mqtt', help="Publish ulang histori ke MQTT (uji beban)")
+    p_mqtt.add_argument('--broker', default='localhost')
+    p_mqtt.add_argument('--port', type=int, default=1883)
+    p_mqtt.add_argument('--speed', type=float, default=1.0, help="Kelipatan waktu asli (0 = secepat mungkin)")
+    p_mqtt.add_argument('--packed', action='store_true', help="Payload biner 22 byte, bukan JSON")
+
+    for p in (p_score, p_mqtt):
+        p.add_argument('--input', default='sensor_history.db', help="Database .db, CSV, atau dataset .parquet / .arrow")
+        p.add_argument('--start', default=None, help="Awal rentang waktu, contoh '2026-01-01'")
+        p.add_argument('--end', default=None, help="Akhir rentang waktu (eksklusif)")
+        p.add_argument('--device', default=None)
+        p.add_argument('--chunksize', type=int, default=CHUNKSIZE)
+    args = parser.parse_args()
+
+    if not os.path.exists(args.input):
+        print(f"❌ Error: '{args.input}' tidak ditemukan.")
+        return
+
+    if args.command == 'mqtt':
+        result = replay_mqtt(args.input, args.broker, args.port, args.speed, args.start, args.end,
+                             args.device, args.packed, args.chunksize)
+        print(f"✅ {result['sent']:,} pesan dikirim dalam {result['seconds']:.1f} detik")
+        return
+
+    output = args.output or args.input
+    if not output.endswith('.db') and output == args.input:
+        print("❌ Error: input berupa file, isi --output (.db, .csv, .parquet atau .arrow)")
+        return
+    summary = backfill(args.input, output, args.model, args.start, args.end, args.device,
+                       args.jobs, args.chunksize, args.profile)
+    rows, predicted = summary['rows'], max(summary['predicted'], 1)
+    print(f"✅ {rows:,} baris diklasifikasi ulang dalam {summary['seconds']:.1f} detik "
+          f"({rows / max(summary['seconds'], 1e-9):,.0f} baris/detik), model {summary['model_version']}")
+    print(f"📊 Normal {summary['codes'][0]:,} | Warning {summary['codes'][1]:,} | Critical {summary['codes'][2]:,} | "
+          f"tanpa prediksi {rows - summary['predicted']:,}")
+    print(f"🎯 Kesesuaian model vs aturan labeling (profil {summary['profile']}): {summary['agree'] / predicted:.2%}")
+    print(f"💾 Hasil ditulis ke '{output}'")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+from collections import deque
+
+import numpy as np
+import pandas as pd
+
+# ==========================================
+# RING BUFFER HISTORI SENSOR
+# ==========================================
+class _WindowExtreme:
+    """Min/max jendela geser dengan deque monoton (amortized O(1) per append)."""
+
+    __slots__ = ('_items', '_better')
+
+    def __init__(self, is_max):
+        self._items = deque()  # (seq, value)
+        self._better = (lambda a, b: a >= b) if is_max else (lambda a, b: a <= b)
+
+    def push(self, seq, value):
+        items = self._items
+        while items and self._better(value, items[-1][1]):
+            items.pop()
+        items.append((seq, value))
+
+    def evict_before(self, seq):
+        items = self._items
+        while items and items[0][0] < seq:
+            items.popleft()
+
+    def value(self):
+        return self._items[0][1] if self._items else None
+
+    def clear(self):
+        self._items.clear()
+
+class SensorRingBuffer:
+    """
+    Histori sensor berkapasitas tetap berbasis array NumPy.
+
+    - append() O(1): tidak ada copy seluruh histori seperti pd.concat.
+    - mean/min/max per kolom dan jumlah per kelas dihitung incremental, O(1).
+    - Setiap nilai ditulis dua kali (posisi i dan i + capacity), sehingga isi buffer
+      selalu berupa potongan array yang bersambung -> view() tanpa copy.
+    """
+
+    def __init__(self, capacity, columns, classes):
+        self.columns = list(columns)
+        self.classes = list(classes)
+        self._col_index = {c: i for i, c in enumerate(self.columns)}
+        self._class_index = {c: i for i, c in enumerate(self.classes)}
+        self._allocate(capacity)
+
+    def _allocate(self, capacity):
+        self.capacity = capacity
+        self._values = np.zeros((2 * capacity, len(self.columns)), dtype=np.float64)
+        self._times = np.empty(2 * capacity, dtype=object)
+        self._labels = np.full(2 * capacity, -1, dtype=np.int8)
+        self._seq = 0          # jumlah total append sejak awal/clear
+        self._size = 0
+        self._sums = np.zeros(len(self.columns), dtype=np.float64)
+        self._class_counts = np.zeros(len(self.classes), dtype=np.int64)
+        self._max = [_WindowExtreme(True) for _ in self.columns]
+        self._min = [_WindowExtreme(False) for _ in self.columns]
+
+    def __len__(self):
+        return self._size
+
+    def append(self, timestamp, values, label):
+        """values: urutan sesuai columns; label: salah satu classes (atau lainnya = tidak dihitung)."""
+        values = np.asarray(values, dtype=np.float64)
+        label_code = self._class_index.get(label, -1)
+        pos = self._seq % self.capacity
+
+        # Keluarkan data paling lama dari statistik jika buffer sudah penuh
+        if self._size == self.capacity:
+            self._sums -= self._values[pos]
+            old_label = self._labels[pos]
+            if old_label >= 0:
+                self._class_counts[old_label] -= 1
+        else:
+            self._size += 1
+
+        for p in (pos, pos + self.capacity):
+            self._values[p] = values
+            self._times[p] = timestamp
+            self._labels[p] = label_code
+
+        self._sums += values
+        if label_code >= 0:
+            self._class_counts[label_code] += 1
+
+        window_start = self._seq + 1 - self._size
+        for i, v in enumerate(values):
+            self._max[i].push(self._seq, v)
+            self._min[i].push(self._seq, v)
+            self._max[i].evict_before(window_start)
+            self._min[i].evict_before(window_start)
+
+        self._seq += 1
+        # Hitung ulang jumlah sesekali agar error pembulatan float tidak menumpuk
+        if self._seq % self.capacity == 0:
+            self._sums = self.view().sum(axis=0)
+
+    # --- VIEW TANPA COPY ---
+    def _window(self):
+        start = (self._seq - self._size) % self.capacity
+        return slice(start, start + self._size)
+
+    def view(self, column=None):
+        """Array (read-only) berisi histori dari yang paling lama, tanpa copy."""
+        w = self._window()
+        data = self._values[w] if column is None else self._values[w, self._col_index[column]]
+        data = data.view()
+        data.flags.writeable = False
+        return data
+
+    def times(self):
+        return self._times[self._window()]
+
+    def labels(self):
+        """Nama kelas per baris (None jika label bukan salah satu classes)."""
+        codes = self._labels[self._window()]
+        names = np.array(self.classes + [None], dtype=object)
+        return names[codes]
+
+    # --- STATISTIK O(1) ---
+    def mean(self, column):
+        if self._size == 0:
+            return None
+        return self._sums[self._col_index[column]] / self._size
+
+    def min(self, column):
+        return self._min[self._col_index[column]].value()
+
+    def max(self, column):
+        return self._max[self._col_index[column]].value()
+
+    def class_counts(self):
+        return dict(zip(self.classes, self._class_counts.tolist()))
+
+    # --- UTILITAS ---
+    def clear(self):
+        self._allocate(self.capacity)
+
+    def resize(self, capacity):
+        """Ubah kapasitas; data terbaru (maksimal capacity baris) tetap disimpan."""
+        if capacity == self.capacity:
+            return
+        times, values, labels = self.times(), self.view().copy(), self.labels()
+        self._allocate(capacity)
+        for t, v, l in list(zip(times, values, labels))[-capacity:]:
+            self.append(t, v, l)
+
+    def to_frame(self, time_column, label_column, last=None):
+        """DataFrame histori (untuk tabel/ekspor CSV). last=N -> hanya N baris terakhir."""
+        w = self._window()
+        if last is not None:
+            w = slice(max(w.start, w.stop - last), w.stop)
+        codes = self._labels[w]
+        names = np.array(self.classes + [None], dtype=object)
+        df = pd.DataFrame(self._values[w], columns=self.columns)
+        df.insert(0, time_column, self._times[w])
+        df[label_column] = names[codes]
+        return df
@@ -0,0 +1,140 @@
+import math
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+# ==========================================
+# ROLLUP MULTI-RESOLUSI (min / mean / max per bucket waktu)
+# ==========================================
+# (nama, detik per bucket, jumlah bucket disimpan): 1 hari, 30 hari, lalu 90 hari.
+# 2h / 6h agar rentang 30 hari (360 titik) sampai 90 hari (360 titik) tetap <= MAX_CHART_POINTS
+RESOLUTIONS = (('1m', 60, 1440), ('15m', 900, 2880), ('1h', 3600, 2160), ('2h', 7200, 1080),
+               ('6h', 21600, 360))
+# Titik maksimal yang dikirim ke satu grafik
+MAX_CHART_POINTS = 500
+
+def bucket_seconds_for(span_seconds, max_points=MAX_CHART_POINTS):
+    """Lebar bucket (detik, kelipatan 60) agar rentang span_seconds muat di max_points titik."""
+    return max(60, math.ceil(span_seconds / max_points / 60) * 60)
+
+class _Level:
+    """Satu resolusi: bucket yang sudah selesai di ring array + satu bucket yang masih terbuka."""
+
+    def __init__(self, name, seconds, capacity, n_columns):
+        self.name = name
+        self.seconds = seconds
+        self.capacity = capacity
+        self._start = np.zeros(capacity, dtype=np.float64)
+        self._count = np.zeros(capacity, dtype=np.int64)
+        self._sum = np.zeros((capacity, n_columns), dtype=np.float64)
+        self._min = np.zeros((capacity, n_columns), dtype=np.float64)
+        self._max = np.zeros((capacity, n_columns), dtype=np.float64)
+        self._seq = 0
+        self._size = 0
+        self._cur = None  # [start, count, sum, min, max]
+
+    def merge(self, start, count, sums, mins, maxs):
+        cur = self._cur
+        if cur is not None and start > cur[0]:
+            self._close()
+            cur = None
+        if cur is None:
+            self._cur = [start, count, np.array(sums, dtype=np.float64),
+                         np.array(mins, dtype=np.float64), np.array(maxs, dtype=np.float64)]
+            return
+        # Bucket yang sama (atau data telat): gabungkan ke bucket terbuka
+        cur[1] += count
+        cur[2] += sums
+        np.minimum(cur[3], mins, out=cur[3])
+        np.maximum(cur[4], maxs, out=cur[4])
+
+    def _close(self):
+        start, count, sums, mins, maxs = self._cur
+        pos = self._seq % self.capacity
+        self._start[pos] = start
+        self._count[pos] = count
+        self._sum[pos] = sums
+        self._min[pos] = mins
+        self._max[pos] = maxs
+        self._seq += 1
+        self._size = min(self._size + 1, self.capacity)
+        self._cur = None
+
+    def __len__(self):
+        return self._size + (self._cur is not None)
+
+    def arrays(self):
+        """(start, count, sum, min, max) urut dari bucket paling lama, termasuk bucket terbuka."""
+        order = np.arange(self._seq - self._size, self._seq) % self.capacity
+        parts = [self._start[order], self._count[order], self._sum[order], self._min[order], self._max[order]]
+        if self._cur is not None:
+            start, count, sums, mins, maxs = self._cur
+            parts = [np.append(parts[0], start), np.append(parts[1], count),
+                     np.vstack([parts[2], sums]), np.vstack([parts[3], mins]), np.vstack([parts[4], maxs])]
+        return parts
+
+class SensorRollups:
+    """
+    Agregasi min/mean/max per kolom di beberapa resolusi (1 menit, 15 menit, 1 jam, 2 jam, 6 jam),
+    diperbarui incremental setiap reading masuk: O(jumlah resolusi) per add().
+    Grafik cukup meminta resolusi yang sesuai rentang waktu (select()), sehingga jumlah
+    titik yang dikirim ke browser tetap <= MAX_CHART_POINTS berapa pun panjang histori.
+    """
+
+    def __init__(self, columns, resolutions=RESOLUTIONS):
+        self.columns = list(columns)
+        self.levels = {name: _Level(name, seconds, capacity, len(self.columns))
+                       for name, seconds, capacity in resolutions}
+        self.last_ts = None
+
+    def add(self, ts, values):
+        """Tambah satu reading. Reading yang tidak lebih baru dari last_ts diabaikan (sudah masuk)."""
+        if self.last_ts is not None and ts <= self.last_ts:
+            return
+        self.last_ts = ts
+        values = np.asarray(values, dtype=np.float64)
+        for level in self.levels.values():
+            level.merge(ts - ts % level.seconds, 1, values, values, values)
+
+    def extend(self, ts, values):
+        """Backfill banyak reading sekaligus (ts urut naik), mis. dari database."""
+        ts = np.asarray(ts, dtype=np.float64)
+        values = np.asarray(values, dtype=np.float64)
+        if self.last_ts is not None:
+            keep = ts > self.last_ts
+            ts, values = ts[keep], values[keep]
+        if len(ts) == 0:
+            return
+        self.last_ts = ts[-1]
+        for level in self.levels.values():
+            buckets = ts - ts % level.seconds
+            # Batas setiap bucket pada array yang sudah urut
+            edges = np.flatnonzero(np.r_[True, buckets[1:] != buckets[:-1]])
+            counts = np.diff(np.r_[edges, len(ts)])
+            sums = np.add.reduceat(values, edges, axis=0)
+            mins = np.minimum.reduceat(values, edges, axis=0)
+            maxs = np.maximum.reduceat(values, edges, axis=0)
+            for i, edge in enumerate(edges):
+                level.merge(buckets[edge], counts[i], sums[i], mins[i], maxs[i])
+
+    def select(self, span_seconds, max_points=MAX_CHART_POINTS):
+        """Resolusi paling halus yang menampilkan span_seconds dalam <= max_points titik."""
+        for name, level in self.levels.items():
+            if span_seconds / level.seconds <= max_points:
+                return name
+        return list(self.levels)[-1]
+
+    def frame(self, level, stat='mean', start=None):
+        """DataFrame (index = waktu lokal awal bucket) untuk stat 'mean', 'min' atau 'max'."""
+        starts, counts, sums, mins, maxs = self.levels[level].arrays()
+        if start is not None:
+            keep = starts >= start
+            starts, counts, sums, mins, maxs = starts[keep], counts[keep], sums[keep], mins[keep], maxs[keep]
+        if stat == 'mean':
+            data = sums / np.maximum(counts, 1)[:, np.newaxis]
+        else:
+            data = mins if stat == 'min' else maxs
+        local_tz = datetime.now().astimezone().tzinfo
+        index = pd.to_datetime(starts, unit='s', utc=True).tz_convert(local_tz).tz_localize(None)
+        return pd.DataFrame(data, columns=self.columns, index=index)
@@ -0,0 +1,305 @@
+"""
+Satu sumber aturan threshold Chili-Hub, dipakai generator, labeling, replay dan dashboard.
+
+Aturan: setiap sensor punya rentang [min, max] per profil tanaman & fase tumbuh
+('cabai/standar', 'cabai/vegetatif', ...). Jumlah sensor di luar rentang (0..4) dipetakan
+ke label: 0 = Normal, 1-2 = Warning, 3-4 = Critical. Nilai kosong (None/NaN) = pelanggaran.
+
+Profil dikompilasi sekali menjadi CompiledRules (array batas float64 + tuple untuk jalur
+skalar) dan di-cache. Dua mode evaluasi:
+- batch     : label(X, columns) / label_frame(df), vektorisasi NumPy (jutaan baris/detik)
+- streaming : label_reading(reading) untuk satu reading MQTT, tanpa NumPy/DataFrame
+
+Profil aktif bisa diganti saat runtime dengan set_profile(); pemakai yang perlu tahu
+(mis. model cadangan dashboard) mendaftar lewat subscribe(). Profil awal bisa diatur
+dengan environment CHILIHUB_RULE_PROFILE.
+
+Contoh:
+    python rule_engine.py list
+    python rule_engine.py bench --rows 5000000 --profile cabai/generatif
+"""
+import argparse
+import os
+import threading
+import time
+
+import numpy as np
+
+# ==========================================
+# 1. DEFINISI PROFIL
+# ==========================================
+# Urutan sensor tetap: dipakai untuk array batas hasil kompilasi
+SENSORS = ('temp', 'soil', 'lux', 'air')
+
+# Parameter -> kolom CSV/dataset dan -> field payload MQTT (publishSensorDataJSON)
+SENSOR_COLUMNS = {
+    'temp': 'air_temperature',
+    'soil': 'earth_humidity',
+    'lux':  'luminance',
+    'air':  'air_humidity'
+}
+PAYLOAD_FIELDS = {'temp': 'temp', 'soil': 'rh_soil', 'lux': 'lux', 'air': 'rh_air'}
+
+# Jumlah pelanggaran (0..4) -> label: 0 = Normal, 1-2 = Warning, 3-4 = Critical
+LABEL_BY_VIOLATIONS = np.array([0, 1, 1, 2, 2], dtype=np.uint8)
+_LABEL_TUPLE = tuple(int(label) for label in LABEL_BY_VIOLATIONS)
+
+# 'tanaman/fase' -> {param: {'min', 'max'}}
+PROFILES = {
+    # Acuan dataset & model_final (dulu disalin di dummy_data_maker.py dan labeling.py)
+    'cabai/standar': {
+        'temp': {'min': 18, 'max': 27},         # Suhu Udara (Celcius)
+        'soil': {'min': 60, 'max': 80},         # Kelembaban Tanah (%)
+        'lux':  {'min': 19000, 'max': 40000},   # Cahaya (Lux)
+        'air':  {'min': 70, 'max': 80}          # Kelembaban Udara (%)
+    },
+    # Persemaian: lebih hangat & lembap, cahaya tidak terlalu terik
+    'cabai/semai': {
+        'temp': {'min': 20, 'max': 30},
+        'soil': {'min': 70, 'max': 85},
+        'lux':  {'min': 10000, 'max': 30000},
+        'air':  {'min': 70, 'max': 85}
+    },
+    'cabai/vegetatif': {
+        'temp': {'min': 20, 'max': 28},
+        'soil': {'min': 60, 'max': 80},
+        'lux':  {'min': 20000, 'max': 45000},
+        'air':  {'min': 65, 'max': 80}
+    },
+    # Berbunga & berbuah: suhu malam/siang lebih rendah, RH tinggi memicu bunga rontok & jamur
+    'cabai/generatif': {
+        'temp': {'min': 18, 'max': 27},
+        'soil': {'min': 65, 'max': 80},
+        'lux':  {'min': 25000, 'max': 50000},
+        'air':  {'min': 60, 'max': 75}
+    }
+}
+STANDARD_PROFILE = 'cabai/standar'
+DEFAULT_PROFILE = os.environ.get('CHILIHUB_RULE_PROFILE', STANDARD_PROFILE)
+
+def _validate(name, thresholds):
+    if '/' not in name:
+        raise ValueError(f"nama profil harus 'tanaman/fase', bukan {name!r}")
+    missing = set(SENSORS) - set(thresholds)
+    if missing:
+        raise ValueError(f"profil {name}: sensor {', '.join(sorted(missing))} belum diatur")
+    for param in SENSORS:
+        if not thresholds[param]['min'] < thresholds[param]['max']:
+            raise ValueError(f"profil {name}: min {param} harus lebih kecil dari max")
+
+# ==========================================
+# 2. KOMPILASI
+# ==========================================
+class CompiledRules:
+    """Aturan satu profil dalam bentuk siap evaluasi (immutable, aman dipakai lintas thread)."""
+
+    __slots__ = ('name', 'thresholds', 'lower', 'upper', '_fields', '_bounds', '_models')
+
+    def __init__(self, name, thresholds):
+        _validate(name, thresholds)
+        self.name = name
+        self.thresholds = {p: dict(thresholds[p]) for p in SENSORS}
+        self.lower = np.array([self.thresholds[p]['min'] for p in SENSORS], dtype=np.float64)
+        self.upper = np.array([self.thresholds[p]['max'] for p in SENSORS], dtype=np.float64)
+        # Jalur streaming: tuple float biasa, tanpa lookup dict per sensor
+        self._fields = tuple((PAYLOAD_FIELDS[p], float(lo), float(hi))
+                             for p, lo, hi in zip(SENSORS, self.lower, self.upper))
+        self._bounds = {}
+        self._models = {}
+
+    def __repr__(self):
+        return f"CompiledRules({self.name!r})"
+
+    def bounds(self, columns):
+        """(lower, upper) sesuai urutan kolom fitur, di-cache per urutan kolom."""
+        columns = tuple(columns)
+        cached = self._bounds.get(columns)
+        if cached is None:
+            param_by_column = {column: param for param, column in SENSOR_COLUMNS.items()}
+            index = [SENSORS.index(param_by_column[c]) for c in columns]
+            cached = self._bounds[columns] = (self.lower[index], self.upper[index])
+        return cached
+
+    # --- MODE BATCH ---
+    def violations(self, X, columns=tuple(SENSOR_COLUMNS.values())):
+        """Jumlah pelanggaran per baris (uint8) untuk matriks X (baris x kolom fitur)."""
+        lower, upper = self.bounds(columns)
+        X = np.asarray(X, dtype=np.float64)
+        counts = np.zeros(len(X), dtype=np.uint8)
+        # Per kolom: dua perbandingan + satu penjumlahan, tanpa array antara (baris x kolom)
+        for j in range(X.shape[1]):
+            values = X[:, j]
+            counts += ~((values >= lower[j]) & (values <= upper[j]))
+        return counts
+
+    def label(self, X, columns=tuple(SENSOR_COLUMNS.values())):
+        return LABEL_BY_VIOLATIONS[self.violations(X, columns)]
+
+    def violation_masks(self, df):
+        """{param: array bool}, True = nilai di luar rentang (termasuk NaN)."""
+        masks = {}
+        for param, column in SENSOR_COLUMNS.items():
+            values = np.asarray(df[column], dtype=np.float64)
+            i = SENSORS.index(param)
+            masks[param] = ~((values >= self.lower[i]) & (values <= self.upper[i]))
+        return masks
+
+    def label_frame(self, df):
+        counts = np.zeros(len(df), dtype=np.uint8)
+        for mask in self.violation_masks(df).values():
+            counts += mask
+        return LABEL_BY_VIOLATIONS[counts]
+
+    # --- MODE STREAMING ---
+    def label_reading(self, reading):
+        """Label satu reading (dict/SensorRecord dengan field payload: temp, rh_soil, lux, rh_air)."""
+        violations = 0
+        for field, lower, upper in self._fields:
+            value = reading.get(field)
+            # None -> pelanggaran; NaN juga, karena semua perbandingan dengan NaN False
+            if value is None or not lower <= value <= upper:
+                violations += 1
+        return _LABEL_TUPLE[violations]
+
+    def check_reading(self, reading):
+        """{param: 'low' | 'high' | 'missing'} untuk sensor yang di luar rentang."""
+        result = {}
+        for param, (field, lower, upper) in zip(SENSORS, self._fields):
+            value = reading.get(field)
+            if value is None or value != value:
+                result[param] = 'missing'
+            elif value < lower:
+                result[param] = 'low'
+            elif value > upper:
+                result[param] = 'high'
+        return result
+
+    # --- MODEL ---
+    def model(self, feature_names=('earth_humidity', 'air_temperature', 'air_humidity', 'luminance')):
+        """Aturan profil ini sebagai model (predict / predict_proba seperti sklearn), di-cache."""
+        from fast_forest import threshold_forest
+
+        feature_names = tuple(feature_names)
+        model = self._models.get(feature_names)
+        if model is None:
+            lower, upper = self.bounds(feature_names)
+            model = self._models[feature_names] = threshold_forest(
+                list(zip(lower.tolist(), upper.tolist())), LABEL_BY_VIOLATIONS.tolist(), list(feature_names))
+        return model
+
+# ==========================================
+# 3. PROFIL AKTIF (RUNTIME)
+# ==========================================
+_lock = threading.Lock()
+_compiled = {}
+_subscribers = []
+_active = None
+
+def profile_names():
+    return list(PROFILES)
+
+def compile_profile(name):
+    """CompiledRules untuk profil ini; dikompilasi sekali lalu dipakai ulang."""
+    rules = _compiled.get(name)
+    if rules is None:
+        if name not in PROFILES:
+            raise KeyError(f"profil aturan tidak dikenal: {name} (tersedia: {', '.join(PROFILES)})")
+        with _lock:
+            rules = _compiled.get(name)
+            if rules is None:
+                rules = _compiled[name] = CompiledRules(name, PROFILES[name])
+    return rules
+
+def active_rules():
+    """Profil yang sedang aktif (dibaca tanpa lock: satu referensi, diganti atomik)."""
+    rules = _active
+    if rules is None:
+        rules = set_profile(DEFAULT_PROFILE, notify=False)
+    return rules
+
+def set_profile(name, notify=True):
+    """Ganti profil aktif untuk seluruh proses, lalu beri tahu subscriber(rules)."""
+    global _active
+    rules = compile_profile(name)
+    with _lock:
+        _active = rules
+        subscribers = list(_subscribers)
+    if notify:
+        for callback in subscribers:
+            try:
+                callback(rules)
+            except Exception as e:
+                print(f"❌ Gagal menerapkan profil {name}: {e}")
+    return rules
+
+def subscribe(callback):
+    with _lock:
+        _subscribers.append(callback)
+
+def register_profile(name, thresholds):
+    """Tambah/ubah profil saat runtime; jika profil itu sedang aktif, langsung diterapkan."""
+    _validate(name, thresholds)
+    with _lock:
+        PROFILES[name] = {p: dict(thresholds[p]) for p in SENSORS}
+        _compiled.pop(name, None)
+        is_active = _active is not None and _active.name == name
+    if is_active:
+        set_profile(name)
+
+def resolve(profile=None):
+    """Nama profil -> CompiledRules; None = profil aktif; CompiledRules dikembalikan apa adanya."""
+    if profile is None:
+        return active_rules()
+    if isinstance(profile, str):
+        return compile_profile(profile)
+    return profile
+
+# ==========================================
+# 4. CLI
+# ==========================================
+def print_profiles():
+    active = active_rules().name
+    for name, thresholds in PROFILES.items():
+        marker = "▶" if name == active else " "
+        bounds = " | ".join(f"{p} {thresholds[p]['min']:g}-{thresholds[p]['max']:g}" for p in SENSORS)
+        print(f"{marker} {name:<18} {bounds}")
+
+def benchmark(rules, n_rows, n_readings=200_000, seed=0):
+    from dummy_data_maker import generate_dataset
+
+    columns = list(SENSOR_COLUMNS.values())
+    df = generate_dataset(n_rows, seed=seed, rules=rules)
+    X = df[columns].to_numpy(dtype=np.float64)
+
+    start = time.perf_counter()
+    labels = rules.label(X, columns)
+    batch_s = time.perf_counter() - start
+    print(f"⚡ Batch     : {n_rows / batch_s:,.0f} baris/detik ({batch_s * 1e3:.1f} ms untuk {n_rows:,} baris)")
+
+    readings = [dict(zip(PAYLOAD_FIELDS.values(), row))
+                for row in df[[SENSOR_COLUMNS[p] for p in PAYLOAD_FIELDS]].to_numpy()[:n_readings].tolist()]
+    start = time.perf_counter()
+    streamed = [rules.label_reading(r) for r in readings]
+    stream_s = time.perf_counter() - start
+    print(f"📨 Streaming : {stream_s / len(readings) * 1e6:.2f} µs/reading ({len(readings) / stream_s:,.0f} reading/detik)")
+
+    if not np.array_equal(np.asarray(streamed, dtype=np.uint8), labels[:len(readings)]):
+        raise SystemExit("❌ Hasil batch dan streaming berbeda")
+    print(f"✅ Batch & streaming identik | sebaran label: {np.bincount(labels, minlength=3).tolist()}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Profil aturan threshold Chili-Hub")
+    sub = parser.add_subparsers(dest='command', required=True)
+    sub.add_parser('list', help="Tampilkan semua profil beserta rentangnya")
+    p_bench = sub.add_parser('bench', help="Ukur kecepatan mode batch & streaming")
+    p_bench.add_argument('--rows', type=int, default=5_000_000)
+    p_bench.add_argument('--profile', default=None, help="Default: profil aktif")
+    args = parser.parse_args()
+
+    if args.command == 'list':
+        print_profiles()
+    else:
+        benchmark(resolve(args.profile), args.rows)
+
+if __name__ == "__main__":
+    main()
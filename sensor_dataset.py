@@ -0,0 +1,249 @@
+"""
+Dataset kolumnar untuk histori sensor & data training (Parquet atau Arrow IPC).
+
+Data dipartisi per device dan bulan kalender (gaya hive), satu folder per dataset:
+
+    data_sensor.parquet/device_id=esp32-000/month=2026-01/part-....parquet
+
+Partisi per bulan (bukan per hari): data 15 menit hanya ~100 baris per hari, terlalu kecil
+untuk satu file kolumnar. Rentang waktu yang lebih sempit tetap dipangkas lewat statistik
+min/max row group.
+
+Format dipilih dari akhiran path: folder *.parquet -> Parquet, *.arrow -> Arrow IPC
+(tanpa kompresi, bisa dibaca langsung lewat memory map). Path *.csv tetap dibaca/ditulis
+sebagai CSV, jadi generator, labeling, training dan export menerima keduanya.
+
+Saat membaca, hanya kolom yang diminta yang dibaca (column pruning) dan filter waktu /
+device diteruskan ke scanner (predicate pushdown): folder bulan di luar rentang tidak
+dibuka sama sekali, row group di luar rentang dilewati dari statistik min/max.
+
+Butuh paket opsional pyarrow (pip install pyarrow).
+
+Contoh:
+    python sensor_dataset.py convert --input data_sensor.csv --output data_sensor.parquet
+    python sensor_dataset.py export --db sensor_history.db --output sensor_history.arrow --start 2026-01-01
+"""
+import argparse
+import os
+import shutil
+import time
+import uuid
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    import pyarrow.fs as pafs
+except ImportError:
+    pa = None
+
+from sensor_store import DEFAULT_DEVICE_ID
+
+# Akhiran folder dataset -> format pyarrow.dataset
+DATASET_FORMATS = {'.parquet': 'parquet', '.arrow': 'ipc'}
+PARTITION_COLUMNS = ('device_id', 'month')
+# Kolom yang hanya ada untuk partisi (bukan data): tidak ikut dibaca kecuali diminta di columns
+PARTITION_ONLY_COLUMNS = ('month',)
+# Jumlah baris per row group / batch: cukup besar untuk scan cepat, cukup kecil untuk dilewati
+ROW_GROUP_SIZE = 256_000
+
+# ==========================================
+# 1. UTILITAS
+# ==========================================
+def dataset_format(path):
+    """'parquet' / 'ipc' untuk path dataset, None untuk CSV (atau format lain)."""
+    return DATASET_FORMATS.get(os.path.splitext(os.fspath(path).rstrip('/\\'))[1].lower())
+
+def is_dataset(path):
+    return dataset_format(path) is not None
+
+def _require_pyarrow():
+    if pa is None:
+        raise ImportError("dataset Parquet/Arrow butuh paket pyarrow (pip install pyarrow)")
+
+def _partitioning():
+    return ds.partitioning(pa.schema([(c, pa.string()) for c in PARTITION_COLUMNS]), flavor='hive')
+
+def _open(path):
+    _require_pyarrow()
+    # use_mmap: file dibaca lewat memory map, bukan read() ke buffer baru
+    return ds.dataset(os.fspath(path), format=dataset_format(path), partitioning=_partitioning(),
+                      filesystem=pafs.LocalFileSystem(use_mmap=True))
+
+def _timestamp(value):
+    return None if value is None else pd.Timestamp(value)
+
+def _time_mask(timestamps, start, end):
+    ts = pd.to_datetime(timestamps)
+    mask = np.ones(len(ts), dtype=bool)
+    if start is not None:
+        mask &= (ts >= start).to_numpy()
+    if end is not None:
+        mask &= (ts < end).to_numpy()
+    return mask
+
+def _filter(start, end, device_id):
+    """Ekspresi filter [start, end) + device; kolom partisi 'month' memangkas folder."""
+    clauses = []
+    if start is not None:
+        clauses += [ds.field('month') >= start.strftime('%Y-%m'),
+                    ds.field('timestamp') >= pa.scalar(start.to_pydatetime(), type=pa.timestamp('us'))]
+    if end is not None:
+        clauses += [ds.field('month') <= end.strftime('%Y-%m'),
+                    ds.field('timestamp') < pa.scalar(end.to_pydatetime(), type=pa.timestamp('us'))]
+    if device_id is not None:
+        clauses.append(ds.field('device_id') == device_id)
+    expr = None
+    for clause in clauses:
+        expr = clause if expr is None else expr & clause
+    return expr
+
+def _data_columns(dataset, columns):
+    """columns=None -> semua kolom data (tanpa kolom partisi 'month')."""
+    if columns is not None:
+        return columns
+    return [name for name in dataset.schema.names if name not in PARTITION_ONLY_COLUMNS]
+
+def columns_of(path):
+    """Nama kolom data yang tersedia (tanpa membaca data)."""
+    if is_dataset(path):
+        return _data_columns(_open(path), None)
+    return list(pd.read_csv(path, nrows=0).columns)
+
+# ==========================================
+# 2. TULIS
+# ==========================================
+def _prepare(df):
+    """Pastikan ada timestamp (datetime), device_id dan kolom partisi month."""
+    if 'timestamp' not in df:
+        raise ValueError("dataset butuh kolom 'timestamp'")
+    df = df.copy()
+    df['timestamp'] = pd.to_datetime(df['timestamp'])
+    if 'device_id' not in df:
+        df['device_id'] = DEFAULT_DEVICE_ID
+    df['device_id'] = df['device_id'].astype(str)
+    # Format bulan hanya sekali per bulan unik, bukan per baris
+    codes, months = pd.factorize(df['timestamp'].dt.to_period('M'))
+    df['month'] = np.asarray(months.strftime('%Y-%m'), dtype=object)[codes]
+    return df
+
+def write_frame(df, path, append=False):
+    """
+    Tulis DataFrame ke CSV atau dataset. append=False menimpa isi lama, append=True
+    menambah file baru (untuk penulisan per chunk).
+    """
+    if not is_dataset(path):
+        df.to_csv(path, mode='a' if append else 'w', header=not append, index=False)
+        return
+    _require_pyarrow()
+    if not append and os.path.isdir(path):
+        shutil.rmtree(path)
+    if len(df) == 0:
+        return
+    table = pa.Table.from_pandas(_prepare(df), preserve_index=False)
+    fmt = dataset_format(path)
+    # Nama file unik per panggilan agar chunk berikutnya tidak menimpa file sebelumnya
+    ds.write_dataset(table, os.fspath(path), format=fmt, partitioning=_partitioning(),
+                     basename_template=f"part-{uuid.uuid4().hex[:12]}-{{i}}.{'arrow' if fmt == 'ipc' else fmt}",
+                     existing_data_behavior='overwrite_or_ignore', max_rows_per_group=ROW_GROUP_SIZE)
+
+# ==========================================
+# 3. BACA
+# ==========================================
+def read_frame(path, columns=None, start=None, end=None, device_id=None):
+    """
+    Baca CSV / dataset sebagai DataFrame. columns=None -> semua kolom data (kolom partisi
+    'month' hanya jika diminta). start/end membatasi kolom 'timestamp' ke [start, end).
+    """
+    start, end = _timestamp(start), _timestamp(end)
+    if is_dataset(path):
+        dataset = _open(path)
+        table = dataset.to_table(columns=_data_columns(dataset, columns), filter=_filter(start, end, device_id))
+        return table.to_pandas()
+
+    return next(iter_frames(path, columns, start, end, device_id, chunksize=None))
+
+def iter_frames(path, columns=None, start=None, end=None, device_id=None, chunksize=ROW_GROUP_SIZE,
+                dtype=None):
+    """
+    Seperti read_frame, tetapi per potongan (memori tetap untuk dataset > RAM).
+    dtype hanya dipakai untuk CSV (dataset sudah menyimpan tipe kolomnya).
+    """
+    start, end = _timestamp(start), _timestamp(end)
+    if is_dataset(path):
+        dataset = _open(path)
+        scanner = dataset.scanner(columns=_data_columns(dataset, columns), filter=_filter(start, end, device_id),
+                                  batch_size=chunksize or ROW_GROUP_SIZE)
+        for batch in scanner.to_batches():
+            if batch.num_rows:
+                yield batch.to_pandas()
+        return
+
+    # CSV: filter waktu/device butuh kolomnya, walau tidak diminta di hasil
+    usecols = None
+    if columns is not None:
+        usecols = list(columns)
+        if (start is not None or end is not None) and 'timestamp' not in usecols:
+            usecols.append('timestamp')
+        if device_id is not None and 'device_id' not in usecols:
+            usecols.append('device_id')
+    chunks = pd.read_csv(path, usecols=usecols, dtype=dtype, chunksize=chunksize)
+    for chunk in ([chunks] if chunksize is None else chunks):
+        if start is not None or end is not None:
+            chunk = chunk[_time_mask(chunk['timestamp'], start, end)]
+        if device_id is not None:
+            chunk = chunk[chunk['device_id'].astype(str) == device_id]
+        yield chunk if columns is None else chunk[list(columns)]
+
+# ==========================================
+# 4. CLI: KONVERSI & EXPORT DATABASE
+# ==========================================
+def convert(source, output, chunksize=ROW_GROUP_SIZE):
+    written = 0
+    for chunk in iter_frames(source, chunksize=chunksize):
+        write_frame(chunk, output, append=written > 0)
+        written += len(chunk)
+    return written
+
+def export_database(db_path, output, start=None, end=None, device_id=None, chunksize=ROW_GROUP_SIZE):
+    """Export histori SQLite (mqtt_listener.py) ke dataset / CSV, per chunk."""
+    from sensor_store import SensorStore
+
+    written = 0
+    store = SensorStore(db_path, readonly=True)
+    for chunk in store.query(start=start, end=end, device_id=device_id, chunksize=chunksize):
+        write_frame(chunk, output, append=written > 0)
+        written += len(chunk)
+    return written
+
+def main():
+    parser = argparse.ArgumentParser(description="Dataset kolumnar (Parquet/Arrow) data sensor")
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    p_convert = sub.add_parser('convert', help="CSV/dataset -> CSV/dataset (format dari akhiran path)")
+    p_convert.add_argument('--input', required=True)
+    p_convert.add_argument('--output', required=True)
+
+    p_export = sub.add_parser('export', help="Database histori (.db) -> CSV/dataset")
+    p_export.add_argument('--db', default='sensor_history.db')
+    p_export.add_argument('--output', required=True)
+    p_export.add_argument('--start', default=None)
+    p_export.add_argument('--end', default=None)
+    p_export.add_argument('--device', default=None)
+
+    for p in (p_convert, p_export):
+        p.add_argument('--chunksize', type=int, default=ROW_GROUP_SIZE)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    if args.command == 'convert':
+        written = convert(args.input, args.output, args.chunksize)
+    else:
+        written = export_database(args.db, args.output, args.start, args.end, args.device, args.chunksize)
+    elapsed = time.perf_counter() - start
+    print(f"✅ {written:,} baris ditulis ke '{args.output}' dalam {elapsed:.2f} detik")
+
+if __name__ == "__main__":
+    main()
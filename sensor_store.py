@@ -0,0 +1,357 @@
+import json
+import os
+import queue
+import sqlite3
+import threading
+import time
+from datetime import datetime
+
+import pandas as pd
+
+import metrics
+
+# ==========================================
+# 1. KONFIGURASI STORAGE
+# ==========================================
+DB_FILE = "sensor_history.db"
+DEFAULT_DEVICE_ID = "default"
+
+# Kolom pembacaan sensor (nama sesuai payload ESP32)
+READING_COLUMNS = ['temp', 'rh_air', 'rh_soil', 'lux', 'dht_ok', 'photo_ok', 'soil_ok']
+
+# Nama kolom payload -> nama fitur yang dipakai model
+FEATURE_COLUMNS = {
+    'rh_soil': 'earth_humidity',
+    'temp': 'air_temperature',
+    'rh_air': 'air_humidity',
+    'lux': 'luminance'
+}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS readings (
+    ts        REAL NOT NULL,   -- waktu terima (epoch detik)
+    device_id TEXT NOT NULL,
+    temp      REAL,
+    rh_air    REAL,
+    rh_soil   REAL,
+    lux       REAL,
+    dht_ok    INTEGER,
+    photo_ok  INTEGER,
+    soil_ok   INTEGER
+);
+CREATE INDEX IF NOT EXISTS idx_readings_ts ON readings(ts);
+CREATE INDEX IF NOT EXISTS idx_readings_device_ts ON readings(device_id, ts);
+
+CREATE TABLE IF NOT EXISTS latest (
+    device_id TEXT PRIMARY KEY,
+    ts        REAL NOT NULL,
+    payload   TEXT NOT NULL
+);
+
+-- Hasil klasifikasi ulang histori (replay.py), satu baris per reading per versi model
+CREATE TABLE IF NOT EXISTS predictions (
+    ts            REAL NOT NULL,
+    device_id     TEXT NOT NULL,
+    model_version TEXT NOT NULL,
+    label         INTEGER,   -- label aturan labeling.py
+    code          INTEGER,   -- prediksi model (-1 = tidak diprediksi, nilai sensor kosong)
+    confidence    REAL,
+    PRIMARY KEY (device_id, ts, model_version)
+) WITHOUT ROWID;
+"""
+
+def _connect(path):
+    conn = sqlite3.connect(path, timeout=30)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    return conn
+
+def _has_schema(path):
+    if not os.path.exists(path):
+        return False
+    conn = sqlite3.connect(path, timeout=30)
+    try:
+        return conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'readings'").fetchone() is not None
+    finally:
+        conn.close()
+
+def _to_epoch(value):
+    """Terima epoch (int/float), datetime, atau string ISO ('2026-01-12 17:00')."""
+    if value is None or isinstance(value, (int, float)):
+        return value
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    return value.timestamp()
+
+def flatten_reading(data, device_id=DEFAULT_DEVICE_ID, ts=None):
+    """Ubah payload JSON ESP32 (dengan sensor_health bersarang) menjadi satu baris datar."""
+    health = data.get('sensor_health', {})
+    return {
+        'ts': time.time() if ts is None else ts,
+        'device_id': device_id,
+        'temp': data.get('temp'),
+        'rh_air': data.get('rh_air'),
+        'rh_soil': data.get('rh_soil'),
+        'lux': data.get('lux'),
+        'dht_ok': health.get('dht_ok'),
+        'photo_ok': health.get('photo_ok'),
+        'soil_ok': health.get('soil_ok'),
+        'timestamp': data.get('timestamp'),
+        # Waktu kirim dari ESP32 (epoch, opsional) untuk mengukur latensi end-to-end
+        'sent_ts': data.get('sent_ts')
+    }
+
+# ==========================================
+# 2. SENSOR STORE (SQLite WAL, append-only)
+# ==========================================
+class SensorStore:
+    """
+    Penyimpanan histori sensor append-only di SQLite (mode WAL).
+
+    append() hanya memasukkan data ke antrean, lalu thread writer di belakang
+    menulis ke disk per batch (batch_size baris atau setiap flush_interval detik).
+    Jadi callback MQTT tidak pernah menunggu disk.
+    Data terakhir per device disimpan juga di memori untuk lookup cepat.
+
+    readonly=True tidak menulis apa pun ke database (tanpa CREATE TABLE, tanpa writer);
+    selama writer belum membuat database, pembacaan menghasilkan data kosong.
+    """
+
+    def __init__(self, path=DB_FILE, batch_size=500, flush_interval=1.0,
+                 max_queue=100_000, readonly=False):
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.readonly = readonly
+        self.dropped_count = 0
+        self.written_count = 0
+
+        self._latest = {}
+        # Melindungi _latest dan counter (ditulis thread MQTT/gateway dan thread writer)
+        self._lock = threading.Lock()
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._stop = threading.Event()
+        self._writer = None
+
+        if not readonly:
+            conn = _connect(path)
+            conn.executescript(SCHEMA)
+            conn.close()
+
+            self._writer = threading.Thread(target=self._writer_loop, name="sensor-store-writer", daemon=True)
+            self._writer.start()
+
+    # --- TULIS ---
+    def append(self, reading):
+        """Non-blocking. Jika antrean penuh, data dibuang dan dihitung di dropped_count."""
+        self.append_many([reading])
+
+    def append_many(self, readings):
+        """Seperti append(), tapi satu operasi antrean untuk sekumpulan reading."""
+        with self._lock:
+            for reading in readings:
+                self._latest[reading['device_id']] = reading
+        try:
+            self._queue.put_nowait(readings)
+        except queue.Full:
+            self._count_dropped(len(readings))
+
+    def _count_dropped(self, n):
+        with self._lock:
+            self.dropped_count += n
+        metrics.STORE_DROPPED.inc(n)
+
+    def _writer_loop(self):
+        conn = _connect(self.path)
+        while not (self._stop.is_set() and self._queue.empty()):
+            chunks = self._drain()
+            rows = [r for chunk in chunks for r in chunk]
+            try:
+                if rows:
+                    self._write_batch(conn, rows)
+            except Exception as e:
+                # Thread writer tidak boleh mati: flush() menunggu antrean ini selamanya
+                self._count_dropped(len(rows))
+                print(f"❌ Gagal menulis batch ke {self.path}: {e!r}")
+            finally:
+                for _ in chunks:
+                    self._queue.task_done()
+        conn.close()
+
+    def _drain(self):
+        """Ambil data dari antrean sampai batch_size baris atau sampai flush_interval habis."""
+        chunks = []
+        n_rows = 0
+        deadline = time.monotonic() + self.flush_interval
+        while n_rows < self.batch_size:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                chunk = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                break
+            chunks.append(chunk)
+            n_rows += len(chunk)
+            if not chunk:
+                break  # penanda dari flush(): tulis sekarang, jangan tunggu flush_interval
+        return chunks
+
+    def _write_batch(self, conn, batch):
+        rows = [(r['ts'], r['device_id'], *[r.get(c) for c in READING_COLUMNS]) for r in batch]
+
+        # Hanya data paling baru per device yang masuk ke tabel latest
+        newest = {}
+        for r in batch:
+            newest[r['device_id']] = r
+        latest_rows = [(d, r['ts'], json.dumps(dict(r))) for d, r in newest.items()]
+
+        start = time.perf_counter()
+        try:
+            with conn:
+                conn.executemany(
+                    f"INSERT INTO readings (ts, device_id, {', '.join(READING_COLUMNS)}) "
+                    f"VALUES ({', '.join('?' * (len(READING_COLUMNS) + 2))})",
+                    rows
+                )
+                conn.executemany(
+                    "INSERT OR REPLACE INTO latest (device_id, ts, payload) VALUES (?, ?, ?)",
+                    latest_rows
+                )
+            with self._lock:
+                self.written_count += len(rows)
+            metrics.DISK_WRITE_SECONDS.observe(time.perf_counter() - start)
+            metrics.DISK_WRITE_ROWS.inc(len(rows))
+        except sqlite3.Error as e:
+            self._count_dropped(len(rows))
+            print(f"❌ Gagal menulis batch ke {self.path}: {e}")
+
+    def write_predictions(self, df, model_version):
+        """
+        Tulis hasil replay (kolom ts, device_id, label, code, confidence) dalam satu transaksi.
+        Langsung ke disk (bukan lewat antrean writer); replay ulang versi yang sama menimpa hasil lama.
+        """
+        rows = zip(df['ts'].tolist(), df['device_id'].tolist(), [model_version] * len(df),
+                   df['label'].tolist(), df['code'].tolist(), df['confidence'].tolist())
+        conn = _connect(self.path)
+        try:
+            with conn:
+                conn.executemany(
+                    "INSERT OR REPLACE INTO predictions (ts, device_id, model_version, label, code, confidence) "
+                    "VALUES (?, ?, ?, ?, ?, ?)", rows
+                )
+        finally:
+            conn.close()
+        return len(df)
+
+    def flush(self):
+        """Tunggu sampai semua data di antrean sudah di-commit ke disk."""
+        if self._writer is not None:
+            self._queue.put([])
+            self._queue.join()
+
+    def close(self):
+        self._stop.set()
+        if self._writer is not None:
+            self._writer.join()
+
+    # --- BACA ---
+    def _read_connection(self):
+        """Koneksi baca; store read-only yang databasenya belum dibuat writer membaca skema kosong di memori."""
+        if self.readonly and not _has_schema(self.path):
+            conn = sqlite3.connect(":memory:")
+            conn.executescript(SCHEMA)
+            return conn
+        return _connect(self.path)
+
+    def latest(self, device_id=DEFAULT_DEVICE_ID):
+        """Data terakhir sebuah device. Dari memori jika ada, jika tidak dari tabel latest."""
+        with self._lock:
+            if device_id in self._latest:
+                return self._latest[device_id]
+        conn = self._read_connection()
+        try:
+            row = conn.execute("SELECT payload FROM latest WHERE device_id = ?", (device_id,)).fetchone()
+        finally:
+            conn.close()
+        return json.loads(row[0]) if row else None
+
+    def devices(self):
+        conn = self._read_connection()
+        try:
+            return [r[0] for r in conn.execute("SELECT device_id FROM latest ORDER BY device_id")]
+        finally:
+            conn.close()
+
+    def query(self, start=None, end=None, device_id=None, chunksize=None):
+        """
+        Ambil histori berdasarkan rentang waktu [start, end) (memakai index ts).
+        Hasil berupa DataFrame dengan kolom 'timestamp' (datetime lokal).
+        Jika chunksize diisi, hasilnya iterator DataFrame per potongan.
+        """
+        clauses, params = _time_filter(start, end, device_id)
+        sql = f"SELECT ts, device_id, {', '.join(READING_COLUMNS)} FROM readings{clauses} ORDER BY ts"
+
+        conn = self._read_connection()
+        if chunksize is None:
+            try:
+                return _add_timestamp(pd.read_sql_query(sql, conn, params=params))
+            finally:
+                conn.close()
+        return self._query_chunks(conn, sql, params, chunksize)
+
+    def count(self, start=None, end=None, device_id=None):
+        clauses, params = _time_filter(start, end, device_id)
+        conn = self._read_connection()
+        try:
+            return conn.execute(f"SELECT COUNT(*) FROM readings{clauses}", params).fetchone()[0]
+        finally:
+            conn.close()
+
+    def query_rollup(self, bucket_seconds, start=None, end=None, device_id=None):
+        """
+        Agregasi min/mean/max per bucket waktu langsung di SQLite, sehingga yang dikirim
+        ke grafik hanya satu baris per bucket. Kolom: timestamp, n, <sensor>_min/_mean/_max.
+        """
+        clauses, params = _time_filter(start, end, device_id)
+        aggregates = ", ".join(f"MIN({c}) AS {c}_min, AVG({c}) AS {c}_mean, MAX({c}) AS {c}_max"
+                               for c in FEATURE_COLUMNS)
+        sql = (f"SELECT CAST(ts / ? AS INTEGER) * ? AS ts, COUNT(*) AS n, {aggregates} "
+               f"FROM readings{clauses} GROUP BY 1 ORDER BY 1")
+        conn = self._read_connection()
+        try:
+            return _add_timestamp(pd.read_sql_query(sql, conn, params=[bucket_seconds, bucket_seconds, *params]))
+        finally:
+            conn.close()
+
+    @staticmethod
+    def _query_chunks(conn, sql, params, chunksize):
+        try:
+            for chunk in pd.read_sql_query(sql, conn, params=params, chunksize=chunksize):
+                yield _add_timestamp(chunk)
+        finally:
+            conn.close()
+
+def _time_filter(start, end, device_id):
+    """Klausa WHERE (memakai index ts / device_id+ts) dan parameternya."""
+    clauses, params = [], []
+    if start is not None:
+        clauses.append("ts >= ?")
+        params.append(_to_epoch(start))
+    if end is not None:
+        clauses.append("ts < ?")
+        params.append(_to_epoch(end))
+    if device_id is not None:
+        clauses.append("device_id = ?")
+        params.append(device_id)
+    return (" WHERE " + " AND ".join(clauses) if clauses else ""), params
+
+def _add_timestamp(df):
+    local_tz = datetime.now().astimezone().tzinfo
+    df['timestamp'] = pd.to_datetime(df['ts'], unit='s', utc=True).dt.tz_convert(local_tz).dt.tz_localize(None)
+    return df
+
+def to_feature_frame(df):
+    """Ubah hasil query() ke format kolom data_sensor.csv (nama fitur model)."""
+    out = df.rename(columns=FEATURE_COLUMNS)
+    return out[['timestamp', 'device_id', *FEATURE_COLUMNS.values()]]
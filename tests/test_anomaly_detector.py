@@ -0,0 +1,90 @@
+import pytest
+
+from anomaly_detector import (STUCK_READINGS, STUCK_SECONDS, WARMUP_READINGS, AnomalyDetector, effective_health,
+                              untrusted_sensors)
+from payload_codec import SensorRecord
+
+def _record(i, ts, device_id='d', **values):
+    # Nilai wajar yang sedikit bergerak agar tidak dianggap stuck
+    reading = {'temp': 25.0 + 0.1 * (i % 5), 'rh_air': 70.0 + 0.2 * (i % 3),
+               'rh_soil': 60.0 + 0.1 * (i % 4), 'lux': 20000.0 + 10 * (i % 7)}
+    reading.update(values)
+    return SensorRecord(device_id, ts, dht_ok=True, photo_ok=True, soil_ok=True, **reading)
+
+def _feed(detector, n, interval=60.0, **values):
+    return [detector.check(_record(i, i * interval, **values)) for i in range(n)]
+
+def test_normal_readings_have_no_faults():
+    detector = AnomalyDetector()
+    assert not any(_feed(detector, 200))
+    assert detector.fault_count == 0 and detector.checked_count == 200
+
+def test_out_of_range():
+    detector = AnomalyDetector()
+    record = _record(0, 0.0, temp=85.0, rh_air=-1.0)
+    assert detector.check(record) == {'temp': 'out_of_range', 'rh_air': 'out_of_range'}
+    assert record.faults == {'temp': 'out_of_range', 'rh_air': 'out_of_range'}
+    assert untrusted_sensors(record.faults) == ['temp', 'rh_air']
+    # Nilai mustahil tidak masuk statistik
+    assert detector.stats('d')['temp']['n'] == 0
+
+def test_spike_only_after_warmup():
+    detector = AnomalyDetector()
+    assert detector.check(_record(0, 0.0)) == {}
+    assert detector.check(_record(1, 60.0, temp=40.0)) == {}
+
+    detector = AnomalyDetector()
+    _feed(detector, WARMUP_READINGS)
+    faults = detector.check(_record(WARMUP_READINGS, WARMUP_READINGS * 60.0, temp=40.0))
+    assert faults == {'temp': 'spike'}
+
+def test_slow_drift_is_not_spike():
+    detector = AnomalyDetector()
+    faults = [detector.check(_record(i, i * 600.0, temp=20.0 + 0.5 * i)) for i in range(40)]
+    assert not any(faults)
+
+def test_rh_soil_stuck_needs_time_and_readings():
+    interval = 60.0
+    needed = int(STUCK_SECONDS['rh_soil'] / interval)
+
+    detector = AnomalyDetector()
+    faults = _feed(detector, needed, interval, rh_soil=55.0)
+    # Sudah lebih dari STUCK_READINGS reading konstan, tapi belum 6 jam
+    assert needed > STUCK_READINGS and not any(faults)
+    assert detector.check(_record(needed, needed * interval, rh_soil=55.0)) == {'rh_soil': 'stuck'}
+
+    # Sudah lewat 6 jam, tapi reading konstan masih kurang dari STUCK_READINGS
+    detector = AnomalyDetector()
+    assert not any(_feed(detector, 10, 3600.0, rh_soil=55.0))
+
+def test_stuck_resets_when_value_moves():
+    detector = AnomalyDetector()
+    _feed(detector, 100, 60.0, rh_soil=55.0)
+    detector.check(_record(100, 6000.0, rh_soil=55.5))
+    assert detector.stats('d')['rh_soil']['flat_count'] == 0
+
+def test_lux_zero_at_night_is_not_stuck():
+    detector = AnomalyDetector()
+    assert not any(_feed(detector, 200, 300.0, lux=0.0))
+
+def test_missing_values_skipped():
+    detector = AnomalyDetector()
+    assert detector.check(_record(0, 0.0, rh_soil=None, lux=float('nan'))) == {}
+    stats = detector.stats('d')
+    assert stats['rh_soil']['n'] == 0 and stats['lux']['n'] == 0 and stats['temp']['n'] == 1
+
+def test_devices_tracked_separately():
+    detector = AnomalyDetector()
+    _feed(detector, WARMUP_READINGS)
+    # Device baru belum lewat warmup -> lompatan besar bukan spike
+    assert detector.check(_record(0, 0.0, device_id='baru', temp=40.0)) == {}
+    assert len(detector) == 2
+
+@pytest.mark.parametrize('faults, expected', [
+    (None, {'dht_ok': True, 'photo_ok': True, 'soil_ok': True}),
+    ({'rh_air': 'spike'}, {'dht_ok': False, 'photo_ok': True, 'soil_ok': True}),
+    ({'rh_soil': 'stuck'}, {'dht_ok': True, 'photo_ok': True, 'soil_ok': False}),
+])
+def test_effective_health(faults, expected):
+    reading = {'dht_ok': True, 'photo_ok': True, 'soil_ok': True, 'faults': faults}
+    assert effective_health(reading) == expected
@@ -0,0 +1,36 @@
+import os
+
+import pytest
+
+import benchmarks
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+@pytest.fixture(scope='module')
+def dataset():
+    return benchmarks.make_dataset(200)
+
+def test_bench_ingestion(dataset):
+    result = benchmarks.bench_ingestion(dataset)
+    assert result['n'] == len(dataset)
+    assert result['throughput_with_disk_per_s'] > 0
+
+def test_bench_labeling(dataset):
+    result = benchmarks.bench_labeling(dataset)
+    assert set(result) == {'determine_label', 'label_dataframe', 'label_reading'}
+    assert result['label_dataframe']['n'] == 5 * len(dataset)
+
+def test_bench_inference(dataset, monkeypatch):
+    monkeypatch.chdir(REPO_ROOT)
+    result = benchmarks.bench_inference(dataset, 20)
+    assert all(r['n'] == 20 for r in result.values())
+
+def test_find_regressions():
+    baseline = {'inference': {'sklearn': {'p99_ms': 1.0, 'throughput_per_s': 1000.0}}}
+    current = {'inference': {'sklearn': {'p99_ms': 2.0, 'throughput_per_s': 1000.0}}}
+    assert len(benchmarks.find_regressions(current, baseline, 0.2)) == 1
+    assert benchmarks.find_regressions(baseline, baseline, 0.2) == []
+
+def test_invalid_run_fails():
+    with pytest.raises(SystemExit):
+        benchmarks.ensure_valid('tes', ['pesan hilang'])
@@ -0,0 +1,73 @@
+import numpy as np
+import pytest
+
+pytest.importorskip('sklearn')
+import joblib
+from sklearn.ensemble import RandomForestClassifier
+
+import fast_forest
+from dummy_data_maker import generate_dataset
+from fast_forest import FastForest, export_forest, load_model
+from labeling import label_dataframe
+
+FEATURES = ['earth_humidity', 'air_temperature', 'air_humidity', 'luminance']
+
+@pytest.fixture(scope='module')
+def data():
+    df = generate_dataset(3000, seed=0, rules='cabai/standar')
+    df['label'] = label_dataframe(df, profile='cabai/standar')
+    return df
+
+@pytest.fixture(scope='module')
+def sk_model(data):
+    model = RandomForestClassifier(n_estimators=15, max_depth=8, random_state=0)
+    return model.fit(data[FEATURES], data['label'])
+
+@pytest.fixture(scope='module')
+def model_files(sk_model, tmp_path_factory):
+    folder = tmp_path_factory.mktemp('model')
+    export_forest(sk_model, str(folder / 'model.npz'))
+    joblib.dump(sk_model, str(folder / 'model.pkl'))
+    return str(folder / 'model.npz'), str(folder / 'model.pkl')
+
+@pytest.mark.parametrize('n_rows', [1, fast_forest.SCALAR_MAX_ROWS, 50, 1000])
+@pytest.mark.parametrize('mmap', [True, False])
+def test_identical_to_sklearn(data, sk_model, model_files, n_rows, mmap):
+    fast = FastForest.load(model_files[0], mmap=mmap)
+    X = data[FEATURES].head(n_rows)
+    assert np.array_equal(fast.predict_proba(X), sk_model.predict_proba(X))
+    assert np.array_equal(fast.predict(X), sk_model.predict(X))
+
+def test_nan_and_column_order(data, sk_model, model_files):
+    fast = FastForest.load(model_files[0])
+    X = data[FEATURES].head(20).copy()
+    X.iloc[::3, 1] = np.nan
+    assert np.array_equal(fast.predict_proba(X), sk_model.predict_proba(X))
+    # Jalur skalar (1 baris) mengikuti arah NaN yang sama
+    assert np.array_equal(fast.predict_proba(X.head(1)), sk_model.predict_proba(X.head(1)))
+    # Urutan kolom DataFrame diikuti sesuai feature_names_in_
+    assert np.array_equal(fast.predict_proba(X[FEATURES[::-1]]), sk_model.predict_proba(X))
+
+def test_apply_matches_sklearn_leaves(data, sk_model, model_files):
+    fast = FastForest.load(model_files[0])
+    X = data[FEATURES].head(200)
+    leaves = fast.apply(X) - fast.roots
+    assert np.array_equal(leaves, sk_model.apply(X))
+
+def test_load_model_sends_large_batches_to_sklearn(data, sk_model, model_files):
+    fast = load_model(model_files[0])
+    assert fast.batch_model_path == model_files[1]
+    small = data[FEATURES].head(fast_forest.SKLEARN_MIN_ROWS - 1)
+    fast.predict_proba(small)
+    assert fast._batch_model is None
+    large = data[FEATURES].head(fast_forest.SKLEARN_MIN_ROWS)
+    assert np.array_equal(fast.predict_proba(large.to_numpy()), sk_model.predict_proba(large))
+    assert isinstance(fast._batch_model, RandomForestClassifier)
+
+def test_load_model_without_pkl(data, sk_model, tmp_path):
+    path = str(tmp_path / 'only.npz')
+    export_forest(sk_model, path)
+    fast = load_model(path)
+    assert fast.batch_model_path is None
+    X = data[FEATURES].head(fast_forest.SKLEARN_MIN_ROWS)
+    assert np.array_equal(fast.predict_proba(X), sk_model.predict_proba(X))
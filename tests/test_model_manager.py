@@ -0,0 +1,65 @@
+import numpy as np
+import pytest
+
+from dummy_data_maker import generate_dataset
+from labeling import label_dataframe
+from model_manager import (FEATURES, PSI_THRESHOLD, _install, drift_report, feature_reference, load_manifest,
+                           psi, record_model_version, weighted_f1)
+
+@pytest.fixture(scope='module')
+def data():
+    df = generate_dataset(4000, seed=2, rules='cabai/standar')
+    df['label'] = label_dataframe(df, profile='cabai/standar')
+    return df
+
+def test_psi():
+    assert psi([0.25] * 4, [0.25] * 4) == 0.0
+    assert psi([0.25] * 4, [0.7, 0.1, 0.1, 0.1]) > PSI_THRESHOLD
+    # Proporsi nol tidak menghasilkan inf
+    assert np.isfinite(psi([0.5, 0.5, 0.0], [0.0, 0.5, 0.5]))
+
+def test_feature_reference(data):
+    reference = feature_reference(data)
+    assert reference['rows'] == len(data)
+    for feature in FEATURES:
+        ref = reference['features'][feature]
+        assert len(ref['proportions']) == len(ref['edges']) + 1
+        assert sum(ref['proportions']) == pytest.approx(1.0)
+    assert sum(reference['labels']) == pytest.approx(1.0)
+
+def test_drift_report(data):
+    reference = feature_reference(data.iloc[:2000])
+    same = drift_report(reference, data.iloc[2000:])
+    assert same['drifted'] == []
+    assert set(same['psi']) == {*FEATURES, 'label'}
+
+    shifted = data.iloc[2000:].copy()
+    shifted['air_temperature'] += 8.0
+    report = drift_report(reference, shifted)
+    assert 'air_temperature' in report['drifted']
+    assert report['psi']['air_temperature'] > PSI_THRESHOLD
+
+def test_weighted_f1_matches_sklearn():
+    metrics = pytest.importorskip('sklearn.metrics')
+    rng = np.random.default_rng(0)
+    y_true = rng.integers(0, 3, 500)
+    y_pred = np.where(rng.random(500) < 0.7, y_true, rng.integers(0, 3, 500))
+    assert weighted_f1(y_true, y_pred) == pytest.approx(metrics.f1_score(y_true, y_pred, average='weighted'))
+
+def test_install_replaces_atomically(tmp_path):
+    src, dst = tmp_path / 'baru.npz', tmp_path / 'model.npz'
+    src.write_bytes(b'baru')
+    dst.write_bytes(b'lama')
+    _install(str(src), str(dst))
+    assert dst.read_bytes() == b'baru'
+    assert sorted(p.name for p in tmp_path.iterdir()) == ['baru.npz', 'model.npz']
+
+def test_record_model_version(tmp_path):
+    path = str(tmp_path / 'versions.json')
+    assert load_manifest(path) == {'active': None, 'versions': []}
+    assert record_model_version('a.pkl', 'a.npz', {}, 'tes', manifest_path=path) == 'v1'
+    assert record_model_version('b.pkl', 'b.npz', {}, 'tes', activate=False, manifest_path=path) == 'v2'
+    assert record_model_version('c.pkl', 'c.npz', {}, 'tes', manifest_path=path) == 'v3'
+    manifest = load_manifest(path)
+    assert manifest['active'] == 'v3'
+    assert [v['status'] for v in manifest['versions']] == ['retired', 'candidate', 'active']
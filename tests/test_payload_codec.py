@@ -0,0 +1,58 @@
+import json
+import math
+
+import pytest
+
+from payload_codec import (PACKED_FORMAT, PACKED_VERSION, PayloadError, SensorRecord, decode_payload,
+                           encode_json, encode_packed)
+
+READING = {'temp': 27.5, 'rh_air': 70.1, 'rh_soil': 45.0, 'lux': 12000.0,
+           'dht_ok': True, 'photo_ok': False, 'soil_ok': True, 'sent_ts': 1_700_000_000}
+
+def test_json_round_trip():
+    record = decode_payload(encode_json(READING), 'esp32-001', ts=123.0)
+    assert isinstance(record, SensorRecord)
+    assert record.device_id == 'esp32-001' and record.ts == 123.0
+    for key, value in READING.items():
+        assert record[key] == value
+
+def test_packed_round_trip():
+    payload = encode_packed(READING)
+    assert len(payload) == PACKED_FORMAT.size and payload[0] == PACKED_VERSION
+    record = decode_payload(payload, 'esp32-001', ts=1.0)
+    # float32 dibulatkan 2 desimal saat decode
+    assert (record.temp, record.rh_air, record.rh_soil, record.lux) == (27.5, 70.1, 45.0, 12000.0)
+    assert (record.dht_ok, record.photo_ok, record.soil_ok) == (True, False, True)
+    assert record.sent_ts == 1_700_000_000
+
+def test_missing_values_round_trip_as_none():
+    reading = dict(READING, rh_soil=None, soil_ok=False)
+    for encode in (encode_json, encode_packed):
+        record = decode_payload(encode(reading), 'd')
+        assert record.rh_soil is None and record.missing() == ['rh_soil']
+
+def test_format_detected_from_first_byte():
+    # Byte pertama PACKED_VERSION -> packed; '{' -> JSON; str juga diterima
+    assert decode_payload(encode_packed(READING), 'd').lux == 12000.0
+    assert decode_payload(encode_json(READING).decode(), 'd').lux == 12000.0
+    with pytest.raises(PayloadError, match="packed"):
+        decode_payload(encode_packed(READING)[:-1], 'd')
+
+@pytest.mark.parametrize('payload', [
+    b'', b'{"temp": 1', b'[1, 2]', b'\xff\xfe',
+    json.dumps({'temp': 1, 'rh_air': 2, 'rh_soil': 3}).encode(),
+    json.dumps({'temp': True, 'rh_air': 2, 'rh_soil': 3, 'lux': 4}).encode(),
+    json.dumps({'temp': 1, 'rh_air': 2, 'rh_soil': 3, 'lux': 4, 'sensor_health': {'dht_ok': 1}}).encode(),
+])
+def test_invalid_payload_rejected(payload):
+    with pytest.raises(PayloadError):
+        decode_payload(payload, 'd')
+
+def test_infinite_packed_value_rejected():
+    with pytest.raises(PayloadError):
+        decode_payload(PACKED_FORMAT.pack(PACKED_VERSION, math.inf, 1, 1, 1, 7, 0), 'd')
+
+def test_cbor_round_trip():
+    cbor2 = pytest.importorskip('cbor2')
+    data = {'temp': 20.0, 'rh_air': 75.0, 'rh_soil': 70.0, 'lux': 30000.0}
+    assert decode_payload(cbor2.dumps(data), 'd').rh_air == 75.0
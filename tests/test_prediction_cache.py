@@ -0,0 +1,58 @@
+import numpy as np
+
+import rule_engine
+from prediction_cache import PredictionCache
+
+FEATURES = ['earth_humidity', 'air_temperature', 'air_humidity', 'luminance']
+
+class CountingModel:
+    """Bungkus model aturan dan hitung baris yang benar-benar diprediksi."""
+
+    def __init__(self, model):
+        self.model = model
+        self.classes_ = model.classes_
+        self.rows = 0
+
+    def predict_proba(self, X):
+        self.rows += len(X)
+        return self.model.predict_proba(X)
+
+def _model(profile='cabai/standar'):
+    return CountingModel(rule_engine.compile_profile(profile).model(FEATURES))
+
+def test_hits_and_rounding():
+    model = _model()
+    cache = PredictionCache(model, FEATURES)
+    rows = [[60.0, 25.0, 70.0, 20000.0], [10.0, 25.0, 70.0, 20000.0], [60.04, 25.01, 70.0, 20000.0]]
+
+    codes, confidences = cache.predict(rows)
+    expected = model.model.predict(np.round(np.asarray(rows), 1))
+    assert codes.tolist() == expected.tolist()
+    assert confidences.tolist() == [1.0, 1.0, 1.0]
+    # Baris 1 dan 3 sama setelah pembulatan -> satu panggilan model untuk 2 baris unik
+    assert model.rows == 2 and len(cache) == 2
+
+    assert cache.predict_one(rows[0]) == (int(codes[0]), 1.0)
+    assert model.rows == 2
+    assert (cache.hits, cache.misses) == (2, 2)
+    assert cache.hit_rate == 0.5
+
+def test_lru_limit():
+    model = _model()
+    cache = PredictionCache(model, FEATURES, maxsize=2)
+    cache.predict([[60.0, 25.0, 70.0, t] for t in (1000.0, 2000.0, 3000.0)])
+    assert len(cache) == 2
+    cache.predict([[60.0, 25.0, 70.0, 1000.0]])
+    assert model.rows == 4
+
+def test_swap_model_clears_cache():
+    cache = PredictionCache(_model(), FEATURES, version='v1')
+    row = [60.0, 22.0, 70.0, 20000.0]
+    assert cache.predict_versioned([row])[2] == 'v1'
+
+    semai = _model('cabai/semai')
+    cache.swap_model(semai, version='v2')
+    assert len(cache) == 0
+    codes, _, version = cache.predict_versioned([row])
+    assert version == 'v2' and semai.rows == 1
+    assert codes.tolist() == semai.model.predict(np.asarray([row])).tolist()
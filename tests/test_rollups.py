@@ -0,0 +1,80 @@
+import numpy as np
+import pytest
+
+from ring_buffer import SensorRingBuffer
+from rollups import MAX_CHART_POINTS, RESOLUTIONS, SensorRollups, bucket_seconds_for
+
+T0 = 1_700_000_000.0 - 1_700_000_000.0 % 21600  # awal bucket di semua resolusi
+
+def test_bucket_boundaries():
+    rollups = SensorRollups(['a'])
+    for ts, value in [(T0, 1.0), (T0 + 59.9, 3.0), (T0 + 60, 10.0), (T0 + 3600, 5.0)]:
+        rollups.add(ts, [value])
+
+    starts = rollups.levels['1m'].arrays()[0]
+    assert starts.tolist() == [T0, T0 + 60, T0 + 3600]
+    mean = rollups.frame('1m', 'mean')['a'].tolist()
+    assert mean == [2.0, 10.0, 5.0]
+    assert rollups.frame('1m', 'min')['a'].tolist() == [1.0, 10.0, 5.0]
+    assert rollups.frame('1m', 'max')['a'].tolist() == [3.0, 10.0, 5.0]
+    # Di resolusi 1 jam tiga reading pertama satu bucket
+    assert rollups.frame('1h', 'mean')['a'].tolist() == [pytest.approx(14 / 3), 5.0]
+
+def test_old_readings_ignored():
+    rollups = SensorRollups(['a'])
+    rollups.add(T0 + 10, [1.0])
+    rollups.add(T0 + 5, [100.0])
+    rollups.extend([T0, T0 + 10], [[100.0], [100.0]])
+    assert rollups.frame('1m', 'max')['a'].tolist() == [1.0]
+
+def test_extend_matches_add():
+    rng = np.random.default_rng(0)
+    ts = np.sort(T0 + rng.uniform(0, 3 * 86400, 5000))
+    values = rng.normal(size=(len(ts), 2))
+    one, many = SensorRollups(['a', 'b']), SensorRollups(['a', 'b'])
+    for t, v in zip(ts, values):
+        one.add(t, v)
+    many.extend(ts[:1234], values[:1234])
+    many.extend(ts[1234:], values[1234:])
+    for name, _, _ in RESOLUTIONS:
+        for stat in ('mean', 'min', 'max'):
+            assert np.allclose(one.frame(name, stat).to_numpy(), many.frame(name, stat).to_numpy())
+
+def test_ring_capacity_keeps_newest():
+    rollups = SensorRollups(['a'], resolutions=(('1m', 60, 3),))
+    for i in range(6):
+        rollups.add(T0 + 60 * i, [float(i)])
+    # 3 bucket tertutup + 1 bucket terbuka
+    assert rollups.frame('1m')['a'].tolist() == [2.0, 3.0, 4.0, 5.0]
+
+@pytest.mark.parametrize('span', [3600, 6 * 3600, 86400, 7 * 86400, 30 * 86400, 90 * 86400])
+def test_select_fits_chart(span):
+    rollups = SensorRollups(['a'])
+    level = rollups.levels[rollups.select(span)]
+    assert span / level.seconds <= MAX_CHART_POINTS
+
+def test_bucket_seconds_for():
+    assert bucket_seconds_for(3600) == 60
+    width = bucket_seconds_for(30 * 86400)
+    assert width % 60 == 0 and 30 * 86400 / width <= MAX_CHART_POINTS
+
+def test_ring_buffer_window_stats():
+    buffer = SensorRingBuffer(4, ['a', 'b'], ['NORMAL', 'WARNING'])
+    rows = [(1.0, 5.0, 'NORMAL'), (9.0, 2.0, 'WARNING'), (3.0, 7.0, 'NORMAL'),
+            (4.0, 1.0, 'NORMAL'), (2.0, 8.0, 'CRITICAL'), (6.0, 3.0, 'WARNING')]
+    for i, (a, b, label) in enumerate(rows):
+        buffer.append(i, [a, b], label)
+
+    window = rows[-4:]
+    assert len(buffer) == 4
+    assert buffer.view('a').tolist() == [r[0] for r in window]
+    assert buffer.mean('a') == pytest.approx(np.mean([r[0] for r in window]))
+    assert (buffer.min('a'), buffer.max('a')) == (2.0, 6.0)
+    assert (buffer.min('b'), buffer.max('b')) == (1.0, 8.0)
+    assert buffer.class_counts() == {'NORMAL': 2, 'WARNING': 1}
+    assert buffer.labels().tolist() == ['NORMAL', 'NORMAL', None, 'WARNING']
+    assert not buffer.view().flags.writeable
+
+    buffer.resize(2)
+    assert buffer.view('a').tolist() == [2.0, 6.0]
+    assert buffer.max('b') == 8.0
@@ -0,0 +1,84 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import rule_engine
+from dummy_data_maker import generate_dataset
+from labeling import determine_label, label_dataframe
+
+COLUMNS = list(rule_engine.SENSOR_COLUMNS.values())
+
+@pytest.fixture
+def restore_profile():
+    previous = rule_engine.active_rules()
+    yield
+    rule_engine.set_profile(previous.name, notify=False)
+
+def _frame(profile):
+    df = generate_dataset(2000, seed=1, rules=profile)
+    thresholds = rule_engine.compile_profile(profile).thresholds
+    # Nilai tepat di batas min/max (masih OK) dan nilai kosong (pelanggaran)
+    edge = {column: [thresholds[param]['min'], thresholds[param]['max'], np.nan]
+            for param, column in rule_engine.SENSOR_COLUMNS.items()}
+    return pd.concat([df[COLUMNS], pd.DataFrame(edge)], ignore_index=True)
+
+@pytest.mark.parametrize('profile', rule_engine.profile_names())
+def test_labels_match_determine_label(profile, restore_profile):
+    rule_engine.set_profile(profile, notify=False)
+    rules = rule_engine.active_rules()
+    df = _frame(profile)
+    expected = df.apply(determine_label, axis=1).to_numpy()
+
+    assert np.array_equal(label_dataframe(df), expected)
+    assert np.array_equal(rules.label_frame(df), expected)
+    assert np.array_equal(rules.label(df[COLUMNS].to_numpy(), COLUMNS), expected)
+    # Kolom dengan urutan lain tetap memakai batas yang benar
+    reordered = COLUMNS[::-1]
+    assert np.array_equal(rules.label(df[reordered].to_numpy(), reordered), expected)
+
+    fields = rule_engine.PAYLOAD_FIELDS
+    readings = [{fields[p]: (None if np.isnan(v) else v) for p, v in zip(rule_engine.SENSOR_COLUMNS, row)}
+                for row in df[COLUMNS].to_numpy().tolist()]
+    assert [rules.label_reading(r) for r in readings] == expected.tolist()
+
+    # Model aturan (threshold_forest) memprediksi label yang sama
+    assert np.array_equal(rules.model().predict(df[list(rules.model().feature_names_in_)]), expected)
+
+def test_check_reading_directions():
+    rules = rule_engine.compile_profile(rule_engine.STANDARD_PROFILE)
+    reading = {'temp': 10.0, 'rh_soil': 90.0, 'lux': None, 'rh_air': 75.0}
+    assert rules.check_reading(reading) == {'temp': 'low', 'soil': 'high', 'lux': 'missing'}
+
+def test_register_profile_updates_active_rules(restore_profile):
+    name = 'tes/fase'
+    thresholds = {p: dict(v) for p, v in rule_engine.PROFILES[rule_engine.STANDARD_PROFILE].items()}
+    seen = []
+    rule_engine.subscribe(seen.append)
+    try:
+        rule_engine.register_profile(name, thresholds)
+        rule_engine.set_profile(name)
+        thresholds['temp'] = {'min': 30, 'max': 35}
+        rule_engine.register_profile(name, thresholds)
+        assert rule_engine.active_rules().thresholds['temp'] == {'min': 30, 'max': 35}
+        assert [r.name for r in seen] == [name, name]
+    finally:
+        rule_engine._subscribers.remove(seen.append)
+        rule_engine.PROFILES.pop(name, None)
+        rule_engine._compiled.pop(name, None)
+
+def test_register_profile_rejects_invalid():
+    with pytest.raises(ValueError):
+        rule_engine.register_profile('tanpa-fase', rule_engine.PROFILES[rule_engine.STANDARD_PROFILE])
+    bad = {p: dict(v) for p, v in rule_engine.PROFILES[rule_engine.STANDARD_PROFILE].items()}
+    bad['lux'] = {'min': 5, 'max': 1}
+    with pytest.raises(ValueError):
+        rule_engine.register_profile('tes/salah', bad)
+    assert 'tes/salah' not in rule_engine.PROFILES
+
+def test_resolve():
+    rules = rule_engine.compile_profile('cabai/semai')
+    assert rule_engine.resolve('cabai/semai') is rules
+    assert rule_engine.resolve(rules) is rules
+    assert rule_engine.resolve(None) is rule_engine.active_rules()
+    with pytest.raises(KeyError):
+        rule_engine.resolve('cabai/tidak-ada')
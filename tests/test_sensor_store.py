@@ -0,0 +1,79 @@
+import os
+
+import pytest
+
+from sensor_store import SensorStore, flatten_reading, to_feature_frame
+
+T0 = 1_700_000_000.0 - 1_700_000_000.0 % 3600
+
+def _reading(device_id, ts, temp):
+    data = {'temp': temp, 'rh_air': 70.0, 'rh_soil': 60.0, 'lux': 1000.0,
+            'sensor_health': {'dht_ok': True, 'photo_ok': True, 'soil_ok': False}}
+    return flatten_reading(data, device_id, ts=ts)
+
+@pytest.fixture
+def store(tmp_path):
+    store = SensorStore(str(tmp_path / 'sensor.db'), batch_size=50, flush_interval=0.05)
+    yield store
+    store.close()
+
+def test_append_flush_read(store):
+    readings = [_reading(f'd{i % 3}', T0 + i * 10, 20.0 + i) for i in range(120)]
+    store.append(readings[0])
+    store.append_many(readings[1:])
+    store.flush()
+
+    assert store.written_count == 120 and store.dropped_count == 0
+    assert store.count() == 120
+    assert store.count(start=T0, end=T0 + 600) == 60
+    assert store.count(device_id='d1') == 40
+    assert store.devices() == ['d0', 'd1', 'd2']
+
+    df = store.query(start=T0 + 100, end=T0 + 200, device_id='d1')
+    assert df['ts'].tolist() == [T0 + 100, T0 + 130, T0 + 160, T0 + 190]
+    assert df['temp'].tolist() == [30.0, 33.0, 36.0, 39.0]
+    assert list(to_feature_frame(df).columns) == ['timestamp', 'device_id', 'earth_humidity',
+                                                   'air_temperature', 'air_humidity', 'luminance']
+    chunks = list(store.query(chunksize=50))
+    assert [len(c) for c in chunks] == [50, 50, 20]
+
+    # latest dari memori dan (lewat store baru) dari tabel latest di disk
+    assert store.latest('d2')['temp'] == readings[-1]['temp']
+    reopened = SensorStore(store.path, readonly=True)
+    assert reopened.latest('d2')['temp'] == readings[-1]['temp']
+    assert reopened.latest('d2')['soil_ok'] is False
+    assert reopened.latest('tidak-ada') is None
+
+def test_query_rollup(store):
+    store.append_many([_reading('d', T0 + i * 60, float(i)) for i in range(120)])
+    store.flush()
+    rollup = store.query_rollup(3600)
+    assert rollup['ts'].tolist() == [T0, T0 + 3600]
+    assert rollup['n'].tolist() == [60, 60]
+    assert rollup['temp_min'].tolist() == [0.0, 60.0]
+    assert rollup['temp_max'].tolist() == [59.0, 119.0]
+    assert rollup['temp_mean'].tolist() == [29.5, 89.5]
+
+def test_readonly_missing_database(tmp_path):
+    path = str(tmp_path / 'belum-ada.db')
+    store = SensorStore(path, readonly=True)
+    assert store.count() == 0
+    assert store.query().empty
+    assert store.devices() == []
+    assert store.latest() is None
+    assert store.query_rollup(60).empty
+    store.flush()
+    store.close()
+    assert not os.path.exists(path)
+
+def test_writer_survives_bad_record(store):
+    bad = _reading('d', T0, 20.0)
+    bad['temp'] = object()  # tidak bisa ditulis sqlite maupun json
+    store.append(bad)
+    store.flush()
+    assert store.dropped_count == 1
+
+    store.append(_reading('d', T0 + 1, 21.0))
+    store.flush()
+    assert store.written_count == 1
+    assert store.count() == 1
@@ -1,66 +1,294 @@
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
 import pandas as pd
 import numpy as np
-from sklearn.model_selection import train_test_split
-from sklearn.ensemble import RandomForestClassifier
-from sklearn.metrics import classification_report, f1_score, confusion_matrix
-import joblib
+from fast_forest import export_forest, FAST_MODEL_PATH
+from model_manager import MANIFEST_PATH, feature_reference, record_model_version
+from rule_engine import STANDARD_PROFILE
+from sensor_dataset import columns_of, iter_frames, read_frame
+# sklearn & joblib di-import di dalam fungsi yang memakainya: impor sklearn ~2 detik,
+# jadi --help, error argumen atau file data yang tidak ada langsung selesai
+
+FEATURES = ['earth_humidity', 'air_temperature', 'air_humidity', 'luminance']
+
+# Ruang pencarian hyperparameter Random Forest
+PARAM_GRID = {
+    'n_estimators': [50, 100, 200],
+    'max_depth': [None, 10, 20],
+    'min_samples_leaf': [1, 2, 5],
+    'max_features': ['sqrt', None]
+}
 
 # ---------------------------------------------------------
 # BAGIAN 1: PERSIAPAN DATA (Load data yang sudah dilabeli)
 # ---------------------------------------------------------
-try:
-    df = pd.read_csv('data_sensor.csv')
-except FileNotFoundError:
-    print("❌ Error: File 'labeled_sensor_data.csv' tidak ditemukan. Jalankan script generate data dulu.")
-    exit()
-
-# Pisahkan Fitur (X) dan Target/Label (y)
-# Fitur: Data sensor yang akan dipelajari
-X = df[['earth_humidity', 'air_temperature', 'air_humidity', 'luminance']]
+def load_training_data(source='data_sensor.csv', start=None, end=None):
+    """
+    Sumber data:
+    - file CSV berlabel (default 'data_sensor.csv')
+    - dataset kolumnar berlabel (folder .parquet / .arrow, lihat sensor_dataset.py)
+    - database histori dari mqtt_listener.py (file .db); data dilabeli otomatis
+    start/end (opsional) membatasi rentang waktu data.
+    Data mentah selalu dilabeli profil standar (bukan CHILIHUB_RULE_PROFILE), sama seperti
+    validasi & retraining model_manager.py, agar model dinilai dengan label yang sama.
+    """
+    if source.endswith('.db'):
+        from sensor_store import SensorStore, to_feature_frame
+        from labeling import label_dataframe
 
-# Target: Hasil klasifikasi (0=Normal, 1=Warning, 2=Critical)
-y = df['label']
+        df = to_feature_frame(SensorStore(source, readonly=True).query(start=start, end=end))
+        df['label'] = label_dataframe(df, profile=STANDARD_PROFILE)
+        return df
 
-# Split Data: 80% untuk Latihan (Train), 20% untuk Ujian (Test)
-# stratify=y memastikan proporsi kelas (Normal/Warning/Critical) seimbang di kedua set
-X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42, stratify=y)
-
-print(f"📊 Data Latih: {len(X_train)} baris")
-print(f"📊 Data Uji: {len(X_test)} baris")
+    # Filter waktu diteruskan ke scanner dataset (folder tanggal di luar rentang tidak dibaca)
+    return read_frame(source, start=start, end=end)
 
 # ---------------------------------------------------------
-# BAGIAN 2: TRAINING MODEL
+# BAGIAN 1A: MODE STREAMING (DATASET LEBIH BESAR DARI RAM)
 # ---------------------------------------------------------
-print("\n🤖 Sedang melatih model Random Forest...")
+def stream_training_data(source, chunksize=200_000, start=None, end=None):
+    """
+    Baca data per chunk, hanya 4 kolom fitur (float32) + label (uint8).
+    Sumber: CSV / dataset .parquet / .arrow (berlabel atau mentah) atau database histori (.db).
+    Menghasilkan (X, y) per chunk.
+    """
+    from labeling import label_dataframe
 
-# Inisialisasi Model
-model = RandomForestClassifier(n_estimators=100, random_state=42)
+    if source.endswith('.db'):
+        from sensor_store import SensorStore, to_feature_frame
 
-# Proses Training (Fit)
-model.fit(X_train, y_train)
+        for chunk in SensorStore(source, readonly=True).query(start=start, end=end, chunksize=chunksize):
+            chunk = to_feature_frame(chunk)
+            yield chunk[FEATURES].to_numpy(dtype=np.float32), label_dataframe(chunk, profile=STANDARD_PROFILE)
+        return
 
-# ---------------------------------------------------------
-# BAGIAN 3: EVALUASI (TESTING)
-# ---------------------------------------------------------
-print("\n📝 Melakukan evaluasi...")
+    # Hanya kolom fitur (+ label) yang dibaca; filter waktu dilakukan saat membaca
+    columns = FEATURES + (['label'] if 'label' in columns_of(source) else [])
+    dtype = {c: np.float32 for c in FEATURES}
+    if 'label' in columns:
+        dtype['label'] = np.uint8
+
+    for chunk in iter_frames(source, columns=columns, start=start, end=end, chunksize=chunksize, dtype=dtype):
+        # Data mentah (tanpa label) dilabeli langsung per chunk
+        y = chunk['label'].to_numpy(dtype=np.uint8) if 'label' in chunk else label_dataframe(chunk, profile=STANDARD_PROFILE)
+        yield chunk[FEATURES].to_numpy(dtype=np.float32), y
+
+def reservoir_sample(chunks, sample_size, seed=42):
+    """
+    Reservoir sampling (Algorithm R, vektorisasi per chunk): sampel acak seragam
+    berukuran tetap dari seluruh data, memori tidak bergantung pada ukuran dataset.
+    Mengembalikan (X, y, jumlah baris dibaca, baris/detik).
+    """
+    rng = np.random.default_rng(seed)
+    X_res = np.empty((sample_size, len(FEATURES)), dtype=np.float32)
+    y_res = np.empty(sample_size, dtype=np.uint8)
+    seen = 0
+    start = time.perf_counter()
 
-# Minta model memprediksi data ujian (X_test)
-y_pred = model.predict(X_test)
+    for X, y in chunks:
+        n = len(X)
+        # Isi reservoir sampai penuh
+        fill = min(max(sample_size - seen, 0), n)
+        X_res[seen:seen + fill] = X[:fill]
+        y_res[seen:seen + fill] = y[:fill]
 
-# Hitung Skor Evaluasi
-# F1 Score sangat penting jika data tidak seimbang (imbalanced data)
-f1 = f1_score(y_test, y_pred, average='weighted')
+        # Baris ke-i (global, 0-based) menggantikan slot acak r < i+1 jika r < sample_size.
+        # Jika beberapa baris memilih slot yang sama, baris terakhir yang menang (= urutan sekuensial).
+        if fill < n:
+            positions = np.arange(seen + fill, seen + n, dtype=np.int64)
+            slots = (rng.random(len(positions)) * (positions + 1)).astype(np.int64)
+            keep = slots < sample_size
+            X_res[slots[keep]] = X[fill:][keep]
+            y_res[slots[keep]] = y[fill:][keep]
+        seen += n
 
-print(f"✅ Weighted F1 Score: {f1:.4f} (Semakin dekat ke 1.0 semakin bagus)")
-print("\n--- Detail Laporan Klasifikasi ---")
-print(classification_report(y_test, y_pred, target_names=['Normal', 'Warning', 'Critical']))
+        elapsed = time.perf_counter() - start
+        print(f"\r📥 {seen:,} baris dibaca ({seen / max(elapsed, 1e-9):,.0f} baris/detik)", end="")
 
-print("\n--- Confusion Matrix (Kebenaran Prediksi) ---")
-# Baris = Kunci Jawaban (Asli), Kolom = Jawaban Model (Prediksi)
-print(confusion_matrix(y_test, y_pred))
+    elapsed = time.perf_counter() - start
+    print()
+    size = min(seen, sample_size)
+    return X_res[:size], y_res[:size], seen, seen / max(elapsed, 1e-9)
 
 # ---------------------------------------------------------
-# BAGIAN 4: SIMPAN MODEL JADI
+# BAGIAN 1B: HYPERPARAMETER SEARCH (PARALEL, K-FOLD)
 # ---------------------------------------------------------
-joblib.dump(model, 'model_final.pkl')
-print("\n💾 Model berhasil disimpan sebagai 'model_final.pkl'")
\ No newline at end of file
+# Data + fold disimpan sekali per proses worker (lewat initializer),
+# jadi tidak dikirim ulang atau dihitung ulang untuk setiap konfigurasi
+_SEARCH_DATA = {}
+
+def _init_search_worker(X, y, folds):
+    _SEARCH_DATA['X'] = X
+    _SEARCH_DATA['y'] = y
+    _SEARCH_DATA['folds'] = folds
+
+def _evaluate_params(params):
+    from sklearn.ensemble import RandomForestClassifier
+    from sklearn.metrics import f1_score
+
+    X, y, folds = _SEARCH_DATA['X'], _SEARCH_DATA['y'], _SEARCH_DATA['folds']
+    start = time.perf_counter()
+    scores = []
+    for train_idx, test_idx in folds:
+        model = RandomForestClassifier(random_state=42, n_jobs=1, **params)
+        model.fit(X[train_idx], y[train_idx])
+        scores.append(f1_score(y[test_idx], model.predict(X[test_idx]), average='weighted'))
+    return params, float(np.mean(scores)), float(np.std(scores)), time.perf_counter() - start
+
+def candidate_params(search='grid', n_iter=20, seed=42):
+    from sklearn.model_selection import ParameterGrid, ParameterSampler
+
+    if search == 'random':
+        return list(ParameterSampler(PARAM_GRID, n_iter=n_iter, random_state=seed))
+    return list(ParameterGrid(PARAM_GRID))
+
+def hyperparameter_search(X, y, search='grid', n_folds=5, n_iter=20, n_jobs=None):
+    """
+    Stratified k-fold untuk setiap kandidat parameter, dijalankan paralel di process pool
+    (default: semua core). Mengembalikan list hasil, terbaik di urutan pertama.
+    """
+    from sklearn.model_selection import StratifiedKFold
+
+    X = np.asarray(X, dtype=np.float32)
+    y = np.asarray(y)
+    folds = list(StratifiedKFold(n_splits=n_folds, shuffle=True, random_state=42).split(X, y))
+    candidates = candidate_params(search, n_iter)
+    n_jobs = n_jobs or os.cpu_count()
+
+    print(f"\n🔎 {search} search: {len(candidates)} konfigurasi x {n_folds} fold di {n_jobs} proses...")
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=n_jobs, initializer=_init_search_worker,
+                             initargs=(X, y, folds)) as pool:
+        results = list(pool.map(_evaluate_params, candidates))
+    elapsed = time.perf_counter() - start
+
+    results.sort(key=lambda r: (-r[1], r[3]))
+    print(f"\n{'F1 (mean ± std)':<20}{'Waktu (s)':>10}  Parameter")
+    for params, mean_f1, std_f1, seconds in results:
+        print(f"{mean_f1:.4f} ± {std_f1:.4f}     {seconds:>10.2f}  {params}")
+    print(f"\n⏱️ Total waktu search: {elapsed:.1f} detik")
+    return results
+
+def train_and_evaluate(df, params=None):
+    from sklearn.ensemble import RandomForestClassifier
+    from sklearn.metrics import classification_report, f1_score, confusion_matrix
+    from sklearn.model_selection import train_test_split
+
+    # Pisahkan Fitur (X) dan Target/Label (y)
+    # Fitur: Data sensor yang akan dipelajari
+    X = df[FEATURES]
+
+    # Target: Hasil klasifikasi (0=Normal, 1=Warning, 2=Critical)
+    y = df['label']
+
+    # Split Data: 80% untuk Latihan (Train), 20% untuk Ujian (Test)
+    # stratify=y memastikan proporsi kelas (Normal/Warning/Critical) seimbang di kedua set
+    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42, stratify=y)
+
+    print(f"📊 Data Latih: {len(X_train)} baris")
+    print(f"📊 Data Uji: {len(X_test)} baris")
+
+    # ---------------------------------------------------------
+    # BAGIAN 2: TRAINING MODEL
+    # ---------------------------------------------------------
+    print("\n🤖 Sedang melatih model Random Forest...")
+
+    # Inisialisasi Model (default: 100 pohon, atau parameter terbaik dari search)
+    params = params or {'n_estimators': 100}
+    model = RandomForestClassifier(random_state=42, n_jobs=-1, **params)
+
+    # Proses Training (Fit)
+    model.fit(X_train, y_train)
+
+    # ---------------------------------------------------------
+    # BAGIAN 3: EVALUASI (TESTING)
+    # ---------------------------------------------------------
+    print("\n📝 Melakukan evaluasi...")
+
+    # Minta model memprediksi data ujian (X_test)
+    y_pred = model.predict(X_test)
+
+    # Hitung Skor Evaluasi
+    # F1 Score sangat penting jika data tidak seimbang (imbalanced data)
+    f1 = f1_score(y_test, y_pred, average='weighted')
+
+    print(f"✅ Weighted F1 Score: {f1:.4f} (Semakin dekat ke 1.0 semakin bagus)")
+    print("\n--- Detail Laporan Klasifikasi ---")
+    print(classification_report(y_test, y_pred, target_names=['Normal', 'Warning', 'Critical']))
+
+    print("\n--- Confusion Matrix (Kebenaran Prediksi) ---")
+    # Baris = Kunci Jawaban (Asli), Kolom = Jawaban Model (Prediksi)
+    print(confusion_matrix(y_test, y_pred))
+
+    # Simpan model tanpa n_jobs=-1 agar prediksi 1 baris di dashboard tidak membuat thread pool
+    model.set_params(n_jobs=None)
+    return model
+
+def main():
+    parser = argparse.ArgumentParser(description="Training model Random Forest Chili-Hub")
+    parser.add_argument('--data', default='data_sensor.csv',
+                        help="CSV / dataset .parquet / .arrow berlabel, atau database histori (.db) dari mqtt_listener.py")
+    parser.add_argument('--start', default=None, help="Awal rentang waktu, contoh '2026-01-01'")
+    parser.add_argument('--end', default=None, help="Akhir rentang waktu (eksklusif)")
+    parser.add_argument('--search', choices=['grid', 'random'], default=None,
+                        help="Cari hyperparameter terbaik dengan stratified k-fold sebelum training")
+    parser.add_argument('--folds', type=int, default=5)
+    parser.add_argument('--n-iter', type=int, default=20, help="Jumlah kandidat untuk random search")
+    parser.add_argument('--jobs', type=int, default=None, help="Jumlah proses (default: semua core)")
+    parser.add_argument('--stream', action='store_true',
+                        help="Baca data per chunk + reservoir sample (memori tetap, untuk dataset > RAM)")
+    parser.add_argument('--sample-size', type=int, default=500_000)
+    parser.add_argument('--chunksize', type=int, default=200_000)
+    parser.add_argument('--output', default='model_final.pkl')
+    parser.add_argument('--fast-output', default=FAST_MODEL_PATH,
+                        help="File prediktor cepat (array datar) untuk dashboard & inference worker")
+    parser.add_argument('--manifest', default=MANIFEST_PATH,
+                        help="Catatan versi model (dipakai retraining otomatis & payload prediksi)")
+    args = parser.parse_args()
+
+    try:
+        if args.stream:
+            chunks = stream_training_data(args.data, args.chunksize, start=args.start, end=args.end)
+            X, y, seen, rate = reservoir_sample(chunks, args.sample_size)
+            print(f"🎲 Sampel {len(X):,} dari {seen:,} baris ({rate:,.0f} baris/detik)")
+            df = pd.DataFrame(X, columns=FEATURES)
+            df['label'] = y
+        else:
+            df = load_training_data(args.data, start=args.start, end=args.end)
+    except FileNotFoundError:
+        print(f"❌ Error: File '{args.data}' tidak ditemukan. Jalankan script generate data dulu.")
+        return
+
+    params = None
+    if args.search:
+        # Search hanya memakai data latih (80%), data uji tetap untuk evaluasi akhir
+        from sklearn.model_selection import train_test_split
+        train_df, _ = train_test_split(df, test_size=0.2, random_state=42, stratify=df['label'])
+        results = hyperparameter_search(train_df[FEATURES], train_df['label'], search=args.search,
+                                        n_folds=args.folds, n_iter=args.n_iter, n_jobs=args.jobs)
+        params = results[0][0]
+        print(f"🏆 Parameter terbaik: {params}")
+
+    model = train_and_evaluate(df, params)
+
+    # ---------------------------------------------------------
+    # BAGIAN 4: SIMPAN MODEL JADI
+    # ---------------------------------------------------------
+    import joblib
+    # Tanpa kompresi agar dashboard / inference worker bisa memuatnya dengan mmap_mode='r'
+    joblib.dump(model, args.output)
+    print(f"\n💾 Model berhasil disimpan sebagai '{args.output}'")
+
+    export_forest(model, args.fast_output)
+    print(f"💾 Prediktor cepat disimpan sebagai '{args.fast_output}'")
+
+    # Distribusi data training disimpan sebagai acuan deteksi drift (model_manager.py);
+    # proses yang sedang berjalan memuat versi ini pada pengecekan berikutnya
+    version = record_model_version(args.output, args.fast_output, feature_reference(df), args.data,
+                                   metrics={'params': params, 'rows': len(df), 'profile': STANDARD_PROFILE}, manifest_path=args.manifest)
+    print(f"🏷️ Versi model: {version} (tercatat di '{args.manifest}')")
+
+if __name__ == "__main__":
+    main()